@@ -9,13 +9,11 @@ user_email = st.text_input("Enter your email address to authenticate")
 if st.button('Authenticate and List Services'):
     if user_email:
         try:
-            # Authenticate and get Google services
-            gmail_service, drive_service, calendar_service = authenticate_google_services(user_email)
+            # Authenticate and register the session; the pages get their Google services from it
+            authenticate_google_services(user_email, session_id=user_email)
             
-            # Store the services in session state
-            st.session_state['gmail_service'] = gmail_service
-            st.session_state['drive_service'] = drive_service
-            st.session_state['calendar_service'] = calendar_service
+            # Store the session in session state
+            st.session_state['session_id'] = user_email
             
             st.success("Successfully authenticated with Google APIs.")
         
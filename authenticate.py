@@ -1,9 +1,18 @@
+import functools
 import os
-import pickle
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+import httplib2
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from calendar_store import drop_event_stores
 
 # Define the scopes for Gmail, Google Drive, and Google Calendar
 SCOPES = [
@@ -12,63 +21,404 @@ SCOPES = [
     'https://www.googleapis.com/auth/calendar'
 ]
 
-# Global variables to store the authenticated services
-drive_service = None
-gmail_service = None
-calendar_service = None
+# Credentials are refreshed this long before they expire, so no request runs with an expiring token
+REFRESH_MARGIN = timedelta(minutes=5)
+
+# Directory where discovery documents that are not bundled with googleapiclient are cached after download
+DISCOVERY_CACHE_DIR = os.getenv('DISCOVERY_CACHE_DIR', '.discovery_cache')
+DISCOVERY_URL = 'https://www.googleapis.com/discovery/v1/apis/{api}/{version}/rest'
+
+# The version of each API the sessions use
+API_VERSIONS = {'gmail': 'v1', 'drive': 'v3', 'calendar': 'v3'}
+
+# Sessions that haven't been used for this many seconds are evicted from the registry
+SESSION_MAX_IDLE = int(os.getenv('SESSION_MAX_IDLE', '3600'))
+
+_discovery_documents = {}
+_discovery_lock = threading.Lock()
+
+# Time spent building each API client, as (api, version, seconds) tuples
+client_build_times = []
+
+def load_discovery_document(api, version):
+    """
+    Returns the discovery document of an API as a JSON string, reading it at most once per process.
+
+    The document is looked up in the static documents bundled with googleapiclient, then in
+    DISCOVERY_CACHE_DIR, and only downloaded (and saved to DISCOVERY_CACHE_DIR) if neither has it.
+    """
+    with _discovery_lock:
+        document = _discovery_documents.get((api, version))
+        if document is not None:
+            return document
+
+        document = get_static_doc(api, version)
+        cache_path = os.path.join(DISCOVERY_CACHE_DIR, f"{api}.{version}.json")
+        if document is None and os.path.exists(cache_path):
+            with open(cache_path, 'r') as f:
+                document = f.read()
+        if document is None:
+            response, content = httplib2.Http().request(DISCOVERY_URL.format(api=api, version=version))
+            if response.status >= 400:
+                raise Exception(f"Could not download the discovery document of {api} {version}: HTTP {response.status}")
+            document = content.decode('utf-8')
+            os.makedirs(DISCOVERY_CACHE_DIR, exist_ok=True)
+            with open(cache_path, 'w') as f:
+                f.write(document)
+
+        _discovery_documents[(api, version)] = document
+        return document
+
+def get_client_build_stats():
+    """Returns the number of clients built and the total and average build time per API."""
+    stats = {}
+    for api, version, seconds in list(client_build_times):
+        entry = stats.setdefault(f"{api} {version}", {"count": 0, "total": 0.0})
+        entry["count"] += 1
+        entry["total"] += seconds
+    for entry in stats.values():
+        entry["average"] = entry["total"] / entry["count"]
+    return stats
+
+
+class CredentialManager:
+    """
+    Loads the OAuth credentials of one token file once and keeps them fresh for every thread of the process.
+
+    Parameters:
+    - token_file (str): The file storing the user's access and refresh tokens.
+    - scopes (list): The scopes the credentials must have.
+    """
+
+    def __init__(self, token_file, scopes):
+        self.token_file = token_file
+        self.scopes = scopes
+        self.creds = None
+        self.lock = threading.Lock()
+
+    def _needs_refresh(self):
+        if not self.creds.valid:
+            return True
+        # expiry is a naive UTC datetime
+        return self.creds.expiry is not None and self.creds.expiry - datetime.utcnow() < REFRESH_MARGIN
+
+    def is_fresh(self):
+        """Whether the loaded credentials can be used as they are. Doesn't take the lock, so it is cheap to call often."""
+        creds = self.creds
+        return creds is not None and creds.valid and (
+            creds.expiry is None or creds.expiry - datetime.utcnow() >= REFRESH_MARGIN)
+
+    def get(self, interactive=True):
+        """
+        Returns valid credentials, refreshing them under the lock shortly before they expire.
+
+        Parameters:
+        - interactive (bool): Run the browser login flow if there are no usable credentials.
+          If False, an exception is raised instead.
+        """
+        with self.lock:
+            if self.creds is None and os.path.exists(self.token_file):
+                self.creds = Credentials.from_authorized_user_file(self.token_file, self.scopes)
+
+            if self.creds and self.creds.has_scopes(self.scopes) and not self._needs_refresh():
+                return self.creds
+
+            # If credentials are invalid, expired, or lack required scopes, log the user in
+            if self.creds and self.creds.refresh_token and self.creds.has_scopes(self.scopes):
+                self.creds.refresh(Request())
+            elif interactive:
+                # Use InstalledAppFlow.from_client_secrets_file() to authenticate user
+                flow = InstalledAppFlow.from_client_secrets_file(
+                    'client_secret-agents.json', self.scopes, redirect_uri='http://localhost:8080/')
+                self.creds = flow.run_local_server(port=8080)
+            else:
+                raise Exception("User is not authenticated. Please authenticate first.")
+
+            # Save the credentials for future runs
+            with open(self.token_file, 'w') as token:
+                token.write(self.creds.to_json())
+            return self.creds
+
+
+class ServicePool:
+    """
+    A pool of API clients for one API and one account.
+
+    googleapiclient clients are not thread-safe, so each client is used by one thread at a time: worker
+    threads lease a client for the duration of a call and hand it back, and long-lived callers get a client
+    dedicated to their thread. Each client keeps its own HTTP connection, and clients are only built when no
+    idle one is available, so building clients stays off the per-item path.
+
+    Parameters:
+    - api (str): The API name, e.g. 'drive'.
+    - version (str): The API version, e.g. 'v3'.
+    - manager (CredentialManager): Provides the credentials of the account.
+    """
+
+    def __init__(self, api, version, manager):
+        self.api = api
+        self.version = version
+        self.manager = manager
+        self.idle = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def _build(self):
+        started = time.perf_counter()
+        http = AuthorizedHttp(self.manager.get(), http=httplib2.Http())
+        # Build from the in-memory discovery document instead of letting build() locate and read it again
+        service = build_from_document(load_discovery_document(self.api, self.version), http=http)
+        client_build_times.append((self.api, self.version, time.perf_counter() - started))
+        return service
+
+    @contextmanager
+    def lease(self):
+        """Lends a client to the current thread for the duration of a with block."""
+        # Refresh the shared credentials under the manager's lock before they are used
+        self.manager.get()
+        with self.lock:
+            service = self.idle.pop() if self.idle else None
+        if service is None:
+            service = self._build()
+        try:
+            yield service
+        finally:
+            with self.lock:
+                self.idle.append(service)
+
+    def get(self, interactive=True):
+        """Returns the client dedicated to the current thread."""
+        self.manager.get(interactive=interactive)
+        service = getattr(self.local, 'service', None)
+        if service is None:
+            service = self._build()
+            self.local.service = service
+        return service
+
+
+class LazyService:
+    """
+    Stands in for an API client and only builds it (for the calling thread) the first time it is used,
+    so authenticating doesn't pay for clients a page never uses. The client is resolved once per thread;
+    later calls only go through the credential manager's lock when the credentials need a refresh.
+
+    Parameters:
+    - pool (ServicePool): The pool providing the client.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._local = threading.local()
+
+    def _service(self):
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self._local.service = self._pool.get()
+        elif not self._pool.manager.is_fresh():
+            self._pool.manager.get()
+        return service
+
+    def lease(self):
+        """Lends a pooled client to the current thread for the duration of a with block, e.g. in worker threads."""
+        return self._pool.lease()
+
+    def __getattr__(self, name):
+        return getattr(self._service(), name)
+
+
+_managers = {}
+_pools = {}
+_registry_lock = threading.Lock()
+
+def get_credential_manager(token_file, scopes=SCOPES):
+    """Returns the process-wide credential manager of a token file."""
+    with _registry_lock:
+        manager = _managers.get(token_file)
+        if manager is None:
+            manager = _managers[token_file] = CredentialManager(token_file, scopes)
+        return manager
+
+def get_service_pool(api, version, token_file, scopes=SCOPES):
+    """Returns the process-wide pool of clients for an API and a token file."""
+    manager = get_credential_manager(token_file, scopes)
+    with _registry_lock:
+        pool = _pools.get((api, version, token_file))
+        if pool is None:
+            pool = _pools[(api, version, token_file)] = ServicePool(api, version, manager)
+        return pool
 
 def get_token_file(email):
     """Generate a unique token file name based on the user's email."""
     return f"token_{email}.json"
 
-def authenticate_google_services(email):
-    """Authenticates and returns the Google API service instances for Gmail, Drive, and Calendar."""
-    global drive_service  # Make drive_service globally accessible
-    creds = None
+
+class Session:
+    """
+    The signed-in account of one user session and its lazily built API clients.
+
+    Parameters:
+    - session_id (str): The key of the session in the registry.
+    - token_file (str): The token file of the session's account.
+    """
+
+    def __init__(self, session_id, token_file):
+        self.session_id = session_id
+        self.token_file = token_file
+        self.last_used = time.monotonic()
+        self.services = {api: LazyService(self.pool(api)) for api in API_VERSIONS}
+
+    def pool(self, api):
+        """Returns the pool of clients of an API ('gmail', 'drive' or 'calendar') for the session's account."""
+        return get_service_pool(api, API_VERSIONS[api], self.token_file)
+
+
+class SessionRegistry:
+    """
+    The sessions served by this process, keyed by session ID.
+
+    Lookups don't take a lock: writers replace the whole mapping under the lock, so readers always see
+    a complete dict. Sessions idle for longer than `max_idle` seconds are evicted when a session is registered,
+    together with the clients and credentials of accounts no remaining session uses.
+
+    Parameters:
+    - max_idle (int): Number of seconds after which an unused session is evicted.
+    """
+
+    def __init__(self, max_idle=SESSION_MAX_IDLE):
+        self.max_idle = max_idle
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def register(self, session_id, token_file):
+        """Creates (or replaces) the session and returns it."""
+        session = Session(session_id, token_file)
+        with self.lock:
+            sessions = dict(self.sessions)
+            sessions[session_id] = session
+            self.sessions = sessions
+        self.evict_idle()
+        return session
+
+    def get(self, session_id):
+        """Returns the session, or None if it doesn't exist or was evicted."""
+        session = self.sessions.get(session_id)
+        if session is not None:
+            session.last_used = time.monotonic()
+        return session
+
+    def only_session(self):
+        """Returns the session if exactly one is registered, otherwise None."""
+        sessions = list(self.sessions.values())
+        return sessions[0] if len(sessions) == 1 else None
+
+    def evict_idle(self):
+        """Removes the sessions that have been idle for too long and returns how many were removed."""
+        cutoff = time.monotonic() - self.max_idle
+        with self.lock:
+            kept = {key: session for key, session in self.sessions.items() if session.last_used >= cutoff}
+            evicted = [session for key, session in self.sessions.items() if key not in kept]
+            self.sessions = kept
+            in_use = {session.token_file for session in kept.values()}
+        for token_file in {session.token_file for session in evicted} - in_use:
+            _drop_account(token_file)
+        return len(evicted)
+
+
+sessions = SessionRegistry()
+
+# The session the current Streamlit script run (or the code called from it) works for
+_current_session = ContextVar('current_session', default=None)
+
+def _drop_account(token_file):
+    """Forgets the credentials, client pools and calendar stores of an account."""
+    with _registry_lock:
+        _managers.pop(token_file, None)
+        for key in [key for key in _pools if key[2] == token_file]:
+            del _pools[key]
+    drop_event_stores(token_file)
+
+def authenticate_google_services(email, session_id=None):
+    """
+    Authenticates the user, registers their session and returns the Google API service instances for Gmail, Drive, and Calendar.
+
+    Parameters:
+    - email (str): The user's email address.
+    - session_id (str): The key of the session in the registry. Defaults to the email address.
+    """
     token_file = get_token_file(email)
 
-    # Check if a token for this user already exists
-    if os.path.exists(token_file):
-        creds = Credentials.from_authorized_user_file(token_file, SCOPES)
-    
-    # If credentials are invalid, expired, or lack required scopes, log the user in
-    if not creds or not creds.valid or not creds.has_scopes(SCOPES):
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            # Use InstalledAppFlow.from_client_secrets_file() to authenticate user
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'client_secret-agents.json', SCOPES, redirect_uri='http://localhost:8080/')
-            creds = flow.run_local_server(port=8080)
-        
-        # Save the credentials for future runs in a user-specific token file
-        with open(token_file, 'w') as token:
-            token.write(creds.to_json())
-
-    # Build the service instances for Gmail, Drive, and Calendar
-    gmail_service = build('gmail', 'v1', credentials=creds)
-    drive_service = build('drive', 'v3', credentials=creds)  # Store the Drive service globally
-    calendar_service = build('calendar', 'v3', credentials=creds)
-    
-    return gmail_service, drive_service, calendar_service
-
-def get_drive_service():
-    """Returns the globally authenticated Google Drive service."""
-    global drive_service
-    if drive_service is None:
-        raise ValueError("Google Drive service has not been authenticated yet. Call authenticate_google_services() first.")
-    return drive_service
-
-def get_gmail_service():
-    """Returns the globally authenticated Gmail service."""
-    global gmail_service
-    if gmail_service is None:
-        raise ValueError("Gmail service has not been authenticated yet. Call authenticate_google_services() first.")
-    return gmail_service    
-
-def get_calendar_service(): 
-    """Returns the globally authenticated Google Calendar service."""
-    global calendar_service
-    if calendar_service is None:
-        raise ValueError("Google Calendar service has not been authenticated yet. Call authenticate_google_services() first.")
-    return calendar_service
+    # Load or refresh the user's credentials, logging the user in if needed
+    get_credential_manager(token_file).get()
+
+    # The service instances for Gmail, Drive, and Calendar are built on first use
+    session = sessions.register(session_id or email, token_file)
+    activate_session(session.session_id)
+
+    return session.services['gmail'], session.services['drive'], session.services['calendar']
+
+def activate_session(session_id):
+    """Makes the session the one used by the current context, e.g. at the top of a Streamlit page."""
+    _current_session.set(session_id)
+
+@contextmanager
+def use_session(session_id):
+    """Makes the session the one used by the current context for the duration of a with block."""
+    token = _current_session.set(session_id)
+    try:
+        yield
+    finally:
+        _current_session.reset(token)
+
+def bind_session(func, session_id):
+    """
+    Returns a function that calls `func` with the session active. CrewAI runs asynchronous tasks in threads that
+    don't inherit the caller's context, so the tools of those tasks have to carry their session.
+    """
+    @functools.wraps(func)
+    def run_in_session(*args, **kwargs):
+        with use_session(session_id):
+            return func(*args, **kwargs)
+
+    return run_in_session
+
+def get_session(session_id=None):
+    """
+    Returns the given session, or the one active in the current context.
+
+    Threads that don't inherit the context (e.g. started by CrewAI) can only fall back to a session
+    when a single one is registered, so one user's request never runs with another user's account.
+    """
+    session_id = session_id or _current_session.get()
+    if session_id is None:
+        session = sessions.only_session()
+        if session is None:
+            raise ValueError("No session is active. Call authenticate_google_services() or activate_session() first.")
+        return session
+    session = sessions.get(session_id)
+    if session is None:
+        raise ValueError(f"Session {session_id} is not authenticated or has expired. Call authenticate_google_services() first.")
+    return session
+
+def current_session_id():
+    """Returns the ID of the session used by the current context."""
+    return get_session().session_id
+
+def get_session_pool(api, session_id=None):
+    """Returns the pool of clients of an API for the account of the given (or the active) session."""
+    return get_session(session_id).pool(api)
+
+def lease_drive_service(session_id=None):
+    """Lends a Drive client of the session's account to the current thread for the duration of a with block."""
+    return get_session_pool('drive', session_id).lease()
+
+def get_drive_service(session_id=None):
+    """Returns the Google Drive service of the session."""
+    return get_session(session_id).services['drive']
+
+def get_gmail_service(session_id=None):
+    """Returns the Gmail service of the session."""
+    return get_session(session_id).services['gmail']
+
+def get_calendar_service(session_id=None):
+    """Returns the Google Calendar service of the session."""
+    return get_session(session_id).services['calendar']
@@ -0,0 +1,140 @@
+"""
+Compares the throughput of the original BeautifulSoup get_email_body with the body extraction engines of email_text.
+
+The corpus is either a directory of captured messages (JSON files as returned by messages().get(format='full'),
+one message or a list of messages per file) or, by default, generated marketing-style HTML emails and replies.
+
+Usage:
+    python benchmarks/bench_email_body.py [corpus_dir_or_message_count] [repeats]
+"""
+import base64
+import glob
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from email_text import extract_body, lxml_html
+
+
+def original_get_email_body(message):
+    """The implementation of gmail.get_email_body before the extraction engines, used as the baseline."""
+    body = ''
+    payload = message['payload']
+
+    def extract_parts(parts_list):
+        nonlocal body
+        for part in parts_list:
+            mime_type = part.get('mimeType')
+            if part.get('parts'):
+                extract_parts(part['parts'])
+            elif mime_type == 'text/plain':
+                data = part['body'].get('data')
+                if data:
+                    text = base64.urlsafe_b64decode(data).decode('utf-8')
+                    body += text
+            elif mime_type == 'text/html' and not body:
+                data = part['body'].get('data')
+                if data:
+                    html_content = base64.urlsafe_b64decode(data).decode('utf-8')
+                    soup = BeautifulSoup(html_content, 'html.parser')
+                    text = soup.get_text()
+                    body += text
+
+    if payload.get('parts'):
+        extract_parts(payload['parts'])
+    else:
+        mime_type = payload.get('mimeType')
+        data = payload['body'].get('data')
+        if data:
+            content = base64.urlsafe_b64decode(data).decode('utf-8')
+            if mime_type == 'text/plain':
+                body += content
+            elif mime_type == 'text/html':
+                soup = BeautifulSoup(content, 'html.parser')
+                text = soup.get_text()
+                body += text
+
+    return body
+
+
+def _encode(value):
+    return base64.urlsafe_b64encode(value.encode('utf-8')).decode('ascii')
+
+
+def make_marketing_message(index, products=60):
+    """Builds an HTML-only newsletter with inline styles, tracking scripts, nested tables and a quoted reply."""
+    style = "<style>" + "".join(f".c{i} {{ color: #{i:06x}; padding: 4px; }}" for i in range(200)) + "</style>"
+    script = "<script>" + "var t = [];" * 300 + "</script>"
+    rows = "".join(
+        f'<tr><td class="c{i % 200}" style="font-family:Arial;font-size:14px">'
+        f'<a href="https://shop.example.com/p/{i}?utm_source=email&amp;utm_campaign={index}">'
+        f'<img src="https://cdn.example.com/{i}.png" alt="Product {i}"/></a></td>'
+        f'<td><h3>Product {i} &ndash; now 20% off</h3><p>Limited offer for our loyal customers. '
+        f'Free shipping on orders over &euro;50.</p></td></tr>'
+        for i in range(products))
+    quote = ('<div class="gmail_attr">On Mon, 1 Jan 2024 at 10:00, Shop wrote:<br></div>'
+             '<blockquote class="gmail_quote">' + '<p>Previous newsletter text.</p>' * 50 + '</blockquote>')
+    html = (f"<html><head><title>Offers {index}</title>{style}{script}</head>"
+            f"<body><table>{rows}</table><p>Reply to this email to unsubscribe.</p>{quote}</body></html>")
+    return {
+        'id': f'mkt{index:05d}',
+        'payload': {
+            'mimeType': 'multipart/related',
+            'body': {'size': 0},
+            'parts': [
+                {'mimeType': 'multipart/alternative', 'body': {'size': 0}, 'parts': [
+                    {'mimeType': 'text/html', 'body': {'size': len(html), 'data': _encode(html)}},
+                ]},
+                {'mimeType': 'image/png', 'body': {'size': 1024, 'attachmentId': 'att1'}},
+            ],
+        },
+    }
+
+
+def load_corpus(source):
+    """Returns the captured messages of a directory, or `source` generated messages if it is a number."""
+    if os.path.isdir(source):
+        messages = []
+        for path in sorted(glob.glob(os.path.join(source, '*.json'))):
+            with open(path, 'r') as f:
+                data = json.load(f)
+            messages.extend(data if isinstance(data, list) else [data])
+        return messages
+    return [make_marketing_message(index) for index in range(int(source))]
+
+
+def measure(name, extract, messages, repeats):
+    started = time.perf_counter()
+    characters = 0
+    for _ in range(repeats):
+        for message in messages:
+            characters += len(extract(message))
+    elapsed = time.perf_counter() - started
+    count = len(messages) * repeats
+    print(f'{name:<10} {count / elapsed:10.1f} messages/s  {elapsed:7.3f}s  '
+          f'{characters // count:7d} characters per body')
+    return elapsed
+
+
+def run(source='200', repeats=3):
+    messages = load_corpus(source)
+    payload_bytes = sum(len(json.dumps(message['payload'])) for message in messages)
+    print(f'{len(messages)} messages, {payload_bytes / 1e6:.1f} MB of payload, {repeats} repeats')
+
+    baseline = measure('original', original_get_email_body, messages, repeats)
+    engines = ['bs4', 'stream'] + (['lxml'] if lxml_html is not None else [])
+    for engine in engines:
+        elapsed = measure(engine, lambda message: extract_body(message['payload'], engine=engine), messages, repeats)
+        print(f'{"":<10} {baseline / elapsed:.1f}x the original')
+    if lxml_html is None:
+        print('lxml is not installed; the lxml engine was skipped')
+
+
+if __name__ == '__main__':
+    run(sys.argv[1] if len(sys.argv) > 1 else '200',
+        int(sys.argv[2]) if len(sys.argv) > 2 else 3)
@@ -0,0 +1,88 @@
+"""
+Compares the per-event parsing previously done by ListGoogleCalendarEvents._parse_event with
+event_normalization.normalize_events on a generated calendar with thousands of events, and checks that both
+agree on the timed events (the old parser also appended a wrong 'Z' suffix and shifted all-day events).
+
+Usage:
+    python benchmarks/bench_event_normalization.py [event_count] [repeats]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dateutil import tz
+
+from event_normalization import normalize_events, np
+
+OFFSETS = ['-05:00', '-06:00', '+00:00', '+02:00', 'Z']
+
+
+def make_events(event_count, seed=0):
+    """Generates events over two years (across DST changes), one in ten of them all-day."""
+    rng = random.Random(seed)
+    first = datetime(2024, 1, 1)
+    events = []
+    for index in range(event_count):
+        day = first + timedelta(days=rng.randrange(730))
+        if index % 10 == 0:
+            events.append({'id': str(index), 'summary': f'Holiday {index}',
+                           'start': {'date': day.date().isoformat()},
+                           'end': {'date': (day + timedelta(days=1)).date().isoformat()}})
+            continue
+        start = day + timedelta(minutes=15 * rng.randrange(96))
+        end = start + timedelta(minutes=30 * rng.randint(1, 4))
+        offset = rng.choice(OFFSETS)
+        events.append({'id': str(index), 'summary': f'Meeting {index}', 'description': 'Weekly sync',
+                       'start': {'dateTime': start.isoformat() + offset},
+                       'end': {'dateTime': end.isoformat() + offset}})
+    return events
+
+
+def original_parse_event(event, timezone):
+    """The implementation of ListGoogleCalendarEvents._parse_event before normalize_events, used as the baseline."""
+    start = event['start'].get('dateTime', event['start'].get('date'))
+    start = datetime.fromisoformat(start).astimezone(tz.gettz(timezone)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    end = event['end'].get('dateTime', event['end'].get('date'))
+    end = datetime.fromisoformat(end).astimezone(tz.gettz(timezone)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    return {
+        'start': start,
+        'end': end,
+        'summary': event.get('summary', 'No Title'),
+        'description': event.get('description', 'No Description')
+    }
+
+
+def best_time(function, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def run(event_count=5000, repeats=5, timezone='America/Chicago'):
+    events = make_events(event_count)
+
+    baseline_time, baseline = best_time(lambda: [original_parse_event(event, timezone) for event in events], repeats)
+    print(f'{event_count} events, best of {repeats}')
+    print(f'original _parse_event: {baseline_time * 1000:.1f} ms ({event_count / baseline_time:,.0f} events/s)')
+
+    engines = ['python'] + (['numpy'] if np is not None else [])
+    for engine in engines:
+        engine_time, records = best_time(lambda: normalize_events(events, timezone, engine=engine), repeats)
+        mismatches = sum(
+            1 for old, new in zip(baseline, records)
+            if not new.all_day and (old['start'].rstrip('Z'), old['end'].rstrip('Z')) != (new.start, new.end))
+        print(f'normalize_events[{engine}]: {engine_time * 1000:.1f} ms ({event_count / engine_time:,.0f} events/s, '
+              f'{baseline_time / engine_time:.1f}x), {mismatches} timed events differ from the original')
+    if np is None:
+        print('NumPy is not installed, the numpy engine was skipped')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000, int(sys.argv[2]) if len(sys.argv) > 2 else 5)
@@ -0,0 +1,43 @@
+"""
+Compares serial and batched message fetching in gmail.get_last_emails against the fake Gmail service.
+
+Usage:
+    python benchmarks/bench_gmail_batch.py [message_count] [latency_seconds]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_gmail import FakeGmailService
+from gmail import get_last_emails
+
+
+def run(message_count=50, latency=0.05):
+    service = FakeGmailService(message_count=message_count, latency=latency)
+
+    started = time.perf_counter()
+    serial = get_last_emails(service, max_results=message_count)
+    serial_time = time.perf_counter() - started
+    serial_requests = service.requests
+
+    service.requests = 0
+    started = time.perf_counter()
+    batched = get_last_emails(service, max_results=message_count, batch_size=50)
+    batched_time = time.perf_counter() - started
+
+    print(f'Serial:  {serial_requests} requests, {serial_time:.3f}s, {len(serial or [])} messages')
+    print(f'Batched: {service.requests} requests, {batched_time:.3f}s, {len(batched)} messages')
+    print(f'Speedup: {serial_time / batched_time:.1f}x')
+
+    # A failing message is reported per item and the rest of the batch is still returned
+    failing = FakeGmailService(message_count=message_count, latency=latency, failing_ids={'msg00003'})
+    partial = get_last_emails(failing, max_results=message_count, batch_size=50)
+    print(f'With one failing message: {len(partial)}/{message_count} messages returned')
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    run(count, latency)
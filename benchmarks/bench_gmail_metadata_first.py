@@ -0,0 +1,45 @@
+"""
+Compares fetching the full messages of the inbox (gmail.get_last_emails) with the metadata-first two-phase
+fetch (gmail.fetch_emails), which skips the bodies of bulk messages, on the fake Gmail service.
+Reports the payload bytes, the time and the number of emails left for the LLM.
+
+Usage:
+    python benchmarks/bench_gmail_metadata_first.py [message_count] [bulk_every] [bytes_per_second]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_gmail import FakeGmailService
+from gmail import fetch_emails, get_last_emails
+
+
+def run(message_count=200, bulk_every=3, bytes_per_second=2e6, latency=0.05):
+    results = {}
+    for name in ('full', 'two-phase', 'two-phase, no prefilter'):
+        service = FakeGmailService(message_count=message_count, latency=latency, bulk_every=bulk_every,
+                                   bytes_per_second=bytes_per_second)
+        started = time.perf_counter()
+        if name == 'full':
+            emails = get_last_emails(service, max_results=message_count, batch_size=50)
+            analyzed = len(emails)
+        else:
+            emails = fetch_emails(service, max_results=message_count, batch_size=50, prefilter=name == 'two-phase')
+            analyzed = sum(1 for email in emails if email.content is not None)
+        elapsed = time.perf_counter() - started
+        results[name] = (service.bytes_sent, elapsed)
+        print(f'{name:>24}: {service.requests} requests, {service.bytes_sent / 1e6:.2f} MB '
+              f'({service.bytes_sent / message_count / 1e3:.1f} kB/message), {elapsed:.3f}s '
+              f'({1000 * elapsed / message_count:.1f} ms/message), {analyzed}/{len(emails)} emails with a body')
+
+    full_bytes, full_time = results['full']
+    bytes_sent, elapsed = results['two-phase']
+    print(f'Two-phase fetch: {full_bytes / bytes_sent:.1f}x fewer bytes, {full_time / elapsed:.1f}x faster')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 3,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 2e6)
@@ -0,0 +1,72 @@
+"""
+Measures the throughput of transcript_parser on a large generated Google Meet transcript, and compares the
+speakers it finds with the names the previous regex (extract_valid_names) picked up.
+
+Usage:
+    python benchmarks/bench_transcript_parser.py [turn_count]
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcript_parser import TranscriptIndex, iter_turns
+
+SPEAKERS = ['Alice Smith', 'Bob Jones', 'Carla Gómez', 'Deepak Rao', 'Emma Lee']
+SENTENCES = [
+    "Let's go over the Quarterly Report first.",
+    "Marketing Team wants the Launch Plan by next Friday.",
+    "I think New York is still the best place for the offsite.",
+    "Can you send the Budget Review to the Finance Department?",
+    "Sounds good, I'll take that.",
+    "We agreed the deadline is March 15 for the Beta Release.",
+]
+
+
+def make_transcript(turn_count, seed=0):
+    """Builds the lines of a Google Meet transcript with `turn_count` turns and a timestamp every 20 turns."""
+    rng = random.Random(seed)
+    lines = ['Weekly Sync (2024-01-01 10:00 GMT) - Transcript\n', '\n', 'Attendees\n', ', '.join(SPEAKERS) + '\n',
+             'Transcript\n']
+    for index in range(turn_count):
+        if index % 20 == 0:
+            seconds = index * 15
+            lines.append(f'\n{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}\n\n')
+        text = ' '.join(rng.choice(SENTENCES) for _ in range(rng.randint(1, 4)))
+        lines.append(f'{rng.choice(SPEAKERS)}: {text}\n')
+    lines.append('\nMeeting ended after 01:00:00 👋\n')
+    return lines
+
+
+def extract_valid_names(transcript):
+    """The name extraction previously used by the Meetings page, kept as the baseline."""
+    names = re.findall(r'[A-Z][a-z]+(?: [A-Z][a-z]+)+', transcript)
+    return set(names)
+
+
+def run(turn_count=200000):
+    lines = make_transcript(turn_count)
+    size = sum(len(line) for line in lines)
+
+    started = time.perf_counter()
+    index = TranscriptIndex()
+    turns = sum(1 for _ in iter_turns(lines, index))
+    parse_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    names = extract_valid_names(''.join(lines))
+    regex_time = time.perf_counter() - started
+
+    print(f'{len(lines)} lines, {size / 1e6:.1f} MB')
+    print(f'Parser: {turns} turns, {len(index.speakers)} speakers in {parse_time:.3f}s '
+          f'({len(lines) / parse_time:,.0f} lines/s, {size / 1e6 / parse_time:.1f} MB/s)')
+    print(f'        speakers: {", ".join(index.speakers)}')
+    print(f'Regex:  {len(names)} names in {regex_time:.3f}s, '
+          f'{len(names - set(SPEAKERS))} of them are not speakers: {", ".join(sorted(names - set(SPEAKERS)))}')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,231 @@
+"""
+A local stand-in for the Gmail API service used by the benchmarks and the sync tests.
+
+Every `execute()` sleeps for a fixed round-trip latency so that serial requests and
+batch requests can be compared without touching the network. The JSON size of every
+response is counted in `bytes_sent`, and can be made to cost time with `bytes_per_second`.
+Changes made through `add_message`, `delete_message` and `set_inbox` are recorded in a
+mailbox history that users().history().list returns like the real API.
+"""
+import base64
+import json
+import time
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+
+def make_message(index, body_size=2000, bulk=False):
+    """
+    Builds a Gmail API style message dict with a plain text and an HTML part.
+    Bulk messages are newsletters: they have a List-Unsubscribe header, the promotions label and a larger HTML part.
+    """
+    text = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * (body_size // 56 + 1))[:body_size]
+    html = f"<html><body><p>{text}</p></body></html>"
+    if bulk:
+        html = f"<html><body>{('<table><tr><td><img src=x>' + text + '</td></tr></table>') * 15}</body></html>"
+    encode = lambda value: base64.urlsafe_b64encode(value.encode('utf-8')).decode('ascii')
+    headers = [
+        {'name': 'From', 'value': f'Sender {index} <sender{index}@example.com>'},
+        {'name': 'To', 'value': 'me@example.com'},
+        {'name': 'Subject', 'value': f'Message number {index}'},
+        {'name': 'Date', 'value': 'Mon, 1 Jan 2024 10:00:00 +0000'},
+        {'name': 'Received', 'value': 'from mail.example.com by mx.google.com with ESMTPS; Mon, 1 Jan 2024 10:00:00'},
+        {'name': 'DKIM-Signature', 'value': 'v=1; a=rsa-sha256; d=example.com; b=' + 'A' * 340},
+    ]
+    if bulk:
+        headers.append({'name': 'List-Unsubscribe', 'value': f'<mailto:unsubscribe{index}@example.com>'})
+    return {
+        'id': f'msg{index:05d}',
+        'threadId': f'thread{index:05d}',
+        'labelIds': ['INBOX', 'CATEGORY_PROMOTIONS'] if bulk else ['INBOX'],
+        'historyId': str(1000 + index),
+        'internalDate': str(1700000000000 + index * 1000),
+        'sizeEstimate': body_size,
+        'payload': {
+            'mimeType': 'multipart/alternative',
+            'headers': headers,
+            'body': {'size': 0},
+            'parts': [
+                {'mimeType': 'text/plain', 'body': {'size': len(text), 'data': encode(text)}},
+                {'mimeType': 'text/html', 'body': {'size': len(html), 'data': encode(html)}},
+            ],
+        },
+    }
+
+
+def metadata_view(message, headers=None):
+    """Returns what messages().get(format='metadata') returns: the message without its parts and bodies."""
+    wanted = {name.lower() for name in headers} if headers else None
+    payload = message['payload']
+    return {
+        **{key: value for key, value in message.items() if key != 'payload'},
+        'payload': {
+            'mimeType': payload['mimeType'],
+            'headers': [header for header in payload['headers'] if wanted is None or header['name'].lower() in wanted],
+        },
+    }
+
+
+class _Request:
+    def __init__(self, server, handler):
+        self.server = server
+        self.handler = handler
+
+    def execute(self):
+        self.server.requests += 1
+        response = self.handler()
+        time.sleep(self.server.latency + self.server.transfer_time(response))
+        return response
+
+
+class _BatchRequest:
+    def __init__(self, server, callback):
+        self.server = server
+        self.callback = callback
+        self.items = []
+
+    def add(self, request, request_id=None, callback=None):
+        self.items.append((request_id, request, callback or self.callback))
+
+    def execute(self):
+        # One round trip for the whole batch, plus a small per-item cost on the server side
+        self.server.requests += 1
+        results = []
+        for request_id, request, callback in self.items:
+            try:
+                results.append((request_id, callback, request.handler(), None))
+            except Exception as exception:
+                results.append((request_id, callback, None, exception))
+        transfer = sum(self.server.transfer_time(response) for _, _, response, _ in results if response is not None)
+        time.sleep(self.server.latency + self.server.per_item_latency * len(self.items) + transfer)
+        for request_id, callback, response, exception in results:
+            callback(request_id, response, exception)
+
+
+class _Messages:
+    def __init__(self, server):
+        self.server = server
+
+    def list(self, userId='me', maxResults=100, labelIds=None, pageToken=None, q=None):
+        messages = [msg for msg in self.server.messages if all(label in msg['labelIds'] for label in labelIds or ())]
+        ids = [{'id': msg['id'], 'threadId': msg['threadId']} for msg in messages[:maxResults]]
+        return _Request(self.server, lambda: {'messages': ids, 'resultSizeEstimate': len(ids)})
+
+    def get(self, userId='me', id=None, format='full', metadataHeaders=None):
+        def handler():
+            if id in self.server.failing_ids or (format == 'full' and id in self.server.failing_body_ids):
+                raise RuntimeError(f'Simulated failure for {id}')
+            if id not in self.server.by_id:
+                raise _http_error(404)
+            if format == 'metadata':
+                return metadata_view(self.server.by_id[id], metadataHeaders)
+            return self.server.by_id[id]
+        return _Request(self.server, handler)
+
+
+class _History:
+    def __init__(self, server):
+        self.server = server
+
+    def list(self, userId='me', startHistoryId=None, pageToken=None, historyTypes=None, maxResults=None):
+        def handler():
+            start = int(startHistoryId)
+            if start < self.server.oldest_history_id:
+                raise _http_error(404)
+            records = [record for record in self.server.history if int(record['id']) > start]
+            # One record per page, so callers have to follow the page tokens
+            position = int(pageToken or 0)
+            response = {'history': records[position:position + 1], 'historyId': str(self.server.history_id)}
+            if position + 1 < len(records):
+                response['nextPageToken'] = str(position + 1)
+            return response
+        return _Request(self.server, handler)
+
+
+class _Users:
+    def __init__(self, server):
+        self.server = server
+
+    def messages(self):
+        return _Messages(self.server)
+
+    def history(self):
+        return _History(self.server)
+
+    def getProfile(self, userId='me'):
+        return _Request(self.server, lambda: {'emailAddress': self.server.email_address,
+                                              'historyId': str(self.server.history_id)})
+
+
+def _http_error(status):
+    return HttpError(httplib2.Response({'status': status}), b'{}')
+
+
+class FakeGmailService:
+    """
+    Mimics the subset of the Gmail API client used by gmail.py.
+
+    Parameters:
+    - message_count (int): Number of messages in the fake inbox.
+    - latency (float): Simulated round-trip time for each HTTP request, in seconds.
+    - per_item_latency (float): Extra server time per message in a batch request, in seconds.
+    - failing_ids (set): Message IDs whose get requests fail.
+    - failing_body_ids (set): Message IDs whose get requests fail for the full message only.
+    - bulk_every (int): Every bulk_every-th message is a newsletter (0 for none).
+    - bytes_per_second (float): Simulated download bandwidth; 0 makes transfers free.
+    """
+
+    def __init__(self, message_count=50, latency=0.05, per_item_latency=0.001, failing_ids=(), bulk_every=0,
+                 bytes_per_second=0, failing_body_ids=()):
+        self.messages = [make_message(index, bulk=bool(bulk_every) and index % bulk_every == 0)
+                         for index in range(message_count)]
+        self.by_id = {msg['id']: msg for msg in self.messages}
+        self.latency = latency
+        self.per_item_latency = per_item_latency
+        self.failing_ids = set(failing_ids)
+        self.failing_body_ids = set(failing_body_ids)
+        self.bytes_per_second = bytes_per_second
+        self.requests = 0
+        self.bytes_sent = 0
+        self.email_address = 'me@example.com'
+        self.history = []
+        self.history_id = 1000 + message_count
+        # History IDs older than this have expired, and history().list answers them with a 404
+        self.oldest_history_id = 0
+
+    def _record(self, **change):
+        self.history_id += 1
+        self.history.append({'id': str(self.history_id), **change})
+
+    def add_message(self, message):
+        """Delivers a message (e.g. from make_message), newest first like the messages().list order."""
+        message = {**message, 'historyId': str(self.history_id + 1)}
+        self.messages.insert(0, message)
+        self.by_id[message['id']] = message
+        self._record(messagesAdded=[{'message': {'id': message['id'], 'labelIds': message['labelIds']}}])
+
+    def delete_message(self, message_id):
+        message = self.by_id.pop(message_id)
+        self.messages.remove(message)
+        self._record(messagesDeleted=[{'message': {'id': message_id}}])
+
+    def set_inbox(self, message_id, in_inbox):
+        """Moves a message into the inbox or archives it."""
+        message = self.by_id[message_id]
+        labels = [label for label in message['labelIds'] if label != 'INBOX']
+        message['labelIds'] = ['INBOX'] + labels if in_inbox else labels
+        change = {'message': {'id': message_id, 'labelIds': message['labelIds']}, 'labelIds': ['INBOX']}
+        self._record(**{'labelsAdded' if in_inbox else 'labelsRemoved': [change]})
+
+    def transfer_time(self, response):
+        """Counts the JSON size of a response and returns the time it takes to download."""
+        size = len(json.dumps(response))
+        self.bytes_sent += size
+        return size / self.bytes_per_second if self.bytes_per_second else 0
+
+    def users(self):
+        return _Users(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _BatchRequest(self, callback)
@@ -0,0 +1,299 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from dateutil import parser as date_parser
+from dateutil import tz
+from googleapiclient.errors import HttpError
+
+# Seconds during which queries are answered from the store without asking the API for changes
+CALENDAR_SYNC_INTERVAL = int(os.getenv('CALENDAR_SYNC_INTERVAL', '30'))
+
+# How far back the first (full) sync goes; later syncs only fetch changes
+CALENDAR_SYNC_PAST_DAYS = int(os.getenv('CALENDAR_SYNC_PAST_DAYS', '365'))
+
+# How far ahead the full sync goes. Recurring events are expanded into their instances, so without a horizon
+# an endless series would be listed forever
+CALENDAR_SYNC_FUTURE_DAYS = int(os.getenv('CALENDAR_SYNC_FUTURE_DAYS', '365'))
+
+# Largest page the Calendar API returns
+SYNC_PAGE_SIZE = 2500
+
+
+def event_bounds(event, default_timezone='UTC'):
+    """
+    Returns the start and end of a Calendar API event as UTC epoch seconds.
+    All-day events ('date' instead of 'dateTime') span whole days in the calendar's timezone.
+    """
+    bounds = []
+    for key in ('start', 'end'):
+        moment = event[key]
+        if 'dateTime' in moment:
+            bounds.append(date_parser.isoparse(moment['dateTime']).timestamp())
+        else:
+            zone = tz.gettz(moment.get('timeZone') or default_timezone)
+            bounds.append(datetime.fromisoformat(moment['date']).replace(tzinfo=zone).timestamp())
+    return bounds[0], bounds[1]
+
+
+class IntervalIndex:
+    """
+    A static interval tree over half-open intervals [start, end), stored as arrays sorted by start together
+    with the maximum end of every implicit subtree. Lookups visit O(log n + k) nodes for k results.
+
+    Parameters:
+    - intervals (list): (start, end, key) tuples with numeric bounds, e.g. UTC epoch seconds.
+    """
+
+    def __init__(self, intervals):
+        intervals = sorted(intervals, key=lambda interval: (interval[0], interval[1]))
+        self.starts = [interval[0] for interval in intervals]
+        self.ends = [interval[1] for interval in intervals]
+        self.keys = [interval[2] for interval in intervals]
+        self.max_ends = [float('-inf')] * len(intervals)
+        self._build(0, len(intervals))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _build(self, lo, hi):
+        # The node of the range [lo, hi) is its middle element, and its subtrees are the two halves
+        if lo >= hi:
+            return float('-inf')
+        mid = (lo + hi) // 2
+        self.max_ends[mid] = max(self.ends[mid], self._build(lo, mid), self._build(mid + 1, hi))
+        return self.max_ends[mid]
+
+    def _positions(self, start, end):
+        """Returns the sorted positions of the intervals overlapping [start, end)."""
+        positions = []
+        stack = [(0, len(self.keys))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self.max_ends[mid] <= start or self.starts[lo] >= end:
+                # Nothing in this subtree ends after `start`, or everything in it starts after `end`
+                continue
+            stack.append((lo, mid))
+            stack.append((mid + 1, hi))
+            if self.starts[mid] < end and self.ends[mid] > start:
+                positions.append(mid)
+        positions.sort()
+        return positions
+
+    def overlapping(self, start, end):
+        """Returns the keys of the intervals overlapping [start, end), in order of start."""
+        return [self.keys[position] for position in self._positions(start, end)]
+
+    def busy_periods(self, start, end):
+        """Returns the merged (start, end) periods of the window during which at least one interval is active."""
+        merged = []
+        for position in self._positions(start, end):
+            period_start, period_end = max(self.starts[position], start), min(self.ends[position], end)
+            if merged and period_start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], period_end)
+            else:
+                merged.append([period_start, period_end])
+        return [tuple(period) for period in merged]
+
+    def free_slots(self, start, end, duration, limit=None):
+        """
+        Finds the gaps of at least `duration` between the intervals within [start, end).
+
+        Returns:
+        - list: (start, end) tuples of the free periods, in order.
+        """
+        slots = []
+        cursor = start
+        for busy_start, busy_end in self.busy_periods(start, end) + [(end, end)]:
+            if busy_start - cursor >= duration:
+                slots.append((cursor, busy_start))
+                if limit and len(slots) >= limit:
+                    break
+            cursor = max(cursor, busy_end)
+        return slots
+
+
+class CalendarEventStore:
+    """
+    A local read-through copy of one calendar, kept up to date with incremental sync tokens.
+
+    The first sync lists every event from CALENDAR_SYNC_PAST_DAYS ago to CALENDAR_SYNC_FUTURE_DAYS ahead page by
+    page; later syncs only fetch the changes since the last sync token, and an expired token (HTTP 410) triggers
+    a new full sync. So do syncs once half of the future window has passed, since the instances of recurring events
+    that enter the window are not changes. Queries are answered from an interval index over the events, syncing
+    first if the last sync is older than `sync_interval`.
+
+    Parameters:
+    - pool (ServicePool): Provides Calendar API clients of the account.
+    - calendar_id (str): The calendar to mirror.
+    - sync_interval (int): Seconds during which the store is considered fresh.
+    """
+
+    def __init__(self, pool, calendar_id='primary', sync_interval=CALENDAR_SYNC_INTERVAL):
+        self.pool = pool
+        self.calendar_id = calendar_id
+        self.sync_interval = sync_interval
+        self.events = {}
+        self.sync_token = None
+        # End of the window of the last full sync, as UTC epoch seconds
+        self.horizon = None
+        self.timezone = 'UTC'
+        self.synced_at = None
+        self.index = IntervalIndex([])
+        self.lock = threading.Lock()
+
+    def _list_all(self, service, **params):
+        """Lists every page of a request and returns the items and the next sync token."""
+        items = []
+        page_token = None
+        while True:
+            response = service.events().list(
+                calendarId=self.calendar_id, singleEvents=True, maxResults=SYNC_PAGE_SIZE, pageToken=page_token,
+                **params).execute()
+            items.extend(response.get('items', []))
+            self.timezone = response.get('timeZone', self.timezone)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return items, response.get('nextSyncToken')
+
+    def _full_sync(self, service):
+        now = datetime.utcnow()
+        time_min = (now - timedelta(days=CALENDAR_SYNC_PAST_DAYS)).isoformat() + 'Z'
+        time_max = now + timedelta(days=CALENDAR_SYNC_FUTURE_DAYS)
+        items, sync_token = self._list_all(service, timeMin=time_min, timeMax=time_max.isoformat() + 'Z')
+        self.events = {item['id']: item for item in items if item.get('status') != 'cancelled'}
+        self.sync_token = sync_token
+        self.horizon = time_max.replace(tzinfo=tz.UTC).timestamp()
+        print(f'Calendar full sync: {len(self.events)} events')
+
+    def _incremental_sync(self, service):
+        items, sync_token = self._list_all(service, syncToken=self.sync_token)
+        # Readers don't take the lock, so the changes are applied to a copy that replaces the events at once
+        events = dict(self.events)
+        for item in items:
+            if item.get('status') == 'cancelled':
+                events.pop(item['id'], None)
+            else:
+                events[item['id']] = item
+        self.events = events
+        self.sync_token = sync_token
+        if items:
+            print(f'Calendar incremental sync: {len(items)} changes')
+
+    def _rebuild_index(self):
+        intervals = []
+        for event_id, event in self.events.items():
+            try:
+                start, end = event_bounds(event, self.timezone)
+            except (KeyError, ValueError):
+                continue
+            intervals.append((start, end, event_id))
+        self.index = IntervalIndex(intervals)
+
+    def sync(self, force=False):
+        """Fetches the changes since the last sync, unless the store was synced less than `sync_interval` ago."""
+        with self.lock:
+            if not force and self.synced_at is not None and time.monotonic() - self.synced_at < self.sync_interval:
+                return
+            with self.pool.lease() as service:
+                # Sync tokens can't be combined with a time window, so moving the window takes a full sync
+                window_moved = (self.horizon is not None
+                                and self.horizon - time.time() < CALENDAR_SYNC_FUTURE_DAYS * 86400 / 2)
+                if self.sync_token is None or window_moved:
+                    self._full_sync(service)
+                else:
+                    try:
+                        self._incremental_sync(service)
+                    except HttpError as error:
+                        # The sync token expired: start over
+                        if getattr(error.resp, 'status', None) != 410:
+                            raise
+                        print('Calendar sync token expired, running a full sync.')
+                        self._full_sync(service)
+            self._rebuild_index()
+            self.synced_at = time.monotonic()
+
+    def upsert(self, event):
+        """Adds or updates an event written by this app, so it is visible before the next sync."""
+        self.upsert_many([event])
+
+    def upsert_many(self, events):
+        """Adds or updates several events at once, rebuilding the index a single time."""
+        if not events:
+            return
+        with self.lock:
+            self.events = {**self.events, **{event['id']: event for event in events}}
+            self._rebuild_index()
+
+    def events_between(self, start, end):
+        """
+        Returns the events overlapping a time range, in order of start.
+
+        Parameters:
+        - start (datetime): Start of the range (timezone-aware).
+        - end (datetime): End of the range (timezone-aware).
+        """
+        self.sync()
+        index, events = self.index, self.events
+        return [events[event_id] for event_id in index.overlapping(start.timestamp(), end.timestamp()) if event_id in events]
+
+    def conflicts(self, start, end):
+        """Returns the events overlapping a proposed event."""
+        return self.events_between(start, end)
+
+    def free_slots(self, start, end, duration, day_start=9, day_end=17, weekdays_only=True, limit=10):
+        """
+        Finds free periods of at least `duration` within working hours.
+
+        Parameters:
+        - start (datetime): Start of the search window (timezone-aware; its timezone defines the working hours).
+        - end (datetime): End of the search window.
+        - duration (timedelta): Minimum length of a slot.
+        - day_start (int): Hour at which the working day starts.
+        - day_end (int): Hour at which the working day ends.
+        - weekdays_only (bool): Skip Saturdays and Sundays.
+        - limit (int): Maximum number of slots returned.
+
+        Returns:
+        - list: (start, end) tuples of timezone-aware datetimes.
+        """
+        self.sync()
+        index = self.index
+        zone = start.tzinfo
+        slots = []
+        day = start.date()
+        while day <= end.date() and len(slots) < limit:
+            if not (weekdays_only and day.weekday() >= 5):
+                window_start = max(start, datetime(day.year, day.month, day.day, day_start, tzinfo=zone))
+                window_end = min(end, datetime(day.year, day.month, day.day, day_end, tzinfo=zone))
+                if window_end > window_start:
+                    for slot_start, slot_end in index.free_slots(
+                            window_start.timestamp(), window_end.timestamp(), duration.total_seconds(), limit - len(slots)):
+                        slots.append((datetime.fromtimestamp(slot_start, zone), datetime.fromtimestamp(slot_end, zone)))
+            day += timedelta(days=1)
+        return slots
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_event_store(pool, calendar_id='primary'):
+    """Returns the process-wide event store of a calendar of the pool's account."""
+    key = (pool.manager.token_file, calendar_id)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = CalendarEventStore(pool, calendar_id)
+        return store
+
+
+def drop_event_stores(token_file):
+    """Forgets the event stores of an account, e.g. when its last session is evicted."""
+    with _stores_lock:
+        for key in [key for key in _stores if key[0] == token_file]:
+            del _stores[key]
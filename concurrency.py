@@ -0,0 +1,98 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class RateLimiter:
+    """
+    A thread-safe token bucket that limits how many requests per minute are sent to an endpoint.
+
+    Parameters:
+    - requests_per_minute (int): Sustained number of requests allowed per minute.
+    - burst (int): Maximum number of requests that can be sent back to back. Defaults to requests_per_minute.
+    """
+
+    def __init__(self, requests_per_minute, burst=None):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst or requests_per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Blocks until `tokens` requests may be sent."""
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def iter_completed(func, items, max_workers=4, rate_limiter=None, cost=1):
+    """
+    Runs `func` on every item with at most `max_workers` calls in flight, yielding results as they finish.
+
+    Items are taken from `items` only as workers become free, so a generator of items (e.g. chunks of a
+    large file) is never held in memory as a whole.
+
+    Parameters:
+    - func (callable): Function called with a single item.
+    - items (iterable): Items to process.
+    - max_workers (int): Maximum number of concurrent calls.
+    - rate_limiter (RateLimiter): Optional limiter acquired before each call.
+    - cost (int): Number of rate limiter tokens each call consumes.
+
+    Yields:
+    - tuple: (index, result, error) where index is the item's position in `items` and error is
+      the exception raised by `func` (or None if it succeeded).
+    """
+    max_workers = max(1, max_workers)
+    items = enumerate(items)
+
+    def call(item):
+        if rate_limiter is not None:
+            rate_limiter.acquire(cost)
+        return func(item)
+
+    def submit_next(executor, pending):
+        for index, item in items:
+            # Each call runs in a copy of the caller's context, so e.g. the active user session carries over to the workers
+            pending[executor.submit(contextvars.copy_context().run, call, item)] = index
+            return True
+        return False
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        while len(pending) < max_workers and submit_next(executor, pending):
+            pass
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                # Keep the workers busy before handing the result to the caller
+                submit_next(executor, pending)
+                try:
+                    yield index, future.result(), None
+                except Exception as error:
+                    yield index, None, error
+
+
+def run_concurrently(func, items, max_workers=4, rate_limiter=None, cost=1):
+    """
+    Runs `func` on every item concurrently and returns the outcomes in the same order as `items`.
+
+    Returns:
+    - list: One (result, error) tuple per item.
+    """
+    items = list(items)
+    outcomes = [None] * len(items)
+    for index, result, error in iter_completed(func, items, max_workers, rate_limiter, cost):
+        outcomes[index] = (result, error)
+    return outcomes
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class ContentCache:
+    """
+    A thread-safe LRU cache for downloaded file contents, limited by total size in bytes,
+    with an optional on-disk tier that survives app restarts.
+
+    Entries are keyed by the file ID together with a version string (e.g. the file's
+    modifiedTime or md5Checksum), so a changed file never returns stale contents.
+
+    Parameters:
+    - max_bytes (int): Maximum total size of the in-memory entries.
+    - disk_dir (str): Optional directory where entries are also stored on disk.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        # Per-key [lock, number of threads holding or waiting for it]; an entry is removed when nobody uses it
+        self.key_locks = {}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, file_id, version):
+        digest = hashlib.sha256(f"{file_id}:{version}".encode('utf-8')).hexdigest()
+        return os.path.join(self.disk_dir, digest)
+
+    @contextmanager
+    def key_lock(self, file_id, version):
+        """Holds a lock dedicated to this file version for a with block, to avoid downloading the same file concurrently."""
+        key = (file_id, version)
+        with self.lock:
+            entry = self.key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self.lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self.key_locks[key]
+
+    def get(self, file_id, version):
+        """Returns the cached contents (bytes) for this file version, or None if they are not cached."""
+        key = (file_id, version)
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+        if self.disk_dir:
+            path = self._disk_path(file_id, version)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    data = f.read()
+                # Promote the entry back into memory
+                self._store(key, data)
+                with self.lock:
+                    self.hits += 1
+                return data
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def peek(self, file_id, version):
+        """Returns the in-memory contents for this file version without touching the LRU order or the counters."""
+        with self.lock:
+            return self.entries.get((file_id, version))
+
+    def put(self, file_id, version, data):
+        """Stores the contents (bytes) for this file version."""
+        self._store((file_id, version), data)
+        if self.disk_dir:
+            path = self._disk_path(file_id, version)
+            # Write to a temporary file first so readers never see a partial entry
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+    def _store(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.entries[key] = data
+            self.size += len(data)
+            # Evict the least recently used entries until we're back under the limit
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self):
+        """Returns the hit/miss counters and the current in-memory size."""
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries), "bytes": self.size}
@@ -0,0 +1,180 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from io import BytesIO
+
+import docx2txt
+from PyPDF2 import PdfReader
+
+from content_cache import ContentCache
+
+PDF_MIME_TYPE = 'application/pdf'
+DOCX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+# Limits on what is extracted from an upload and passed on to the agent
+DOCUMENT_MAX_PAGES = int(os.getenv('DOCUMENT_MAX_PAGES', '200'))
+DOCUMENT_MAX_CHARS = int(os.getenv('DOCUMENT_MAX_CHARS', '30000'))
+
+# PDFs with at least this many pages are extracted by a pool of processes. Every batch of pages sends the
+# whole file to a worker, so there are only PDF_TASKS_PER_WORKER batches per worker
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', '24'))
+PDF_TASKS_PER_WORKER = 2
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# How the worker processes are started. Forking a process that runs threads (like a Streamlit server) can
+# deadlock the child on a lock held by another thread, so the workers are started fresh ('spawn' or 'forkserver')
+PDF_START_METHOD = os.getenv('PDF_START_METHOD', 'spawn')
+
+# Number of documents extracted in the background at the same time, across sessions
+EXTRACTION_JOBS = int(os.getenv('EXTRACTION_JOBS', '2'))
+
+# Extracted text keyed by the SHA-256 of the uploaded file, so the same upload is never extracted twice
+document_text_cache = ContentCache(
+    max_bytes=int(os.getenv('DOCUMENT_CACHE_MAX_BYTES', str(32 * 1024 * 1024))),
+    disk_dir=os.getenv('DOCUMENT_CACHE_DIR'))
+
+_pool = None
+_job_executor = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Returns the process pool shared by all sessions, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context(PDF_START_METHOD))
+        return _pool
+
+
+def _get_job_executor():
+    """Returns the threads running background extractions, started on first use."""
+    global _job_executor
+    with _pool_lock:
+        if _job_executor is None:
+            _job_executor = ThreadPoolExecutor(max_workers=EXTRACTION_JOBS, thread_name_prefix='extraction')
+        return _job_executor
+
+
+def _extract_pdf_pages(data: bytes, start: int, stop: int) -> list:
+    """Extracts the text of pages start..stop-1. Runs in a worker process, so it must stay a module-level function."""
+    reader = PdfReader(BytesIO(data))
+    return [reader.pages[number].extract_text() or '' for number in range(start, stop)]
+
+
+def _extract_pdf(data: bytes, max_pages: int, progress=None) -> str:
+    reader = PdfReader(BytesIO(data))
+    page_count = min(len(reader.pages), max_pages)
+    if progress:
+        progress(0, page_count)
+
+    if page_count < PDF_PARALLEL_MIN_PAGES or PDF_WORKERS <= 1:
+        pages = []
+        for number in range(page_count):
+            pages.append(reader.pages[number].extract_text() or '')
+            if progress:
+                progress(number + 1, page_count)
+        return '\n'.join(pages)
+
+    # Pages are parsed in parallel processes, since PDF parsing is pure Python and holds the GIL
+    pages = [None] * page_count
+    done = 0
+    pool = _get_pool()
+    batch_size = -(-page_count // (PDF_WORKERS * PDF_TASKS_PER_WORKER))
+    futures = {
+        pool.submit(_extract_pdf_pages, data, start, min(start + batch_size, page_count)): start
+        for start in range(0, page_count, batch_size)
+    }
+    for future in as_completed(futures):
+        start = futures[future]
+        texts = future.result()
+        pages[start:start + len(texts)] = texts
+        done += len(texts)
+        if progress:
+            progress(done, page_count)
+    return '\n'.join(pages)
+
+
+def extract_document_text(data: bytes, mime_type: str, max_pages: int = None, max_chars: int = None,
+                          progress=None) -> str:
+    """
+    Extracts the text of an uploaded PDF or DOCX file.
+
+    Large PDFs are split into batches of pages that are extracted by a process pool shared by all sessions.
+    The result is cached by the file's hash, so submitting the same file again returns at once.
+
+    Parameters:
+    - data (bytes): The contents of the file.
+    - mime_type (str): PDF_MIME_TYPE or DOCX_MIME_TYPE.
+    - max_pages (int): Only the first pages of a PDF are extracted. Defaults to DOCUMENT_MAX_PAGES.
+    - max_chars (int): Maximum length of the returned text. Defaults to DOCUMENT_MAX_CHARS.
+    - progress (callable): Optional function called with (pages_done, page_count) as PDF pages are extracted.
+
+    Returns:
+    - str: The extracted text.
+
+    Raises:
+    - ValueError: If the file type is not supported.
+    """
+    max_pages = max_pages or DOCUMENT_MAX_PAGES
+    max_chars = max_chars or DOCUMENT_MAX_CHARS
+    if mime_type not in (PDF_MIME_TYPE, DOCX_MIME_TYPE):
+        raise ValueError(f"Unsupported file type {mime_type}. Upload a PDF or DOCX file.")
+
+    digest = hashlib.sha256(data).hexdigest()
+    # The page cap changes what is extracted, so it is part of the cache version
+    version = f"{mime_type}:{max_pages}"
+    with document_text_cache.key_lock(digest, version):
+        cached = document_text_cache.get(digest, version)
+        if cached is not None:
+            text = cached.decode('utf-8')
+        else:
+            if mime_type == PDF_MIME_TYPE:
+                text = _extract_pdf(data, max_pages, progress)
+            else:
+                text = docx2txt.process(BytesIO(data))
+            document_text_cache.put(digest, version, text.encode('utf-8'))
+
+    if len(text) > max_chars:
+        print(f'Document text cut from {len(text)} to {max_chars} characters')
+        text = text[:max_chars]
+    return text
+
+
+class ExtractionJob:
+    """
+    A document extraction running in a background thread, so the caller (e.g. a Streamlit script) can do other
+    work meanwhile. The progress is read from `pages_done` and `page_count`, which the caller can poll from its
+    own thread to update the page.
+
+    Parameters:
+    - data (bytes): The contents of the file.
+    - mime_type (str): PDF_MIME_TYPE or DOCX_MIME_TYPE.
+    - max_pages (int): See extract_document_text.
+    - max_chars (int): See extract_document_text.
+    """
+
+    def __init__(self, data, mime_type, max_pages=None, max_chars=None):
+        self.pages_done = 0
+        self.page_count = 0
+        self.future = _get_job_executor().submit(
+            extract_document_text, data, mime_type, max_pages, max_chars, self._progress)
+
+    def _progress(self, done, total):
+        self.pages_done, self.page_count = done, total
+
+    def wait(self, timeout=None):
+        """Waits at most `timeout` seconds and returns whether the extraction has finished."""
+        done, _ = wait([self.future], timeout=timeout)
+        return bool(done)
+
+    def result(self):
+        """Returns the extracted text, waiting for it if needed, or raises the extraction's error."""
+        return self.future.result()
+
+
+def start_document_extraction(data: bytes, mime_type: str, max_pages: int = None, max_chars: int = None) -> ExtractionJob:
+    """Starts extracting the text of an uploaded PDF or DOCX file in the background and returns the job."""
+    return ExtractionJob(data, mime_type, max_pages, max_chars)
@@ -1,7 +1,3 @@
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
 import os.path
 from googleapiclient.errors import HttpError
 
@@ -13,34 +9,15 @@ from googleapiclient.http import MediaIoBaseDownload
 import os
 from dotenv import load_dotenv
 import json
+from authenticate import get_drive_service
 
 # Define the scopes
 SCOPES = ['https://www.googleapis.com/auth/drive']
 
 def authenticate_drive_api():
-    """Authenticates and returns the Google Drive API service instance."""
-    creds = None
-    # Token file stores user's access and refresh tokens
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    # If credentials are invalid or don't exist, log the user in
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            # Use InstalledAppFlow.from_client_secrets_file()
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'client_secret-agents.json',
-                scopes=SCOPES,
-                redirect_uri='http://localhost:8080/')
-            # Use run_local_server() with the specified port
-            creds = flow.run_local_server(port=8080)
-        # Save the credentials for future runs
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-    # Build the Drive API service
-    service = build('drive', 'v3', credentials=creds)
-    return service
+    """Returns the Google Drive API service instance of the active session's account."""
+    # The session's credentials are loaded once per account and refreshed before they expire
+    return get_drive_service()
 
 
 
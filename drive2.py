@@ -1,7 +1,3 @@
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
 import os.path
 from googleapiclient.errors import HttpError
 
@@ -13,7 +9,18 @@ from googleapiclient.http import MediaIoBaseDownload
 import os
 from dotenv import load_dotenv
 import json
-from authenticate import get_drive_service 
+import re
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from authenticate import lease_drive_service, current_session_id, use_session
+from concurrency import iter_completed
+from content_cache import ContentCache
+from file_ranking import FileIndex
+from llm import LLM_MODEL_NAME, structured_completion
+from openai import OpenAIError
+from llm_cache import cached_kickoff, get_response_cache
+from models import AnalysisReport, DriveFile
+from token_budget import DOCUMENT_BUDGET_STRATEGY, DOCUMENT_TOKEN_BUDGET, fit_to_budget
+from pydantic import BaseModel, Field
 
 
 # Define the scopes
@@ -46,47 +53,67 @@ from authenticate import get_drive_service
 
 
 
-@tool("Extract Files From Google Drive Folder")
-def extract_files_from_folder_tool(folder_id: str) -> str:
-    """
-    Extracts all files from a Google Drive folder and returns their names and IDs in a formatted string.
-    
-    Parameters:
-    - folder_id (str): The ID of the folder from which to extract all files. Extract this ID from the folder URL. Example: '1aB2cDe3FgHiJk4LmNOpQr5StUv6WxYz' from 'https://drive.google.com/drive/folders/1aB2cDe3FgHiJk4LmNOpQr5StUv6WxYz'
+# Listing settings: Drive allows up to 1000 items per page, and we only ask for the fields we use
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+LIST_PAGE_SIZE = 1000
+LIST_FIELDS = 'nextPageToken, files(id, name, mimeType)'
+# Also lists the fields that identify a file's contents, used as cache versions
+VERSION_LIST_FIELDS = 'nextPageToken, files(id, name, mimeType, modifiedTime, md5Checksum)'
 
-    Returns:
-    - A string formatted like a dict: "{file_url_1: [file_name_1, file_id_1], file_url_2: [file_name_2, file_id_2]}"
-      Example: "{'https://drive.google.com/file/d/FILE_ID': ['File Name', 'FILE_ID']}"
-    """
-    
-    # Authenticate Google Drive API service
-    drive_service = get_drive_service()
-
-    try:
-        # Search for all files in the folder
-        query = f"'{folder_id}' in parents"
-        results = drive_service.files().list(
-            q=query,
+def _list_folder_page(folder_id: str, page_token: str = None, fields: str = LIST_FIELDS, session_id: str = None) -> dict:
+    """Lists one page of the items directly inside a folder, with the Drive account of the given (or current) session."""
+    with lease_drive_service(session_id) as drive_service:
+        return drive_service.files().list(
+            q=f"'{folder_id}' in parents and trashed = false",
             spaces='drive',
-            fields='files(id, name)',
-            pageSize=100).execute()
-        
-        items = results.get('files', [])
+            fields=fields,
+            pageSize=LIST_PAGE_SIZE,
+            pageToken=page_token).execute()
 
-        if not items:
-            return "No files found."
-
-        # Create a dict-like string containing the file URLs, names, and IDs
-        file_dict = {
-            f"https://drive.google.com/file/d/{file['id']}": [file['name'], file['id']]
-            for file in items
-        }
-
-        return str(file_dict)
+def iter_folder_files(folder_id: str, recursive: bool = False, max_concurrent_lists: int = 4, fields: str = LIST_FIELDS):
+    """
+    Lists the items of a Google Drive folder page by page, yielding each item's metadata as soon as its page arrives.
 
-    except HttpError as error:
-        return f"An error occurred: {error}"
+    Parameters:
+    - folder_id (str): The ID of the folder to list.
+    - recursive (bool): Also list the contents of all subfolders.
+    - max_concurrent_lists (int): Maximum number of list requests in flight when listing recursively.
+    - fields (str): The `fields` selector of the list request. Must include nextPageToken, and mimeType when recursive.
 
+    Yields:
+    - DriveFile: The metadata of each item (including subfolders).
+    """
+    if not recursive:
+        page_token = None
+        while True:
+            results = _list_folder_page(folder_id, page_token, fields)
+            for item in results.get('files', []):
+                yield DriveFile.from_api(item)
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return
+
+    # Each pending request lists one page of one folder; subfolders and next pages are queued as they are discovered.
+    # The listing threads don't share our context, so they are given the session explicitly
+    session_id = current_session_id()
+    seen_folders = {folder_id}
+    with ThreadPoolExecutor(max_workers=max_concurrent_lists) as executor:
+        pending = {executor.submit(_list_folder_page, folder_id, None, fields, session_id): folder_id}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                current_folder = pending.pop(future)
+                results = future.result()
+
+                page_token = results.get('nextPageToken')
+                if page_token:
+                    pending[executor.submit(_list_folder_page, current_folder, page_token, fields, session_id)] = current_folder
+
+                for item in results.get('files', []):
+                    if item.get('mimeType') == FOLDER_MIME_TYPE and item['id'] not in seen_folders:
+                        seen_folders.add(item['id'])
+                        pending[executor.submit(_list_folder_page, item['id'], None, fields, session_id)] = item['id']
+                    yield DriveFile.from_api(item)
 
 
 # Load environment variables
@@ -97,19 +124,48 @@ os.environ['OPENAI_API_KEY'] = os.getenv('GROQ_API_KEY')
 os.environ['OPENAI_MODEL_NAME'] = 'llama-3.1-70b-versatile'
 os.environ['OPENAI_API_BASE'] = 'https://api.groq.com/openai/v1'
 
-# Define function to call the agent and get the dictionary output
-def extract_filtered_files(folder_link: str, query: str) -> dict:
+# 'fast' analyzes each file with a single structured LLM call, 'crew' uses the three-agent crew
+ANALYSIS_MODES = ('fast', 'crew')
+ANALYSIS_MODE = os.getenv('ANALYSIS_MODE', 'fast')
+
+# Number of files analyzed at the same time when generating folder reports
+DRIVE_REPORT_WORKERS = int(os.getenv('DRIVE_REPORT_WORKERS', '4'))
+
+# Pre-filter settings: files scoring at least CONFIDENT are kept without asking the agent,
+# files scoring between AMBIGUOUS and CONFIDENT are sent to the agent to decide
+FILTER_TOP_K = int(os.getenv('DRIVE_FILTER_TOP_K', '20'))
+FILTER_CONFIDENT_SCORE = 0.8
+FILTER_AMBIGUOUS_SCORE = 0.3
+# Number of files listed in each of the agent's prompts when nothing matches locally
+FILTER_MAX_AGENT_FILES = 200
+
+def extract_folder_id(folder_link: str) -> str:
+    """Returns the folder ID from a Google Drive folder link (or the input itself if it is already an ID)."""
+    match = re.search(r'/folders/([\w-]+)', folder_link) or re.search(r'[?&]id=([\w-]+)', folder_link)
+    return match.group(1) if match else folder_link.strip()
+
+def filter_files_with_agent(files: list, query: str) -> list:
+    """
+    Asks the filtering agent which of the given files are related to the query.
+
+    Parameters:
+    - files (list): DriveFile records.
+    - query (str): The query for filtering files.
+
+    Returns:
+    - list: The DriveFile records chosen by the agent, in the order of files.
+    """
+    file_list = "\n".join(f"- {file.name} (id: {file.id})" for file in files)
+
     # Identifier Agent
     gdrive_agent = Agent(
         role='Google Drive Files Extractor', 
-        goal=f"""Extract list of Google Drive Files from this folder {folder_link} and return the names and ids of those files which are related to: {query}. 
-                Use the tool provided to you for files extraction and ONLY your own reasoning skills for files filtering (no tool needed). Invoking the tool  just once
-                is enough to extract the files. Don't invoke the tool multiple times.""",
+        goal=f"""From the list of Google Drive files provided to you, return the names and ids of those files which are related to: {query}. 
+                Use ONLY your own reasoning skills for files filtering (no tool needed).""",
         verbose=True,
         memory=True,
-        tools=[extract_files_from_folder_tool],
         backstory=(
-            """Your task is to extract the list of files from the Google Drive folder with the provided folder ID and return the names and IDs of the files
+            """Your task is to go through a list of files from a Google Drive folder and return the names and IDs of the files
             which seem related to the topic provided. This will help users filter out relevant files from their Google Drive folders and use them as per 
             their needs."""
         ),
@@ -118,7 +174,8 @@ def extract_filtered_files(folder_link: str, query: str) -> dict:
 
     # Identification Task
     gdrive_task = Task(
-        description=f"""Extract list of Google Drive Files from this folder {folder_link} and return the names and ids of those files which are related to: {query}""",
+        description=f"""Return the names and ids of the files from this list which are related to: {query}
+        {file_list}""",
         expected_output='A python dict containing all filtered files using this format for the keys and values: "file name": "file id".',
         agent=gdrive_agent,
         async_execution=False,  # Set to synchronous execution
@@ -132,7 +189,7 @@ def extract_filtered_files(folder_link: str, query: str) -> dict:
     )
     
     # Kick off the crew and retrieve the result
-    crew_output = crew.kickoff(inputs={'folder_link': folder_link, 'query': query})
+    crew_output = cached_kickoff(crew, inputs={'query': query})
     
     # Try to extract the output from json_dict
     if crew_output.json_dict:
@@ -144,10 +201,71 @@ def extract_filtered_files(folder_link: str, query: str) -> dict:
             output_dict = json.loads(result_str)
         except json.JSONDecodeError as e:
             raise ValueError(f"Error parsing the agent's output into a dictionary: {e}")
-    
-    return output_dict
 
+    # Only keep files that were actually offered to the agent
+    chosen_ids = set(output_dict.values())
+    return [file for file in files if file.id in chosen_ids]
 
+# Define function to filter the folder's files and get the dictionary output
+def extract_filtered_files(folder_link: str, query: str, top_k: int = FILTER_TOP_K, use_agent: bool = True,
+                           use_snippets: bool = True) -> list:
+    """
+    Lists the files of a Google Drive folder and returns those related to the query.
+
+    The files are first ranked locally against the query (file names, MIME types and, if available,
+    snippets of already downloaded contents). Clear matches are kept directly and only the ambiguous
+    candidates are sent to the filtering agent.
+
+    Parameters:
+    - folder_link (str): The Google Drive folder link.
+    - query (str): The query for filtering files.
+    - top_k (int): Maximum number of files kept from the local ranking.
+    - use_agent (bool): Ask the agent about ambiguous candidates. If False, the local ranking alone decides.
+    - use_snippets (bool): Also rank files on the cached contents of files downloaded in earlier reports.
+
+    Returns:
+    - list: The DriveFile records of the filtered files, clear matches first. Files with the same name are all kept.
+    """
+    # The versions are listed too, so the reports can key their caches without one more request per file
+    files = [file for file in iter_folder_files(extract_folder_id(folder_link), fields=VERSION_LIST_FIELDS)
+             if file.mime_type != FOLDER_MIME_TYPE]
+
+    snippets = {}
+    if use_snippets:
+        for file in files:
+            contents = drive_content_cache.peek(file.id, file.version)
+            if contents is not None:
+                snippets[file.id] = contents[:2000].decode('utf-8', errors='ignore')
+
+    ranked = FileIndex(files, snippets).rank(query, top_k=top_k)
+    confident = [file for score, file in ranked if score >= FILTER_CONFIDENT_SCORE]
+    ambiguous = [file for score, file in ranked if FILTER_AMBIGUOUS_SCORE <= score < FILTER_CONFIDENT_SCORE]
+    print(f'Pre-filter: {len(files)} files, {len(confident)} clear matches, {len(ambiguous)} ambiguous')
+
+    if not use_agent:
+        return confident + ambiguous
+
+    if not confident and not ambiguous:
+        # Nothing matches the query's words, so let the agent judge the files by meaning, a page of files at a time
+        pages = range(0, len(files), FILTER_MAX_AGENT_FILES)
+        if len(pages) > 1:
+            print(f'Asking the agent about {len(files)} files in {len(pages)} pages of {FILTER_MAX_AGENT_FILES}')
+        chosen = []
+        for offset in pages:
+            chosen.extend(filter_files_with_agent(files[offset:offset + FILTER_MAX_AGENT_FILES], query))
+        return chosen
+
+    if ambiguous:
+        return confident + filter_files_with_agent(ambiguous, query)
+    return confident
+
+
+
+
+# Downloaded file contents shared by every agent and report, keyed by file ID and version
+drive_content_cache = ContentCache(
+    max_bytes=int(os.getenv('DRIVE_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+    disk_dir=os.getenv('DRIVE_CACHE_DIR'))
 
 
 class ExtractFileContentsTool:
@@ -160,56 +278,100 @@ class ExtractFileContentsTool:
     The tool identifies the file type (Google Docs, plain text, etc.) and retrieves the textual content accordingly.
     """
 
-    def __init__(self, service):
+    def __init__(self, service, cache=None):
         self.service = service
+        self.cache = cache if cache is not None else drive_content_cache
 
-    def run(self, file_id: str) -> str:
+    def _download(self, request) -> bytes:
+        """Downloads the media of an export/get_media request and returns the raw bytes."""
+        fh = BytesIO()
+        downloader = MediaIoBaseDownload(fh, request)
+
+        done = False
+        while not done:
+            status, done = downloader.next_chunk()
+            print(f'Download progress: {int(status.progress() * 100)}%')
+
+        return fh.getvalue()
+
+    def extract(self, file_id: str) -> str:
         """
-        Executes the tool to extract the contents of the file with the given ID.
+        Extracts the contents of the file with the given ID.
 
         Parameters:
         - file_id (str): The ID of the file in Google Drive.
 
         Returns:
         - The contents of the file as a string.
+
+        Raises:
+        - ValueError: If the file is not a text-based file.
+        - HttpError: If a Drive request fails.
         """
-        try:
-            # Get the file metadata to determine its MIME type
-            file = self.service.files().get(fileId=file_id, fields='mimeType, name').execute()
-            mime_type = file.get('mimeType')
-            file_name = file.get('name')
-
-            print(f'File Name: {file_name}')
-            print(f'MIME Type: {mime_type}')
-
-            # Handle different types of files
-            if mime_type == 'application/vnd.google-apps.document':
-                # Export Google Docs as plain text
-                request = self.service.files().export_media(fileId=file_id, mimeType='text/plain')
-            elif mime_type.startswith('text/'):
-                # Directly download text files
-                request = self.service.files().get_media(fileId=file_id)
+        # Get the file metadata to determine its MIME type and current version
+        file = self.service.files().get(fileId=file_id, fields='mimeType, name, modifiedTime, md5Checksum').execute()
+        mime_type = file.get('mimeType')
+        file_name = file.get('name')
+
+        print(f'File Name: {file_name}')
+        print(f'MIME Type: {mime_type}')
+
+        # Handle different types of files
+        if mime_type == 'application/vnd.google-apps.document':
+            # Export Google Docs as plain text
+            request = self.service.files().export_media(fileId=file_id, mimeType='text/plain')
+        elif mime_type.startswith('text/'):
+            # Directly download text files
+            request = self.service.files().get_media(fileId=file_id)
+        else:
+            # Handle non-text files
+            raise ValueError(f"File '{file_name}' is not a text-based file. Cannot extract contents.")
+
+        # Google Docs have no md5Checksum, so fall back to the modification time
+        version = file.get('md5Checksum') or file.get('modifiedTime')
+        if not version:
+            return self._download(request).decode('utf-8')
+
+        # Hold the per-file lock so agents asking for the same file at once download it only once
+        with self.cache.key_lock(file_id, version):
+            file_contents = self.cache.get(file_id, version)
+            if file_contents is not None:
+                print(f'Using cached contents for {file_name}')
             else:
-                # Handle non-text files
-                return f"File '{file_name}' is not a text-based file. Cannot extract contents."
+                file_contents = self._download(request)
+                self.cache.put(file_id, version, file_contents)
 
-            # Download the file contents
-            fh = BytesIO()
-            downloader = MediaIoBaseDownload(fh, request)
+        # Convert the downloaded bytes to a string
+        return file_contents.decode('utf-8')
 
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-                print(f'Download progress: {int(status.progress() * 100)}%')
+    def run(self, file_id: str) -> str:
+        """
+        Executes the tool to extract the contents of the file with the given ID.
 
-            # Convert the downloaded bytes to a string
-            file_contents = fh.getvalue()
-            text = file_contents.decode('utf-8')
-            return text
+        Parameters:
+        - file_id (str): The ID of the file in Google Drive.
 
+        Returns:
+        - The contents of the file as a string (cut or summarized to the document token budget), or an error message for the agent.
+        """
+        try:
+            return fit_to_budget(
+                self.extract(file_id), DOCUMENT_TOKEN_BUDGET, DOCUMENT_BUDGET_STRATEGY, label=f'file {file_id}', model=LLM_MODEL_NAME)
+        except ValueError as error:
+            return str(error)
         except HttpError as error:
             return f"An error occurred: {error}"
 
+def extract_drive_file_contents(file_id: str) -> str:
+    """Extracts the contents of a Drive file with a client of the current session, returning errors as text."""
+    # Borrow a pre-authenticated Google Drive client for this call
+    with lease_drive_service() as service:
+        # Initialize the file extraction tool
+        file_extractor = ExtractFileContentsTool(service)
+
+        # Extract the contents of the file
+        return file_extractor.run(file_id)
+
 # CrewAI tool wrapper
 @tool("Extract Google Drive File Contents")
 def extract_drive_file_contents_tool(file_id: str) -> str:
@@ -221,14 +383,27 @@ def extract_drive_file_contents_tool(file_id: str) -> str:
     
     The tool will download or export the file and return its textual content if available. Only works for text files, not other types.
     """
-    # Authenticate Google Drive API (service should be pre-authenticated)
-    service = get_drive_service()
+    return extract_drive_file_contents(file_id)
 
-    # Initialize the file extraction tool
-    file_extractor = ExtractFileContentsTool(service)
-    
-    # Extract the contents of the file
-    return file_extractor.run(file_id)
+def make_drive_file_contents_tool(session_id: str):
+    """
+    Returns the file contents tool bound to a session. CrewAI runs asynchronous tasks in threads that don't
+    inherit the caller's context, so crews serving several users need a tool that carries the session itself.
+    """
+    @tool("Extract Google Drive File Contents")
+    def extract_session_file_contents_tool(file_id: str) -> str:
+        """
+        This tool extracts the contents of a file from Google Drive by its file ID and returns them as a string.
+        
+        Parameters:
+        - file_id (str): The unique ID of the file in Google Drive.
+        
+        The tool will download or export the file and return its textual content if available. Only works for text files, not other types.
+        """
+        with use_session(session_id):
+            return extract_drive_file_contents(file_id)
+
+    return extract_session_file_contents_tool
 
 
 from crewai_tools import tool
@@ -250,7 +425,7 @@ def generate_drive_file_link_tool(file_id: str) -> str:
 
 
 # Synchronous function to run the crew and consolidate the report for a single file
-def analyze_and_consolidate_drive_file(file_id: str, file_name: str) -> dict:
+def analyze_and_consolidate_drive_file(file_id: str, file_name: str, version: str = None) -> dict:
     """
     Function to run a crew that extracts contents from a Google Drive file,
     generates a summary, categorizes it, and consolidates the result into a coherent report.
@@ -258,11 +433,15 @@ def analyze_and_consolidate_drive_file(file_id: str, file_name: str) -> dict:
     Parameters:
     - file_id (str): The Google Drive file ID.
     - file_name (str): The name of the Google Drive file.
+    - version (str): The file's md5Checksum or modifiedTime from the listing, used in the response cache key.
+      Looked up if not given and the cache is enabled.
     
     Returns:
     - dict: A dictionary containing the consolidated report with the file name, link, summary, and priority.
     """
-    
+    # The agents read the file with the Drive account of the current session
+    contents_tool = make_drive_file_contents_tool(current_session_id())
+
     # Summarizer Agent
     summarizer = Agent(
         role='Document Summarizer',
@@ -270,7 +449,7 @@ def analyze_and_consolidate_drive_file(file_id: str, file_name: str) -> dict:
                  Then, use your own skills to generate a concise summary of its contents, highlighting only the key information.""",
         verbose=True,
         memory=True,
-        tools=[extract_drive_file_contents_tool],
+        tools=[contents_tool],
         backstory=(
             f"""You're an expert in document analysis and summarization. With your extensive experience, 
             you have developed a unique ability to generate concise and informative summaries of any given document. 
@@ -286,7 +465,7 @@ def analyze_and_consolidate_drive_file(file_id: str, file_name: str) -> dict:
                 Based on its textual content, use your own reasoning skills to categorize it as high, low, or medium priority with brief justification.""",
         verbose=True,
         memory=True,
-        tools=[extract_drive_file_contents_tool],
+        tools=[contents_tool],
         backstory=(
             f"""You're an expert in document analysis and priority detection. You can detect whether a document is of high, low, or medium priority
             based on its contents. Your expertise lies in providing a brief justification for the priority category assigned to the document. 
@@ -357,8 +536,14 @@ def analyze_and_consolidate_drive_file(file_id: str, file_name: str) -> dict:
         process=Process.sequential  # Optional: Sequential task execution is default
     )
 
+    # The agents read the file through a tool, so its current version has to be part of the cache key
+    if version is None and get_response_cache() is not None:
+        with lease_drive_service() as service:
+            file = service.files().get(fileId=file_id, fields='modifiedTime, md5Checksum').execute()
+        version = file.get('md5Checksum') or file.get('modifiedTime')
+
     # Running the crew with input topic
-    crew_output = crew.kickoff(inputs={'file_id': file_id, 'file_name': file_name})
+    crew_output = cached_kickoff(crew, inputs={'file_id': file_id, 'file_name': file_name}, content_hash=version)
 
     # Accessing the output as a JSON dictionary
     if crew_output.json_dict:
@@ -373,29 +558,142 @@ def analyze_and_consolidate_drive_file(file_id: str, file_name: str) -> dict:
             # Fallback to raw output if parsing fails
             return {"raw_output": crew_output.raw}
 
-def process_files_sequentially(folder_link: str, query: str) -> list:
+class DocumentAnalysis(BaseModel):
+    summary: str = Field(description="A concise summary of the document of maximum 100 words.")
+    priority: str = Field(
+        pattern=r'^(High|Medium|Low) Priority: .+',
+        description='A single sentence of the format: "[High/Medium/Low] Priority: [justification]."'
+    )
+
+DOCUMENT_ANALYSIS_PROMPT = """You are an expert in document analysis, summarization and priority detection.
+Analyze the document given to you and respond with a JSON object with exactly these fields:
+"summary": a single concise paragraph of maximum 100 words summarizing the document's contents, highlighting only the key information.
+"priority": a single sentence of the format "[High/Medium/Low] Priority: [justification]." The justification should be no longer than 20 words.
+Only categorize as high priority if it requires immediate attention and has some important deadlines, otherwise go for medium or low priority."""
+
+def analyze_drive_file_fast(file_id: str, file_name: str, contents: str = None) -> dict:
     """
-    Function to extract files from the Google Drive folder, and then process each file sequentially
+    Generates the same report as analyze_and_consolidate_drive_file from a single structured LLM call.
+    The file contents are downloaded (or read from the cache) directly instead of through an agent tool.
+    
+    Parameters:
+    - file_id (str): The Google Drive file ID.
+    - file_name (str): The name of the Google Drive file.
+    - contents (str): The file contents, if they were already extracted.
+    
+    Returns:
+    - dict: A dictionary containing the report with the file name, link, summary, and priority.
+
+    Raises:
+    - ValueError: If the file is not a text-based file or the model's answer is invalid.
+    - OpenAIError: If the LLM request fails.
+    """
+    if contents is None:
+        with lease_drive_service() as service:
+            contents = ExtractFileContentsTool(service).extract(file_id)
+    contents = fit_to_budget(contents, DOCUMENT_TOKEN_BUDGET, DOCUMENT_BUDGET_STRATEGY, label=f'file {file_name}', model=LLM_MODEL_NAME)
+    analysis = structured_completion(
+        DocumentAnalysis,
+        DOCUMENT_ANALYSIS_PROMPT,
+        f"Document {file_name}:\n{contents}",
+        model=LLM_MODEL_NAME)
+    return {
+        "File Name": file_name,
+        "File Link": f"https://drive.google.com/file/d/{file_id}/view",
+        "Document Summary": analysis.summary,
+        "Document Priority": analysis.priority,
+    }
+
+def resolve_analysis_mode(mode: str = None) -> str:
+    """Returns the mode, or ANALYSIS_MODE if none is given, raising ValueError if it isn't one of ANALYSIS_MODES."""
+    mode = mode or ANALYSIS_MODE
+    if mode not in ANALYSIS_MODES:
+        raise ValueError(f"Unknown analysis mode '{mode}'. Use one of: {', '.join(ANALYSIS_MODES)}.")
+    return mode
+
+def analyze_drive_file(file: DriveFile, mode: str = None) -> AnalysisReport:
+    """
+    Generates the report for a file, using the single-call fast path and falling back to the crew if it fails.
+    
+    Parameters:
+    - file (DriveFile): The Google Drive file.
+    - mode (str): 'fast' or 'crew'. Defaults to ANALYSIS_MODE.
+    
+    Returns:
+    - AnalysisReport: The report with the file name, link, summary, and priority.
+    """
+    report = None
+    if resolve_analysis_mode(mode) == 'fast':
+        try:
+            with lease_drive_service() as service:
+                contents = ExtractFileContentsTool(service).extract(file.id)
+        except (ValueError, HttpError) as error:
+            # The crew's tool can't read the file either, so report the error instead of falling back
+            print(f'Could not extract the contents of file {file.name}: {error}')
+            return AnalysisReport('file', file.id, file.name, file.link, error=str(error))
+        try:
+            report = analyze_drive_file_fast(file.id, file.name, contents)
+        except (ValueError, OpenAIError) as error:
+            # Only failed LLM requests and invalid answers are retried with the crew
+            print(f'Fast analysis failed for file {file.name}, falling back to the crew: {error}')
+    if report is None:
+        report = analyze_and_consolidate_drive_file(file.id, file.name, file.version)
+    return AnalysisReport.from_dict(report, 'file', file.id, file.name, file.link)
+
+def iter_file_reports(files: list, max_workers: int = None, mode: str = None):
+    """
+    Runs analyze_drive_file for several files concurrently and yields each report as soon as it finishes.
+
+    Parameters:
+    - files (list): DriveFile records to analyze.
+    - max_workers (int): Maximum number of files analyzed at the same time. Defaults to DRIVE_REPORT_WORKERS.
+    - mode (str): 'fast' (one LLM call per file, crew as fallback) or 'crew'. Defaults to ANALYSIS_MODE.
+
+    Yields:
+    - tuple: (index, report) where index is the file's position in files and report its AnalysisReport.
+      Files whose analysis failed get a report with an error.
+    """
+    files = list(files)
+    max_workers = max_workers or DRIVE_REPORT_WORKERS
+    # Reject an unknown mode once instead of reporting it as the error of every file
+    mode = resolve_analysis_mode(mode)
+
+    def analyze(file):
+        return analyze_drive_file(file, mode=mode)
+
+    for index, report, error in iter_completed(analyze, files, max_workers=max_workers):
+        if error is not None:
+            file = files[index]
+            print(f'Failed to analyze file {file.name}: {error}')
+            report = AnalysisReport('file', file.id, file.name, file.link, error=str(error))
+        yield index, report
+
+def process_files_sequentially(folder_link: str, query: str, max_workers: int = 1, mode: str = None) -> list:
+    """
+    Function to extract files from the Google Drive folder, and then process each file
     to generate summaries, priorities, and consolidated reports for each file.
 
     Parameters:
     - folder_link (str): The Google Drive folder link.
     - query (str): The query for filtering files.
+    - max_workers (int): Maximum number of files analyzed at the same time. 1 processes the files one by one.
+    - mode (str): 'fast' (one LLM call per file, crew as fallback) or 'crew'. Defaults to ANALYSIS_MODE.
 
     Returns:
-    - list: A list of dictionaries containing the consolidated reports for each file.
+    - list: The AnalysisReport of each file, in the order the files were returned by the filtering.
     """
     
     # Extract the files from the folder using Crew Function 1
-    output_dict = extract_filtered_files(folder_link, query)
+    files = extract_filtered_files(folder_link, query)
 
-    # Initialize a list to store results
-    results = []
-    
-    # Loop over each file and process it sequentially
-    for file_name, file_id in output_dict.items():
-        result = analyze_and_consolidate_drive_file(file_id, file_name)
-        results.append(result)
+    # Collect the reports as they finish and put them back in a deterministic order
+    results = [None] * len(files)
+    for index, report in iter_file_reports(files, max_workers=max_workers, mode=mode):
+        results[index] = report
+
+    cache = get_response_cache()
+    if cache is not None:
+        print(f'LLM response cache: {cache.stats()}')
 
     return results
 
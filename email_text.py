@@ -0,0 +1,249 @@
+import base64
+import os
+import re
+from html.parser import HTMLParser
+
+try:
+    # Optional fast engine; the streaming stdlib engine is used when lxml is not installed
+    import lxml.html as lxml_html
+    from lxml.etree import ParserError as LxmlParserError
+except ImportError:
+    lxml_html = None
+    LxmlParserError = ValueError
+
+# 'auto' uses lxml when it is installed and the streaming stripper otherwise; 'stream', 'lxml' and
+# 'bs4' (the original BeautifulSoup get_text, kept for comparison) force an engine
+HTML_ENGINE = os.getenv('EMAIL_HTML_ENGINE', 'auto')
+
+# Maximum number of characters kept from one email body; 0 disables the cap
+MAX_BODY_CHARS = int(os.getenv('EMAIL_MAX_BODY_CHARS', '20000'))
+
+# Elements whose text is never shown to the reader
+SKIPPED_TAGS = {'head', 'style', 'script', 'noscript', 'template', 'title'}
+
+# Elements that start a new line of text
+BLOCK_TAGS = {
+    'address', 'article', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'footer', 'h1', 'h2', 'h3', 'h4', 'h5',
+    'h6', 'header', 'hr', 'li', 'ol', 'p', 'pre', 'section', 'table', 'td', 'th', 'tr', 'ul',
+}
+
+# Block elements without an end tag
+VOID_TAGS = {'br', 'hr'}
+
+# XML declaration some mailers put before the HTML; lxml refuses str input that starts with one
+XML_DECLARATION = re.compile(r'^\s*<\?xml[^>]*\?>', re.IGNORECASE)
+
+# Lines that start the quoted previous message of a reply in plain text. Forwarded messages are kept,
+# since their content is usually what the email is about
+QUOTE_HEADER = re.compile(
+    r'^(On .{0,200}wrote:|-{2,}\s*Original Message\s*-{2,}|From: .+\nSent: )',
+    re.MULTILINE)
+
+# Feeding HTML in chunks lets the streaming engine stop as soon as the size cap is reached
+FEED_CHUNK_SIZE = 64 * 1024
+
+
+def _is_quote(tag, attrs):
+    """Tells whether an HTML element holds the quoted previous message of a reply (Gmail, Apple Mail, Yahoo, Thunderbird)."""
+    if tag == 'blockquote':
+        return True
+    if tag != 'div':
+        return False
+    for name, value in attrs:
+        if name in ('class', 'id') and value and ('yahoo_quoted' in value or 'moz-cite-prefix' in value):
+            return True
+    return False
+
+
+def normalize_whitespace(text):
+    """Collapses runs of spaces and blank lines, which only cost tokens downstream."""
+    text = re.sub(r'[ \t\r\f\v\xa0]+', ' ', text)
+    text = re.sub(r' ?\n[ \n]*\n', '\n\n', text)
+    text = re.sub(r' ?\n ?', '\n', text)
+    return text.strip()
+
+
+def strip_quoted_reply(text):
+    """Removes the quoted previous messages ('> ' lines and everything after an 'On ... wrote:' header)."""
+    match = QUOTE_HEADER.search(text)
+    if match:
+        text = text[:match.start()]
+    if '>' in text:
+        text = '\n'.join(line for line in text.split('\n') if not line.lstrip().startswith('>'))
+    return text
+
+
+class _TextExtractor(HTMLParser):
+    """A streaming HTML stripper that keeps visible text and skips style, script and quoted-reply elements."""
+
+    def __init__(self, max_chars=0):
+        super().__init__(convert_charrefs=True)
+        self.chunks = []
+        self.size = 0
+        self.max_chars = max_chars
+        # Tag of the skipped element we are inside of, and how many elements of that tag are open
+        self.skip_tag = None
+        self.skip_depth = 0
+
+    @property
+    def full(self):
+        return bool(self.max_chars) and self.size >= self.max_chars
+
+    def handle_starttag(self, tag, attrs):
+        if self.skip_tag is not None:
+            if tag == self.skip_tag:
+                self.skip_depth += 1
+            return
+        if tag in SKIPPED_TAGS or _is_quote(tag, attrs):
+            self.skip_tag = tag
+            self.skip_depth = 1
+        elif tag in BLOCK_TAGS:
+            self.chunks.append('\n')
+
+    def handle_startendtag(self, tag, attrs):
+        if self.skip_tag is None and tag in BLOCK_TAGS:
+            self.chunks.append('\n')
+
+    def handle_endtag(self, tag):
+        if self.skip_tag is not None:
+            if tag == self.skip_tag:
+                self.skip_depth -= 1
+                if self.skip_depth == 0:
+                    self.skip_tag = None
+        elif tag in BLOCK_TAGS:
+            self.chunks.append('\n')
+
+    def handle_data(self, data):
+        if self.skip_tag is None:
+            self.chunks.append(data)
+            self.size += len(data)
+
+
+def _html_to_text_stream(html, max_chars):
+    parser = _TextExtractor(max_chars)
+    for start in range(0, len(html), FEED_CHUNK_SIZE):
+        parser.feed(html[start:start + FEED_CHUNK_SIZE])
+        if parser.full:
+            break
+    else:
+        parser.close()
+    return ''.join(parser.chunks)
+
+
+def _html_to_text_lxml(html, max_chars):
+    html = XML_DECLARATION.sub('', html, count=1)
+    if not html.strip():
+        return ''
+    try:
+        tree = lxml_html.fromstring(html)
+    except (LxmlParserError, ValueError):
+        # Documents lxml can't parse (e.g. only comments) go through the streaming engine, which never raises
+        return _html_to_text_stream(html, max_chars)
+    for element in list(tree.iter()):
+        if not isinstance(element.tag, str):
+            # Comments and processing instructions
+            element.drop_tree()
+        elif element.tag in SKIPPED_TAGS or _is_quote(element.tag, element.attrib.items()):
+            element.drop_tree()
+        elif element.tag in BLOCK_TAGS:
+            # Like the streaming engine, break the line before and after the element (void elements only once)
+            if element.tag not in VOID_TAGS:
+                element.text = '\n' + (element.text or '')
+            element.tail = '\n' + (element.tail or '')
+    return tree.text_content()
+
+
+def _html_to_text_bs4(html, max_chars):
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html, 'html.parser').get_text()
+
+
+HTML_ENGINES = {
+    'stream': _html_to_text_stream,
+    'lxml': _html_to_text_lxml,
+    'bs4': _html_to_text_bs4,
+}
+
+
+def html_to_text(html, engine=None, max_chars=None):
+    """
+    Converts an HTML email part to plain text.
+
+    Parameters:
+    - html (str): The HTML source.
+    - engine (str): 'auto', 'stream', 'lxml' or 'bs4'. Defaults to HTML_ENGINE.
+    - max_chars (int): The size cap, see MAX_BODY_CHARS. The streaming engine stops parsing once it is reached.
+
+    Returns:
+    - str: The visible text, without style, script or quoted-reply content.
+    """
+    engine = engine or HTML_ENGINE
+    max_chars = MAX_BODY_CHARS if max_chars is None else max_chars
+    if engine == 'auto':
+        engine = 'lxml' if lxml_html is not None else 'stream'
+    if engine == 'lxml' and lxml_html is None:
+        raise ValueError("The lxml engine requires the lxml package to be installed.")
+    if engine not in HTML_ENGINES:
+        raise ValueError(f"Unknown HTML engine {engine}. Use one of: auto, {', '.join(HTML_ENGINES)}.")
+    return HTML_ENGINES[engine](html, max_chars)
+
+
+def _decode(data):
+    return base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')
+
+
+def extract_body(payload, engine=None, max_chars=None, strip_quotes=True):
+    """
+    Extracts the readable text of a Gmail API message payload.
+
+    The MIME tree is walked without recursion. text/plain parts are used when the message has any, and the
+    HTML parts are only converted otherwise. Text is collected in a list and joined once.
+
+    Parameters:
+    - payload (dict): The 'payload' of a message fetched with format='full'.
+    - engine (str): The HTML engine, see html_to_text.
+    - max_chars (int): Maximum number of characters returned. Defaults to MAX_BODY_CHARS; 0 disables the cap.
+    - strip_quotes (bool): Remove the quoted previous messages of replies.
+
+    Returns:
+    - str: The body text.
+    """
+    max_chars = MAX_BODY_CHARS if max_chars is None else max_chars
+    plain_parts = []
+    html_parts = []
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        if part.get('parts'):
+            # Reversed so that parts are visited in their original order
+            stack.extend(reversed(part['parts']))
+            continue
+        data = part.get('body', {}).get('data')
+        if not data:
+            continue
+        mime_type = part.get('mimeType')
+        if mime_type == 'text/plain':
+            plain_parts.append(data)
+        elif mime_type == 'text/html':
+            html_parts.append(data)
+
+    chunks = []
+    size = 0
+    if plain_parts:
+        for data in plain_parts:
+            text = _decode(data)
+            chunks.append(strip_quoted_reply(text) if strip_quotes else text)
+            size += len(chunks[-1])
+            if max_chars and size >= max_chars:
+                break
+    else:
+        for data in html_parts:
+            # Quoted-reply elements are already skipped by the HTML engines
+            text = html_to_text(_decode(data), engine=engine, max_chars=max_chars)
+            chunks.append(strip_quoted_reply(text) if strip_quotes else text)
+            size += len(chunks[-1])
+            if max_chars and size >= max_chars:
+                break
+
+    body = normalize_whitespace('\n'.join(chunks))
+    return body[:max_chars] if max_chars else body
@@ -1,58 +1,32 @@
 import os.path
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 from crewai_tools import tool
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
 from datetime import datetime, timedelta
 from dateutil import tz
 from pydantic import BaseModel, Field, ValidationError
 import os.path
+from authenticate import bind_session, current_session_id, get_calendar_service, get_session_pool
+from event_preparser import preparse_query
+from calendar_store import event_bounds, get_event_store
+from event_normalization import normalize_events, resolve_timezone
 
 
-# Define the Calendar API scope
-SCOPES = ['https://www.googleapis.com/auth/calendar']
-
 def authenticate_google_calendar():
-    """Authenticates and returns the Google Calendar API service instance."""
-    creds = None
-    # The token3.json file stores the user's access and refresh tokens
-    if os.path.exists('token3.json'):
-        creds = Credentials.from_authorized_user_file('token3.json', SCOPES)
-    # If credentials are invalid, expired, or lack required scopes, log the user in
-    if not creds or not creds.valid or not creds.has_scopes(SCOPES):
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            # Use InstalledAppFlow.from_client_secrets_file()
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'client_secret-agents.json', SCOPES, redirect_uri='http://localhost:8080/')
-            # Use run_local_server() with the specified port
-            creds = flow.run_local_server(port=8080)
-        # Save the credentials for future runs
-        with open('token3.json', 'w') as token:
-            token.write(creds.to_json())
-    # Build the Google Calendar API service
-    service = build('calendar', 'v3', credentials=creds)
-    return service
-
+    """Returns the Google Calendar API service instance of the active session's account."""
+    # The session's credentials are loaded once per account and refreshed before they expire
+    return get_calendar_service()
 
 
+def load_google_calendar_service():
+    """Loads the Google Calendar service of the active session from its saved credentials."""
+    return get_session_pool('calendar').get(interactive=False)
 
-SCOPES = ['https://www.googleapis.com/auth/calendar']
 
-def load_google_calendar_service():
-    """Loads the Google Calendar service from saved credentials."""
-    creds = None
-    if os.path.exists('token3.json'):
-        creds = Credentials.from_authorized_user_file('token3.json', SCOPES)
-    if creds and creds.valid:
-        service = build('calendar', 'v3', credentials=creds)
-        return service
-    else:
-        raise Exception("User is not authenticated. Please authenticate first.")
+def get_calendar_store():
+    """Returns the local event store of the active session's primary calendar, synced through its saved credentials."""
+    pool = get_session_pool('calendar')
+    # Fail instead of starting the browser login from inside a tool
+    pool.manager.get(interactive=False)
+    return get_event_store(pool)
 
 class GetEventsSchema(BaseModel):
     start_datetime: str = Field(
@@ -78,50 +52,28 @@ class GetEventsSchema(BaseModel):
 
 class ListGoogleCalendarEvents:
     """Tool to list Google Calendar events."""
-    def _parse_event(self, event, timezone):
-        """Helper function to parse event details."""
-        start = event['start'].get('dateTime', event['start'].get('date'))
-        start = datetime.fromisoformat(start).astimezone(tz.gettz(timezone)).strftime('%Y-%m-%dT%H:%M:%SZ')
-        end = event['end'].get('dateTime', event['end'].get('date'))
-        end = datetime.fromisoformat(end).astimezone(tz.gettz(timezone)).strftime('%Y-%m-%dT%H:%M:%SZ')
-        return {
-            'start': start,
-            'end': end,
-            'summary': event.get('summary', 'No Title'),
-            'description': event.get('description', 'No Description')
-        }
-
     def run(self, start_datetime: str, end_datetime: str, max_results: int, timezone: str) -> str:
         """Fetches events from the user's Google Calendar."""
-        service = load_google_calendar_service()
-
-        # Convert start and end times to ISO 8601 with the proper timezone
-        start = datetime.strptime(start_datetime, '%Y-%m-%dT%H:%M:%S')
-        start = start.replace(tzinfo=tz.gettz(timezone)).isoformat()
-
-        end = datetime.strptime(end_datetime, '%Y-%m-%dT%H:%M:%S')
-        end = end.replace(tzinfo=tz.gettz(timezone)).isoformat()
-
-        # Execute the API request
-        events_result = service.events().list(
-            calendarId='primary',
-            timeMin=start,
-            timeMax=end,
-            maxResults=max_results,
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-        
-        events = events_result.get('items', [])
+        try:
+            zone = resolve_timezone(timezone)
+        except ValueError as e:
+            return f"Input validation error: {e}"
+
+        # Convert start and end times to datetimes in the proper timezone
+        start = datetime.strptime(start_datetime, '%Y-%m-%dT%H:%M:%S').replace(tzinfo=zone)
+        end = datetime.strptime(end_datetime, '%Y-%m-%dT%H:%M:%S').replace(tzinfo=zone)
+
+        # Answer from the local copy of the calendar, which only fetches the changes since its last sync
+        store = get_calendar_store()
+        events = store.events_between(start, end)[:max_results]
         
         if not events:
             return "No events found."
 
-        parsed_events = [self._parse_event(event, timezone) for event in events]
-        return parsed_events
+        # Convert all the events to the requested timezone in one pass
+        return normalize_events(events, timezone, store.timezone)
 
 
-@tool("List Google Calendar Events")
 def list_google_calendar_events_tool(start_datetime: str, end_datetime: str, max_results: str, timezone: str) -> str:
     """
     Fetches a list of events from the user's Google Calendar between specified start and end datetimes.
@@ -139,7 +91,7 @@ def list_google_calendar_events_tool(start_datetime: str, end_datetime: str, max
     
     Expected Output:
     - A formatted string listing the events found, including:
-      - Event start and end time in the specified timezone.
+      - Event start and end time in the specified timezone ('YYYY-MM-DDTHH:MM:SS'), or the dates of all-day events.
       - Event summary (title), description, and location (if available).
     - If no events are found, the tool returns 'No events found.'.
     
@@ -162,20 +114,25 @@ def list_google_calendar_events_tool(start_datetime: str, end_datetime: str, max
             timezone=timezone
         )
         list_events_tool = ListGoogleCalendarEvents()
-        return list_events_tool.run(validated_data.start_datetime, validated_data.end_datetime, validated_data.max_results, validated_data.timezone)
+        events = list_events_tool.run(validated_data.start_datetime, validated_data.end_datetime, validated_data.max_results, validated_data.timezone)
+        return events if isinstance(events, str) else [event.to_dict() for event in events]
     except ValidationError as e:
         return f"Input validation error: {e}"
     
 from crewai_tools import tool
-from pydantic import BaseModel, Field, ValidationError
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
-from datetime import datetime
+from pydantic import BaseModel, Field, ValidationError, field_validator, model_validator
+from datetime import datetime, timedelta
+from dateutil import parser as date_parser
 from dateutil import tz
+from googleapiclient.errors import HttpError
+import json
 import os.path
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
+# Number of inserts grouped into one batch request (the Calendar API accepts at most 50)
+CALENDAR_BATCH_SIZE = 50
+
 class CreateEventSchema(BaseModel):
     start_datetime: str = Field(
         description=(
@@ -205,34 +162,243 @@ class CreateEventSchema(BaseModel):
         description="The timezone in TZ Database Name format, e.g., 'America/New_York'."
     )
 
+    @field_validator('start_datetime', 'end_datetime')
+    @classmethod
+    def check_datetime_format(cls, value):
+        # Raises ValueError, reported as a validation error of this event only
+        datetime.strptime(value, '%Y-%m-%dT%H:%M:%S')
+        return value
+
+    @model_validator(mode='after')
+    def check_end_after_start(self):
+        if self.end_datetime <= self.start_datetime:
+            raise ValueError("end_datetime must be after start_datetime.")
+        return self
+
+def build_event_body(start_datetime: str, end_datetime: str, summary: str, location: str, description: str, timezone: str) -> dict:
+    """Builds the Calendar API body of an event from the tool's inputs."""
+    start = datetime.strptime(start_datetime, '%Y-%m-%dT%H:%M:%S')
+    start = start.replace(tzinfo=tz.gettz(timezone)).isoformat()
+    end = datetime.strptime(end_datetime, '%Y-%m-%dT%H:%M:%S')
+    end = end.replace(tzinfo=tz.gettz(timezone)).isoformat()
+
+    return {
+        'summary': summary,
+        'start': {
+            'dateTime': start
+        },
+        'end': {
+            'dateTime': end
+        },
+        'location': location if location else None,
+        'description': description if description else None
+    }
+
+
 class CreateGoogleCalendarEvent:
     """Tool to create Google Calendar events."""
     def run(self, start_datetime: str, end_datetime: str, summary: str, location: str, description: str, timezone: str) -> str:
         """Creates a new event in the user's Google Calendar."""
         service = load_google_calendar_service()
+        event_body = build_event_body(start_datetime, end_datetime, summary, location, description, timezone)
 
-        start = datetime.strptime(start_datetime, '%Y-%m-%dT%H:%M:%S')
-        start = start.replace(tzinfo=tz.gettz(timezone)).isoformat()
-        end = datetime.strptime(end_datetime, '%Y-%m-%dT%H:%M:%S')
-        end = end.replace(tzinfo=tz.gettz(timezone)).isoformat()
-
-        event_body = {
-            'summary': summary,
-            'start': {
-                'dateTime': start
-            },
-            'end': {
-                'dateTime': end
-            },
-            'location': location if location else None,
-            'description': description if description else None
-        }
+        # Look up overlapping events before creating the new one
+        store = get_calendar_store()
+        conflicts = store.conflicts(
+            date_parser.isoparse(event_body['start']['dateTime']), date_parser.isoparse(event_body['end']['dateTime']))
 
         event = service.events().insert(calendarId='primary', body=event_body).execute()
+        store.upsert(event)
+
+        message = f"Event created successfully: {event.get('htmlLink', 'Failed to create event')}"
+        if conflicts:
+            titles = ', '.join(conflict.get('summary', 'No Title') for conflict in conflicts)
+            message += f" Note: it overlaps with existing events: {titles}."
+        return message
+
+
+
+class BulkCreateGoogleCalendarEvents:
+    """Tool to create many Google Calendar events with batch requests."""
+
+    @staticmethod
+    def _event_key(summary, start):
+        # Two events are the same if they have the same title and start at the same instant
+        return ' '.join((summary or '').lower().split()), start.timestamp()
+
+    def run(self, events: list) -> list:
+        """
+        Creates events in the user's Google Calendar, skipping those that already exist.
+
+        Parameters:
+        - events (list): CreateEventSchema items, whose datetimes were checked by the schema's validators.
+
+        Returns:
+        - list: One dict per item, in order, with its 'summary', 'start_datetime' and 'status' ('created',
+          'duplicate' or 'failed'), plus the 'link' of a created event, the 'error' of a failed one and
+          the titles of the existing events it overlaps with in 'conflicts'.
+        """
+        service = load_google_calendar_service()
+        store = get_calendar_store()
+        bodies = [
+            build_event_body(item.start_datetime, item.end_datetime, item.summary, item.location, item.description, item.timezone)
+            for item in events
+        ]
+        starts = [date_parser.isoparse(body['start']['dateTime']) for body in bodies]
+        ends = [date_parser.isoparse(body['end']['dateTime']) for body in bodies]
+
+        results = [{'summary': item.summary, 'start_datetime': item.start_datetime} for item in events]
+        if not events:
+            return results
+
+        # Index the events that already exist in the span of the request, so duplicates are found with one lookup
+        existing = store.events_between(min(starts), max(ends))
+        existing_bounds = [(event, event_bounds(event, store.timezone)) for event in existing]
+        seen = set()
+        for event in existing:
+            if 'dateTime' in event.get('start', {}):
+                seen.add(self._event_key(event.get('summary'), date_parser.isoparse(event['start']['dateTime'])))
+
+        to_create = []
+        for position, (item, start, end) in enumerate(zip(events, starts, ends)):
+            key = self._event_key(item.summary, start)
+            if key in seen:
+                results[position]['status'] = 'duplicate'
+                continue
+            # Also skips an event listed twice in the same request
+            seen.add(key)
+            overlapping = [event.get('summary', 'No Title') for event, (event_start, event_end) in existing_bounds
+                           if event_start < end.timestamp() and event_end > start.timestamp()]
+            if overlapping:
+                results[position]['conflicts'] = overlapping
+            to_create.append(position)
+
+        created = []
+        for offset in range(0, len(to_create), CALENDAR_BATCH_SIZE):
+            chunk = to_create[offset:offset + CALENDAR_BATCH_SIZE]
+
+            def handle_response(request_id, response, exception):
+                # Record every item separately so one bad event doesn't fail the whole batch
+                result = results[int(request_id)]
+                if exception is not None:
+                    result['status'] = 'failed'
+                    result['error'] = str(exception)
+                else:
+                    result['status'] = 'created'
+                    result['link'] = response.get('htmlLink')
+                    created.append(response)
+
+            batch = service.new_batch_http_request(callback=handle_response)
+            for position in chunk:
+                batch.add(service.events().insert(calendarId='primary', body=bodies[position]), request_id=str(position))
+            try:
+                batch.execute()
+            except HttpError as error:
+                # The batch request itself failed, so none of its events were answered
+                for position in chunk:
+                    results[position].setdefault('status', 'failed')
+                    results[position].setdefault('error', str(error))
+
+        store.upsert_many(created)
+        print(f'Bulk create: {len(created)} created, '
+              f'{sum(result["status"] == "duplicate" for result in results)} duplicates, '
+              f'{sum(result["status"] == "failed" for result in results)} failed')
+        return results
+
+
+def bulk_create_google_calendar_events_tool(events: str) -> str:
+    """
+    Creates several events in the user's Google Calendar in a single call. Use it whenever more than one event
+    has to be created. Events that already exist (same title and start) are skipped.
+
+    Parameters:
+    - events (str): A JSON list of events. Each event has the same fields as 'Create Google Calendar Event':
+      'start_datetime' and 'end_datetime' formatted as 'YYYY-MM-DDTHH:MM:SS', 'summary', and optionally
+      'location', 'description' and 'timezone' (TZ Database Name, e.g. 'America/Chicago').
+      - Example: '[{"start_datetime": "2024-09-01T10:30:00", "end_datetime": "2024-09-01T11:30:00",
+        "summary": "Project Kickoff Meeting", "timezone": "America/Chicago"}]'
+
+    Expected Output:
+    - A JSON list with one result per event, in order, with its status ('created', 'duplicate', 'failed' or
+      'invalid'), the link of each created event and the existing events it overlaps with.
+    """
+    try:
+        items = json.loads(events) if isinstance(events, str) else events
+        if isinstance(items, dict):
+            items = [items]
+        if not isinstance(items, list):
+            return "Input validation error: events must be a JSON list of events."
+    except json.JSONDecodeError as e:
+        return f"Input validation error: events is not valid JSON: {e}"
+
+    # Validate every item separately (including its datetimes), so one malformed event doesn't reject the others
+    valid = []
+    results = []
+    for item in items:
+        try:
+            valid.append(CreateEventSchema(**item))
+            results.append(None)
+        except (ValidationError, TypeError) as e:
+            summary = item.get('summary') if isinstance(item, dict) else None
+            results.append({'summary': summary, 'status': 'invalid', 'error': str(e)})
+
+    created = iter(BulkCreateGoogleCalendarEvents().run(valid))
+    return json.dumps([result if result is not None else next(created) for result in results])
+
+class FindFreeSlotsSchema(BaseModel):
+    start_datetime: str = Field(
+        description="Start of the search window in the format YYYY-MM-DDTHH:MM:SS, without timezone info."
+    )
+    end_datetime: str = Field(
+        description="End of the search window in the format YYYY-MM-DDTHH:MM:SS, without timezone info."
+    )
+    duration_minutes: int = Field(
+        default=60,
+        description="The length of the slot in minutes."
+    )
+    timezone: str = Field(
+        default="America/Chicago",
+        description="The timezone in TZ Database Name format, e.g., 'America/New_York'."
+    )
 
-        return f"Event created successfully: {event.get('htmlLink', 'Failed to create event')}"
 
-@tool("Create Google Calendar Event")
+def find_free_calendar_slots_tool(start_datetime: str, end_datetime: str, duration_minutes: str, timezone: str) -> str:
+    """
+    Finds free time slots of a given length during working hours (9:00 to 17:00 on weekdays) in the user's Google Calendar.
+
+    Parameters:
+    - start_datetime (str): Start of the search window, formatted as 'YYYY-MM-DDTHH:MM:SS'.
+      - Example: '2024-09-09T00:00:00'.
+    - end_datetime (str): End of the search window, formatted as 'YYYY-MM-DDTHH:MM:SS'.
+      - Example: '2024-09-13T23:59:59'.
+    - duration_minutes (str): The length of the slot in minutes as a string.
+      - Example: '60'.
+    - timezone (str): The timezone in TZ Database Name format, e.g., 'America/Chicago'.
+
+    Expected Output:
+    - A list of free periods (start and end in 'YYYY-MM-DDTHH:MM:SS' format), or 'No free slots found.'.
+    """
+    try:
+        validated_data = FindFreeSlotsSchema(
+            start_datetime=start_datetime,
+            end_datetime=end_datetime,
+            duration_minutes=int(duration_minutes),
+            timezone=timezone
+        )
+        # An unknown zone would give naive server-local slots, so it is reported to the agent instead
+        zone = resolve_timezone(validated_data.timezone)
+        start = datetime.strptime(validated_data.start_datetime, '%Y-%m-%dT%H:%M:%S').replace(tzinfo=zone)
+        end = datetime.strptime(validated_data.end_datetime, '%Y-%m-%dT%H:%M:%S').replace(tzinfo=zone)
+        slots = get_calendar_store().free_slots(start, end, timedelta(minutes=validated_data.duration_minutes))
+        if not slots:
+            return "No free slots found."
+        return [
+            {'start': slot_start.strftime('%Y-%m-%dT%H:%M:%S'), 'end': slot_end.strftime('%Y-%m-%dT%H:%M:%S')}
+            for slot_start, slot_end in slots
+        ]
+    except (ValidationError, ValueError) as e:
+        return f"Input validation error: {e}"
+
 def create_google_calendar_event_tool(start_datetime: str, end_datetime: str, summary: str, location: str, description: str, timezone: str) -> str:
     """
     Creates a new event in the user's Google Calendar.
@@ -292,6 +458,21 @@ def create_google_calendar_event_tool(start_datetime: str, end_datetime: str, su
     except ValidationError as e:
         return f"Input validation error: {e}"
 
+# The calendar tools given to the agent, by tool name
+CALENDAR_TOOLS = [
+    ("List Google Calendar Events", list_google_calendar_events_tool),
+    ("Create Google Calendar Event", create_google_calendar_event_tool),
+    ("Bulk Create Google Calendar Events", bulk_create_google_calendar_events_tool),
+    ("Find Free Google Calendar Slots", find_free_calendar_slots_tool),
+]
+
+def make_calendar_tools(session_id: str):
+    """
+    Returns the calendar tools bound to a session. The calendar task runs asynchronously in a CrewAI thread
+    that doesn't inherit the caller's context, so each tool activates the session itself.
+    """
+    return [tool(name)(bind_session(func, session_id)) for name, func in CALENDAR_TOOLS]
+
 from crewai import Agent, Task, Crew, Process
 import os
 from dotenv import load_dotenv
@@ -302,48 +483,95 @@ os.environ['OPENAI_API_KEY'] = os.getenv('GROQ_API_KEY')
 os.environ['OPENAI_MODEL_NAME'] = 'llama3-groq-70b-8192-tool-use-preview'
 os.environ['OPENAI_API_BASE'] = 'https://api.groq.com/openai/v1'
 
-# Identifier Agent
-calendar_agent = Agent(
-  role='Google Calendar Manager', 
-  goal='Get list of Google Calendar Events or add a new event based on user\'s input: {query}'
-  'If the user has uploaded text indicating meetings should be scheduled, then use the create_google_calendar_event_tool to schedule the meetings.'
-  'If there are multiple events to be created, then create them ALL.',
-  verbose=True,
-  memory=True,
-  tools=[list_google_calendar_events_tool, create_google_calendar_event_tool],
-  backstory=(
-    f"""Your job is to manage Google Calendar events. You can list events between two dates or create a new event.
-    Use of the two tools provided to you: 'List Google Calendar Events' and 'Create Google Calendar Event'.
-    Make sure you pass in the correct parameters to the tools."""
-  ),
-  allow_delegation=False,
-)
-
-# Identification Task
-event_task = Task(
-  description=(
-    """Analyse the user's query: {query}
-    Determine whether to list events between specified dates or add anew event based on the query and use the appropriate tool."""
-  ),
-  expected_output='A message confirming the addition of event(s) and the link of the newly added event(s) OR a list of events in user\'s calendar within specified timeline.',
-  agent=calendar_agent,
-  async_execution=True,
-  tools=[list_google_calendar_events_tool, create_google_calendar_event_tool],
-)
-
-# Forming the tech-focused crew with enhanced configurations
-crew = Crew(
-  agents=[calendar_agent],
-  tasks=[event_task],
-  process=Process.sequential  # Optional: Sequential task execution is default
-)
+def build_calendar_crew(session_id):
+    """Builds the calendar crew, whose tools work with the account of the given session."""
+    tools = make_calendar_tools(session_id)
+
+    # Identifier Agent
+    calendar_agent = Agent(
+        role='Google Calendar Manager', 
+        goal='Get list of Google Calendar Events or add a new event based on user\'s input: {query}'
+        'If the user has uploaded text indicating meetings should be scheduled, then use the create_google_calendar_event_tool to schedule the meetings.'
+        'If there are multiple events to be created, then create them ALL with a single call to the bulk_create_google_calendar_events_tool.',
+        verbose=True,
+        memory=True,
+        tools=tools,
+        backstory=(
+            f"""Your job is to manage Google Calendar events. You can list events between two dates, find free slots or create new events.
+            Use of the four tools provided to you: 'List Google Calendar Events', 'Find Free Google Calendar Slots', 'Create Google Calendar Event'
+            for a single event and 'Bulk Create Google Calendar Events' for several events at once.
+            Make sure you pass in the correct parameters to the tools."""
+        ),
+        allow_delegation=False,
+    )
+
+    # Identification Task
+    event_task = Task(
+        description=(
+            """Analyse the user's query: {query}
+            Determine whether to list events between specified dates or add anew event based on the query and use the appropriate tool."""
+        ),
+        expected_output='A message confirming the addition of event(s) and the link of the newly added event(s) OR a list of events in user\'s calendar within specified timeline.',
+        agent=calendar_agent,
+        async_execution=True,
+        tools=tools,
+    )
+
+    # Forming the tech-focused crew with enhanced configurations
+    return Crew(
+        agents=[calendar_agent],
+        tasks=[event_task],
+        process=Process.sequential  # Optional: Sequential task execution is default
+    )
 
 # Running the crew with input topic
 # result = crew.kickoff(inputs={'query': f"""I want to see all the events I have scheduled between 2024-09-01 and 2024-12-09."""})
 
 
+# Maximum number of events listed for a query answered without the agent
+LIST_MAX_RESULTS = 100
+
+
+class CalendarResult:
+    """The result of a query answered without the crew, with the same `raw` attribute as CrewOutput."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.json_dict = None
+
+
+def format_events(events):
+    """Formats CalendarEvent records as a Markdown list."""
+    lines = []
+    for event in events:
+        if event.all_day:
+            when = event.start if event.start == event.end else f"{event.start} to {event.end}"
+            line = f"- **{event.summary}**: {when} (all day)"
+        else:
+            line = f"- **{event.summary}**: {event.start} to {event.end}"
+        if event.description:
+            line += f" ({event.description})"
+        lines.append(line)
+    return "\n".join(lines)
+
+
 def run_main(query):
     authenticate_google_calendar()
+
+    # Queries that only list the events of a recognizable date range are answered without the LLM
+    parsed = preparse_query(query)
+    if parsed.is_simple_list:
+        print(f'Listing events from {parsed.start} to {parsed.end} without the agent')
+        events = ListGoogleCalendarEvents().run(
+            parsed.start.strftime('%Y-%m-%dT%H:%M:%S'),
+            parsed.end.strftime('%Y-%m-%dT%H:%M:%S'),
+            LIST_MAX_RESULTS,
+            parsed.timezone)
+        return CalendarResult(events if isinstance(events, str) else format_events(events))
+
+    # Everything else goes to the crew, with the dates, times and candidate events recognized locally as hints
+    query = f"{query}\n\nPre-parsed hints (verify them against the text above): {parsed.to_hints()}"
+    crew = build_calendar_crew(current_session_id())
     result = crew.kickoff(inputs={'query': query})
     return result
 
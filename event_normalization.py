@@ -0,0 +1,141 @@
+import os
+import time
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from dateutil import tz
+
+from models import CalendarEvent
+
+try:
+    # Optional: formats all the timestamps of a request with one vectorized call
+    import numpy as np
+except ImportError:
+    np = None
+
+# 'auto' uses NumPy when it is installed and plain Python otherwise; 'numpy' and 'python' force an engine
+NORMALIZE_ENGINE = os.getenv('EVENT_NORMALIZE_ENGINE', 'auto')
+
+# UTC offsets only change on quarter hours, so every instant of a quarter hour has the same offset
+OFFSET_BUCKET_SECONDS = 900
+
+LOCAL_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+class _OffsetCache:
+    """Returns the UTC offset of a timezone at an instant, computing it once per quarter hour."""
+
+    def __init__(self, zone):
+        self.zone = zone
+        self.offsets = {}
+
+    def __call__(self, epoch):
+        bucket = int(epoch // OFFSET_BUCKET_SECONDS)
+        offset = self.offsets.get(bucket)
+        if offset is None:
+            moment = datetime.fromtimestamp(bucket * OFFSET_BUCKET_SECONDS, self.zone)
+            offset = self.offsets[bucket] = int(moment.utcoffset().total_seconds())
+        return offset
+
+
+def resolve_timezone(name):
+    """
+    Returns the tzinfo of a TZ Database Name. The C implementation of zoneinfo computes offsets much faster than
+    dateutil's; dateutil is the fallback for names zoneinfo can't load.
+
+    Raises:
+    - ValueError: If neither knows the name, e.g. 'Central Time'.
+    """
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        zone = tz.gettz(name)
+    if zone is None:
+        raise ValueError(f"Unknown timezone '{name}'. Use a TZ Database Name, e.g. 'America/Chicago'.")
+    return zone
+
+
+def _epoch(moment, default_zone):
+    """Returns the UTC epoch seconds of the 'dateTime' of an event's start or end."""
+    value = datetime.fromisoformat(moment['dateTime'])
+    if value.tzinfo is None:
+        # Without an offset the time is in the event's own timezone, or the calendar's
+        zone = default_zone
+        if moment.get('timeZone'):
+            try:
+                zone = resolve_timezone(moment['timeZone'])
+            except ValueError:
+                pass
+        value = value.replace(tzinfo=zone)
+    return value.timestamp()
+
+
+def _format_python(local_seconds):
+    return [time.strftime(LOCAL_FORMAT, time.gmtime(seconds)) for seconds in local_seconds]
+
+
+def _format_numpy(local_seconds):
+    # Local wall-clock seconds are formatted as if they were UTC, which gives the local time without an offset
+    return np.datetime_as_string(np.array(local_seconds, dtype='datetime64[s]'), unit='s').tolist()
+
+
+def normalize_events(events, timezone, calendar_timezone='UTC', engine=None):
+    """
+    Converts Calendar API events into CalendarEvent records with their start and end in one timezone.
+
+    The timezone is resolved once per call and the UTC offsets are cached per quarter hour, so a request only
+    computes the offsets of the distinct quarter hours it contains. All the times are then formatted in one pass.
+
+    Parameters:
+    - events (list): Events as returned by events().list.
+    - timezone (str): The timezone of the returned times, in TZ Database Name format.
+    - calendar_timezone (str): The calendar's timezone, used for times that don't carry an offset. UTC is used
+      if it is unknown.
+    - engine (str): 'auto', 'numpy' or 'python'. Defaults to NORMALIZE_ENGINE.
+
+    Returns:
+    - list: One CalendarEvent per event, with 'YYYY-MM-DDTHH:MM:SS' local times without a suffix. All-day events
+      have 'YYYY-MM-DD' dates, the end being the last day of the event rather than the API's exclusive end.
+
+    Raises:
+    - ValueError: If the engine is unavailable or the timezone is unknown.
+    """
+    engine = engine or NORMALIZE_ENGINE
+    if engine == 'auto':
+        engine = 'numpy' if np is not None else 'python'
+    if engine == 'numpy' and np is None:
+        raise ValueError("The numpy engine needs NumPy, which is not installed.")
+
+    zone = resolve_timezone(timezone)
+    try:
+        default_zone = resolve_timezone(calendar_timezone)
+    except ValueError:
+        default_zone = ZoneInfo('UTC')
+    offset_of = _OffsetCache(zone)
+
+    records = []
+    timed = []
+    local_seconds = []
+    for event in events:
+        start, end = event['start'], event['end']
+        record = CalendarEvent(event.get('id', ''), event.get('summary', 'No Title'), None, None,
+                               description=event.get('description'), location=event.get('location'))
+
+        if 'dateTime' in start:
+            start_epoch = _epoch(start, default_zone)
+            end_epoch = _epoch(end, default_zone)
+            local_seconds.append(int(start_epoch) + offset_of(start_epoch))
+            local_seconds.append(int(end_epoch) + offset_of(end_epoch))
+            timed.append(record)
+        else:
+            # All-day events are dates, which don't move between timezones
+            record.all_day = True
+            record.start = start['date']
+            record.end = (date.fromisoformat(end['date']) - timedelta(days=1)).isoformat()
+        records.append(record)
+
+    formatted = _format_numpy(local_seconds) if engine == 'numpy' else _format_python(local_seconds)
+    for position, record in enumerate(timed):
+        record.start = formatted[2 * position]
+        record.end = formatted[2 * position + 1]
+    return records
@@ -0,0 +1,305 @@
+import json
+import os
+import re
+from datetime import datetime, time, timedelta
+
+from dateutil import parser as date_parser
+from dateutil import tz
+from dateutil.relativedelta import relativedelta
+
+# Timezone used for dates and times that don't specify one
+DEFAULT_TIMEZONE = os.getenv('CALENDAR_TIMEZONE', 'America/Chicago')
+
+# Queries longer than this are documents, which always go to the agent
+MAX_LIST_QUERY_CHARS = 300
+
+# Duration assumed for candidate events with a start time but no end time or duration
+DEFAULT_EVENT_DURATION = timedelta(hours=1)
+
+MONTHS = r'(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)'
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+# Explicit and relative dates, e.g. 2024-09-01, 9/1/2024, September 1st 2024, 1 Sep, next Friday, tomorrow
+DATE_PATTERN = re.compile(
+    r'\b(?:'
+    r'(?P<iso>\d{4}-\d{2}-\d{2})'
+    r'|(?P<numeric>\d{1,2}/\d{1,2}(?:/\d{2,4})?)'
+    rf'|(?P<month_day>{MONTHS}\.? \d{{1,2}}(?:st|nd|rd|th)?(?:,? \d{{4}})?)'
+    rf'|(?P<day_month>\d{{1,2}}(?:st|nd|rd|th)?(?: of)? {MONTHS}(?:,? \d{{4}})?)'
+    rf'|(?P<weekday>(?:(?:next|this|last|on) )?(?:{"|".join(WEEKDAYS)}))'
+    r'|(?P<relative>today|tomorrow|day after tomorrow|yesterday)'
+    r')\b',
+    re.IGNORECASE)
+
+# Times of day, e.g. 3pm, 3:30 pm, 15:30, noon
+TIME_PATTERN = re.compile(
+    r'\b(?:(?P<hour12>1[0-2]|0?[1-9])(?::(?P<minute12>[0-5]\d))?\s*(?P<ampm>[ap]\.?m\.?)|'
+    r'(?P<hour24>[01]?\d|2[0-3]):(?P<minute24>[0-5]\d)|(?P<noon>noon|midnight))(?![\w:])',
+    re.IGNORECASE)
+
+# Durations, e.g. for 1 hour, for 90 minutes, for 1.5 hrs
+DURATION_PATTERN = re.compile(
+    r'\bfor (?:an? |(?P<amount>\d+(?:\.\d+)?) ?)(?P<unit>hours?|hrs?|h|minutes?|mins?)\b', re.IGNORECASE)
+
+# Relative ranges of a list query
+RANGE_PATTERN = re.compile(
+    r'\b(?:(?P<this_next>this|next|coming|last) (?P<unit>week|month)|(?:next|coming) (?P<days>\d+) days|'
+    r'(?P<today>today|tonight)|(?P<tomorrow>tomorrow)|(?P<yesterday>yesterday))\b',
+    re.IGNORECASE)
+
+LIST_INTENT = re.compile(
+    r"\b(?:list|show|see|view|what(?:'s| is| are)?|which|display|check|any|do i have|am i (?:free|busy)|"
+    r"my (?:events|calendar|schedule|agenda|meetings))\b", re.IGNORECASE)
+CREATE_INTENT = re.compile(
+    r'\b(?:create|add|schedule|book|set up|arrange|organi[sz]e|put|invite|remind)\b', re.IGNORECASE)
+# Queries about the past, whose dates without a year stay in the current year
+PAST_TENSE = re.compile(r'\b(?:did|was|were|had|last|yesterday|ago|past|previous)\b', re.IGNORECASE)
+
+# Words a list query may contain besides its date range. Any other word (a person, a topic, a place) is a filter
+# that only the agent can apply.
+LIST_QUERY_WORDS = {
+    'a', 'agenda', 'all', 'am', 'an', 'and', 'any', 'anything', 'appointments', 'are', 'at', 'be', 'between', 'busy',
+    'calendar', 'can', 'check', 'coming', 'could', 'day', 'days', 'did', 'display', 'do', 'does', 'during', 'event',
+    'events', 'for', 'free', 'from', 'give', 'had', 'have', 'i', 'in', 'is', 'it', 'last', 'list', 'me', 'meeting',
+    'meetings', 'my', 'next', 'of', 'on', 'or', 'plans', 'please', 'schedule', 'scheduled', 'see', 'show', 'tell',
+    'the', 'there', 'this', 'through', 'till', 'to', 'until', 'upcoming', 'view', 'was', 'were', 'what', 'which',
+    'will', 'you',
+}
+
+
+class ParsedQuery:
+    """
+    What the pre-parser recognized in a calendar query.
+
+    Attributes:
+    - intent (str): 'list' for a query that only lists events in a range, 'create' if it asks to create events,
+      otherwise None.
+    - start (datetime): Start of the list range (timezone-aware), or None.
+    - end (datetime): End of the list range (timezone-aware), or None.
+    - candidates (list): Candidate events, dicts with 'start_datetime', 'end_datetime' and 'context'.
+    - filters (list): Words of a list query beyond its date range, e.g. a person or a topic.
+    """
+
+    def __init__(self, intent=None, start=None, end=None, candidates=None, timezone=DEFAULT_TIMEZONE, now=None,
+                 filters=None):
+        self.intent = intent
+        self.start = start
+        self.end = end
+        self.candidates = candidates or []
+        self.filters = filters or []
+        self.timezone = timezone
+        self.now = now
+
+    @property
+    def is_simple_list(self):
+        """True when the query can be answered by listing events, without the agent."""
+        return self.intent == 'list' and self.start is not None and self.end is not None and not self.filters
+
+    def to_hints(self):
+        """Describes the recognized fields for the agent's prompt."""
+        hints = {
+            'current_datetime': self.now.strftime('%Y-%m-%dT%H:%M:%S (%A)') if self.now else None,
+            'timezone': self.timezone,
+        }
+        if self.start is not None:
+            hints['list_range'] = {
+                'start_datetime': self.start.strftime('%Y-%m-%dT%H:%M:%S'),
+                'end_datetime': self.end.strftime('%Y-%m-%dT%H:%M:%S'),
+            }
+        if self.candidates:
+            hints['candidate_events'] = self.candidates
+        return json.dumps(hints, indent=1)
+
+
+def _resolve_date(match, today, roll_forward=True, past=False):
+    """
+    Turns a DATE_PATTERN match into a date, or None if it isn't a valid date.
+
+    Parameters:
+    - match (re.Match): The DATE_PATTERN match.
+    - today (date): The current date, used for relative dates.
+    - roll_forward (bool): Whether a month and day without a year that already passed means next year.
+    - past (bool): Whether the text is about the past, so a bare weekday means the last such day and dates without a
+      year stay in the current year.
+    """
+    text = match.group(0)
+    try:
+        if match.group('relative'):
+            offset = {'today': 0, 'tomorrow': 1, 'day after tomorrow': 2, 'yesterday': -1}[text.lower()]
+            return today + timedelta(days=offset)
+        if match.group('weekday'):
+            words = text.lower().split()
+            weekday = WEEKDAYS.index(words[-1])
+            if words[0] == 'next':
+                # "next Friday" is the Friday of next week
+                return today - timedelta(days=today.weekday()) + timedelta(days=7 + weekday)
+            if words[0] == 'last':
+                # "last Friday" is the last such day before today
+                return today - timedelta(days=(today.weekday() - weekday - 1) % 7 + 1)
+            if past:
+                # The last such day, today included
+                return today - timedelta(days=(today.weekday() - weekday) % 7)
+            # Otherwise the next such day, today included
+            return today + timedelta(days=(weekday - today.weekday()) % 7)
+        cleaned = re.sub(r'(\d)(st|nd|rd|th)\b', r'\1', text, flags=re.IGNORECASE).replace(' of ', ' ')
+        default = datetime.combine(today, time())
+        parsed = date_parser.parse(cleaned, default=default, dayfirst=False).date()
+        # A month and day without a year that already passed refers to next year when creating events
+        if (roll_forward and not past and not re.search(r'\d{4}', text)
+                and (match.group('month_day') or match.group('day_month')) and parsed < today):
+            parsed = parsed.replace(year=parsed.year + 1)
+        return parsed
+    except (ValueError, OverflowError):
+        return None
+
+
+def find_dates(text, today, roll_forward=True, past=False):
+    """
+    Returns (start, end, date) tuples for every date in the text, with the position of the match.
+
+    See _resolve_date for `roll_forward` and `past`.
+    """
+    dates = []
+    for match in DATE_PATTERN.finditer(text):
+        value = _resolve_date(match, today, roll_forward, past)
+        if value is not None:
+            dates.append((match.start(), match.end(), value))
+    return dates
+
+
+def _time_of(match):
+    if match.group('noon'):
+        return time(12) if match.group('noon').lower() == 'noon' else time(0)
+    if match.group('hour24') is not None:
+        return time(int(match.group('hour24')), int(match.group('minute24')))
+    hour = int(match.group('hour12')) % 12
+    if match.group('ampm').lower().startswith('p'):
+        hour += 12
+    return time(hour, int(match.group('minute12') or 0))
+
+
+def find_times(text):
+    """Returns (start, end, time) tuples for every time of day in the text, with the position of the match."""
+    return [(match.start(), match.end(), _time_of(match)) for match in TIME_PATTERN.finditer(text)]
+
+
+def find_duration(text):
+    """Returns the first duration mentioned in the text, or None."""
+    match = DURATION_PATTERN.search(text)
+    if not match:
+        return None
+    amount = float(match.group('amount') or 1)
+    return timedelta(hours=amount) if match.group('unit').lower().startswith('h') else timedelta(minutes=amount)
+
+
+def _relative_range(text, now):
+    match = RANGE_PATTERN.search(text)
+    if not match:
+        return None
+    today = now.date()
+    if match.group('today'):
+        return today, today
+    if match.group('tomorrow'):
+        return today + timedelta(days=1), today + timedelta(days=1)
+    if match.group('yesterday'):
+        return today - timedelta(days=1), today - timedelta(days=1)
+    if match.group('days'):
+        return today, today + timedelta(days=int(match.group('days')) - 1)
+    # Number of weeks or months from the current one
+    shift = {'this': 0, 'last': -1}.get(match.group('this_next').lower(), 1)
+    if match.group('unit').lower() == 'week':
+        monday = today - timedelta(days=today.weekday()) + timedelta(days=7 * shift)
+        return monday, monday + timedelta(days=6)
+    first = today.replace(day=1) + relativedelta(months=shift)
+    return first, first + relativedelta(months=1) - timedelta(days=1)
+
+
+def _list_filters(query):
+    """Returns the words of a list query that are neither part of its dates nor LIST_QUERY_WORDS."""
+    remainder = RANGE_PATTERN.sub(' ', DATE_PATTERN.sub(' ', query))
+    words = re.findall(r"[a-z0-9]+(?:'[a-z]+)?", remainder.lower())
+    return [word for word in words if re.sub(r"'s$", '', word) not in LIST_QUERY_WORDS]
+
+
+def extract_candidate_events(text, today, timezone, roll_forward=True):
+    """
+    Finds sentences or lines that mention a date and a time and turns them into candidate events.
+
+    Parameters:
+    - text (str): The query or document text.
+    - today (date): The current date, used for relative dates.
+    - timezone (str): The timezone of the candidate events.
+    - roll_forward (bool): Whether past dates without a year mean next year (see _resolve_date).
+
+    Returns:
+    - list: Dicts with the 'start_datetime' and 'end_datetime' (YYYY-MM-DDTHH:MM:SS) and the 'context' sentence.
+    """
+    candidates = []
+    for sentence in re.split(r'(?<=[.!?;])\s+|\n+', text):
+        dates = find_dates(sentence, today, roll_forward)
+        times = find_times(sentence)
+        if not dates or not times:
+            continue
+        day = dates[0][2]
+        start = datetime.combine(day, times[0][2])
+        duration = find_duration(sentence)
+        if duration is not None:
+            end = start + duration
+        elif len(times) > 1 and times[1][2] > times[0][2]:
+            end = datetime.combine(day, times[1][2])
+        else:
+            end = start + DEFAULT_EVENT_DURATION
+        candidates.append({
+            'start_datetime': start.strftime('%Y-%m-%dT%H:%M:%S'),
+            'end_datetime': end.strftime('%Y-%m-%dT%H:%M:%S'),
+            'timezone': timezone,
+            'context': sentence.strip()[:200],
+        })
+    return candidates
+
+
+def preparse_query(query, now=None, timezone=None):
+    """
+    Recognizes list-range queries and candidate events in a calendar query without calling the LLM.
+
+    Parameters:
+    - query (str): The user's query or the text extracted from an uploaded document.
+    - now (datetime): The current time, used for relative dates. Defaults to now in `timezone`.
+    - timezone (str): The timezone of the user. Defaults to DEFAULT_TIMEZONE.
+
+    Returns:
+    - ParsedQuery: The recognized intent, list range and candidate events.
+    """
+    timezone = timezone or DEFAULT_TIMEZONE
+    zone = tz.gettz(timezone)
+    now = now or datetime.now(zone)
+    today = now.date()
+    parsed = ParsedQuery(timezone=timezone, now=now)
+
+    wants_list = len(query) <= MAX_LIST_QUERY_CHARS and LIST_INTENT.search(query) and not CREATE_INTENT.search(query)
+    # The past tense of a document says nothing about the dates in it
+    past = len(query) <= MAX_LIST_QUERY_CHARS and bool(PAST_TENSE.search(query))
+    if not wants_list:
+        parsed.intent = 'create' if CREATE_INTENT.search(query) else None
+        # Only events to create roll past dates without a year over to next year
+        roll_forward = parsed.intent == 'create' and not past
+        parsed.candidates = extract_candidate_events(query, today, timezone, roll_forward=roll_forward)
+        return parsed
+
+    parsed.intent = 'list'
+    parsed.filters = _list_filters(query)
+    # Listed dates without a year stay in the current year
+    dates = [value for _, _, value in find_dates(query, today, roll_forward=False, past=past)]
+    if len(dates) >= 2:
+        first, last = min(dates[0], dates[1]), max(dates[0], dates[1])
+    elif len(dates) == 1:
+        first = last = dates[0]
+    else:
+        day_range = _relative_range(query, now)
+        if day_range is None:
+            return parsed
+        first, last = day_range
+
+    parsed.start = datetime.combine(first, time()).replace(tzinfo=zone)
+    parsed.end = datetime.combine(last, time(23, 59, 59)).replace(tzinfo=zone)
+    return parsed
@@ -0,0 +1,135 @@
+import re
+from collections import defaultdict
+
+# Words in a query that refer to a kind of file rather than to its name
+MIME_KEYWORDS = {
+    'doc': ('application/vnd.google-apps.document', 'application/msword',
+            'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+    'document': ('application/vnd.google-apps.document', 'application/msword',
+                 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+    'sheet': ('application/vnd.google-apps.spreadsheet', 'text/csv'),
+    'spreadsheet': ('application/vnd.google-apps.spreadsheet', 'text/csv'),
+    'slides': ('application/vnd.google-apps.presentation',),
+    'presentation': ('application/vnd.google-apps.presentation',),
+    'pdf': ('application/pdf',),
+    'text': ('text/plain',),
+    'txt': ('text/plain',),
+}
+
+STOP_WORDS = {'a', 'an', 'and', 'about', 'all', 'any', 'for', 'file', 'files', 'in', 'of', 'on', 'or', 'the', 'to', 'with'}
+
+
+def tokenize(text):
+    """Splits text into lowercase word tokens, also breaking camelCase, snake_case and letter/digit boundaries."""
+    text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)
+    return [token for token in re.findall(r'[a-z]+|[0-9]+', text.lower()) if token not in STOP_WORDS]
+
+
+def mime_keyword(token):
+    """Returns the MIME_KEYWORDS key a query token refers to, also for plurals like "pdfs", or None."""
+    if token in MIME_KEYWORDS:
+        return token
+    if token.endswith('s') and token[:-1] in MIME_KEYWORDS:
+        return token[:-1]
+    return None
+
+
+def trigrams(text):
+    """Returns the set of character trigrams of the normalized text."""
+    normalized = f"  {' '.join(tokenize(text))} "
+    return {normalized[i:i + 3] for i in range(len(normalized) - 2)}
+
+
+class FileIndex:
+    """
+    An inverted token and trigram index over Drive file names (plus optional content snippets)
+    used to rank files against a free-text query without calling the LLM.
+
+    Parameters:
+    - files (list): DriveFile records.
+    - snippets (dict): Optional mapping of file ID to a snippet of the file's text contents.
+    """
+
+    def __init__(self, files, snippets=None):
+        self.files = list(files)
+        self.name_tokens = []
+        self.snippet_tokens = []
+        self.token_index = defaultdict(set)
+        self.trigram_index = defaultdict(set)
+        self.trigram_counts = []
+        snippets = snippets or {}
+
+        for position, file in enumerate(self.files):
+            tokens = set(tokenize(file.name))
+            self.name_tokens.append(tokens)
+            for token in tokens:
+                self.token_index[token].add(position)
+
+            grams = trigrams(file.name)
+            self.trigram_counts.append(len(grams))
+            for gram in grams:
+                self.trigram_index[gram].add(position)
+
+            self.snippet_tokens.append(set(tokenize(snippets.get(file.id, ''))))
+
+    def rank(self, query, top_k=None):
+        """
+        Scores every file that shares a token, a trigram or a MIME keyword with the query.
+
+        Parameters:
+        - query (str): The user's description of the files they want.
+        - top_k (int): Optional maximum number of results.
+
+        Returns:
+        - list: (score, file) tuples sorted by decreasing score, with scores between 0 and 1.
+        """
+        query_tokens = set(tokenize(query))
+        query_grams = trigrams(query)
+        keywords = {token: mime_keyword(token) for token in query_tokens}
+        mime_types = {mime for keyword in keywords.values() if keyword for mime in MIME_KEYWORDS[keyword]}
+        name_query_tokens = {token for token, keyword in keywords.items() if keyword is None} or query_tokens
+        # A query like "pdf" or "spreadsheets" only asks for a kind of file, so the file's type decides
+        type_only = all(keywords.values())
+        if not query_tokens:
+            return []
+
+        # Only files sharing at least one trigram can match on the name
+        gram_hits = defaultdict(int)
+        for gram in query_grams:
+            for position in self.trigram_index.get(gram, ()):
+                gram_hits[position] += 1
+
+        candidates = set(gram_hits)
+        for position, file in enumerate(self.files):
+            if mime_types and file.mime_type in mime_types:
+                candidates.add(position)
+            elif self.snippet_tokens[position] & query_tokens:
+                candidates.add(position)
+
+        ranked = []
+        for position in candidates:
+            file = self.files[position]
+            name_tokens = self.name_tokens[position]
+
+            # Fraction of query words found in the name, counting prefixes (e.g. "report" in "reports")
+            matched = 0.0
+            for token in name_query_tokens:
+                if token in name_tokens:
+                    matched += 1.0
+                elif len(token) >= 3 and any(name.startswith(token) or token.startswith(name) for name in name_tokens if len(name) >= 3):
+                    matched += 0.7
+            token_score = matched / len(name_query_tokens)
+
+            # Fuzzy containment of the query in the name, which tolerates typos and partial words
+            gram_score = gram_hits.get(position, 0) / max(1, len(query_grams))
+
+            score = max(token_score, 0.9 * gram_score)
+            if mime_types and file.mime_type in mime_types:
+                score = 1.0 if type_only else score + 0.1
+            if self.snippet_tokens[position]:
+                score += 0.3 * len(query_tokens & self.snippet_tokens[position]) / len(query_tokens)
+
+            ranked.append((min(score, 1.0), file))
+
+        ranked.sort(key=lambda entry: (-entry[0], entry[1].name))
+        return ranked[:top_k] if top_k else ranked
@@ -1,16 +1,21 @@
 import os.path
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-import base64
-from bs4 import BeautifulSoup
 from crewai_tools import tool
 from crewai import Agent, Task, Crew, Process
 import json
+import threading
+import time
 from dotenv import load_dotenv
 import os
+from pydantic import BaseModel, Field, ValidationError
+from concurrency import RateLimiter, run_concurrently
+from llm import LLM_MODEL_NAME, complete_json, estimate_tokens, structured_completion
+from llm_cache import cached_kickoff, get_response_cache
+from gmail_store import MessageStore
+from models import AnalysisReport, EmailMessage
+from email_text import extract_body
+from token_budget import EMAIL_BUDGET_STRATEGY, EMAIL_TOKEN_BUDGET, fit_to_budget
+from authenticate import get_gmail_service
 
 # Load environment variables
 load_dotenv()
@@ -20,39 +25,105 @@ os.environ['OPENAI_API_KEY'] = os.getenv('GROQ_API_KEY')
 os.environ['OPENAI_MODEL_NAME'] = 'llama-3.1-70b-versatile'
 os.environ['OPENAI_API_BASE'] = 'https://api.groq.com/openai/v1'
 
-# Define the Gmail API scope
-SCOPES = ['https://mail.google.com/']
+# 'batch' packs several emails into each LLM call, 'fast' analyzes each email with a single structured
+# LLM call and 'crew' uses the three-agent crew
+EMAIL_ANALYSIS_MODES = ('batch', 'fast', 'crew')
+EMAIL_ANALYSIS_MODE = os.getenv('EMAIL_ANALYSIS_MODE', 'batch')
+
+# Limits for packing emails into one batch triage request
+TRIAGE_TOKEN_BUDGET = int(os.getenv('TRIAGE_TOKEN_BUDGET', '6000'))
+TRIAGE_MAX_EMAILS = 10
+
+# Requests per minute allowed on the Groq endpoint, shared by all concurrently running crews
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv('GROQ_REQUESTS_PER_MINUTE', '30'))
+
+# Number of LLM calls made by one run of process_email_with_crew (summarizer, categorizer, consolidator)
+EMAIL_CREW_LLM_CALLS = 3
+
+# Headers fetched in the metadata phase: the ones the reports show and the ones the bulk mail prefilter checks
+METADATA_HEADERS = ['From', 'Subject', 'Date', 'List-Unsubscribe', 'List-Id', 'Precedence']
+
+# Messages with one of these labels are newsletters or notifications
+BULK_LABELS = {'CATEGORY_PROMOTIONS', 'CATEGORY_SOCIAL', 'CATEGORY_FORUMS'}
+
+# The bodies of bulk messages are not downloaded or analyzed; set EMAIL_PREFILTER=0 to analyze every message
+EMAIL_PREFILTER = os.getenv('EMAIL_PREFILTER', '1') != '0'
+
+# Syncs that retry a message that failed to download before it is given up on (e.g. it was deleted meanwhile)
+GMAIL_FETCH_ATTEMPTS = int(os.getenv('GMAIL_FETCH_ATTEMPTS', '3'))
+
+# Priority given to bulk messages without asking the LLM
+BULK_EMAIL_PRIORITY = 'Low Priority: newsletter or mailing list message.'
 
 def authenticate_gmail_api():
-    """Authenticates and returns the Gmail API service instance."""
-    creds = None
-    # The token2.json file stores the user's access and refresh tokens
-    if os.path.exists('token2.json'):
-        creds = Credentials.from_authorized_user_file('token2.json', SCOPES)
-    # If credentials are invalid, expired, or lack required scopes, log the user in
-    if not creds or not creds.valid or not creds.has_scopes(SCOPES):
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            # Use InstalledAppFlow.from_client_secrets_file()
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'client_secret-agents.json', SCOPES, redirect_uri='http://localhost:8080/')
-            # Use run_local_server() with the specified port
-            creds = flow.run_local_server(port=8080)
-        # Save the credentials for future runs
-        with open('token2.json', 'w') as token:
-            token.write(creds.to_json())
-    # Build the Gmail API service
-    service = build('gmail', 'v1', credentials=creds)
-    return service
-
-def get_last_emails(service, max_results=20):
+    """Returns the Gmail API service instance of the active session's account."""
+    # The session's credentials are loaded once per account and refreshed before they expire
+    return get_gmail_service()
+
+def fetch_messages_batched(service, message_ids, batch_size=50, message_format='full', metadata_headers=None):
+    """
+    Fetches Gmail messages by ID using the HTTP batch endpoint instead of one request per message.
+
+    Parameters:
+    - service: Authorized Gmail API service instance.
+    - message_ids (list): IDs of the messages to fetch.
+    - batch_size (int): Number of gets grouped into a single batch request (Gmail allows at most 100).
+    - message_format (str): The `format` passed to `messages().get`.
+    - metadata_headers (list): The headers returned with message_format='metadata'. All headers if None.
+
+    Returns:
+    - tuple: (messages, stats) where messages is a list of message dicts in the same order as message_ids
+      (messages that failed are left out) and stats is a list with one dict per batch containing
+      the batch size, its latency in seconds and the IDs that failed with their error.
+    """
+    batch_size = max(1, min(batch_size, 100))
+    fetched = {}
+    stats = []
+
+    for offset in range(0, len(message_ids), batch_size):
+        chunk = message_ids[offset:offset + batch_size]
+        failures = {}
+
+        def handle_response(request_id, response, exception):
+            # Record every item separately so one bad message doesn't fail the whole batch
+            if exception is not None:
+                failures[request_id] = str(exception)
+            else:
+                fetched[request_id] = response
+
+        batch = service.new_batch_http_request(callback=handle_response)
+        for msg_id in chunk:
+            params = {'metadataHeaders': metadata_headers} if metadata_headers else {}
+            batch.add(
+                service.users().messages().get(userId='me', id=msg_id, format=message_format, **params),
+                request_id=msg_id)
+
+        started = time.perf_counter()
+        try:
+            batch.execute()
+        except HttpError as error:
+            # The batch request itself failed, so every message in it is missing
+            for msg_id in chunk:
+                failures.setdefault(msg_id, str(error))
+        latency = time.perf_counter() - started
+
+        stats.append({"size": len(chunk), "latency": latency, "failed": failures})
+        print(f'Batch {len(stats)}: fetched {len(chunk) - len(failures)}/{len(chunk)} messages ({message_format}) in {latency:.3f}s')
+        for msg_id, error in failures.items():
+            print(f'Failed to fetch message {msg_id}: {error}')
+
+    messages = [fetched[msg_id] for msg_id in message_ids if msg_id in fetched]
+    return messages, stats
+
+def get_last_emails(service, max_results=20, batch_size=None):
     """
     Fetches the last emails from the user's Gmail inbox.
 
     Parameters:
     - service: Authorized Gmail API service instance.
     - max_results: Number of emails to fetch.
+    - batch_size: If set, fetch the messages through batch requests of this size
+      instead of one request per message.
 
     Returns:
     - A list of email messages.
@@ -68,6 +139,11 @@ def get_last_emails(service, max_results=20):
             print('No messages found.')
             return email_messages
 
+        if batch_size:
+            email_messages, _ = fetch_messages_batched(
+                service, [msg['id'] for msg in messages], batch_size=batch_size)
+            return email_messages
+
         for msg in messages:
             # Get the message details
             msg_id = msg['id']
@@ -81,86 +157,264 @@ def get_last_emails(service, max_results=20):
         print(f'An error occurred: {error}')
         return None
 
-def get_email_body(message):
-    """Extracts the text content from an email message, stripping out HTML tags."""
-    body = ''
-    payload = message['payload']
-
-    def extract_parts(parts_list):
-        nonlocal body
-        for part in parts_list:
-            mime_type = part.get('mimeType')
-            if part.get('parts'):
-                extract_parts(part['parts'])
-            elif mime_type == 'text/plain':
-                data = part['body'].get('data')
-                if data:
-                    text = base64.urlsafe_b64decode(data).decode('utf-8')
-                    body += text
-            elif mime_type == 'text/html' and not body:
-                # Only process HTML if text/plain is not available
-                data = part['body'].get('data')
-                if data:
-                    html_content = base64.urlsafe_b64decode(data).decode('utf-8')
-                    # Parse HTML and extract text
-                    soup = BeautifulSoup(html_content, 'html.parser')
-                    text = soup.get_text()
-                    body += text
-
-    if payload.get('parts'):
-        extract_parts(payload['parts'])
-    else:
-        # Single-part message
-        mime_type = payload.get('mimeType')
-        data = payload['body'].get('data')
-        if data:
-            content = base64.urlsafe_b64decode(data).decode('utf-8')
-            if mime_type == 'text/plain':
-                body += content
-            elif mime_type == 'text/html':
-                soup = BeautifulSoup(content, 'html.parser')
-                text = soup.get_text()
-                body += text
-
-    return body
+def _apply_history(service, store, account, start_history_id):
+    """
+    Applies the inbox changes recorded since start_history_id to the store.
 
+    Returns:
+    - tuple: (message_ids, history_id) with the IDs of messages that must be fetched
+      and the mailbox history ID the store is now up to date with.
+    """
+    to_fetch = []
+    page_token = None
+    while True:
+        response = service.users().history().list(
+            userId='me', startHistoryId=start_history_id, pageToken=page_token,
+            historyTypes=['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved']).execute()
+
+        for record in response.get('history', []):
+            for added in record.get('messagesAdded', []):
+                message = added['message']
+                if 'INBOX' in message.get('labelIds', []) and not store.has_message(account, message['id']):
+                    to_fetch.append(message['id'])
+            for deleted in record.get('messagesDeleted', []):
+                store.delete_message(account, deleted['message']['id'])
+                store.remove_pending(account, [deleted['message']['id']])
+            for labeled in record.get('labelsAdded', []):
+                if 'INBOX' in labeled.get('labelIds', []):
+                    message_id = labeled['message']['id']
+                    if store.has_message(account, message_id):
+                        store.set_in_inbox(account, message_id, True)
+                    else:
+                        to_fetch.append(message_id)
+            for unlabeled in record.get('labelsRemoved', []):
+                if 'INBOX' in unlabeled.get('labelIds', []):
+                    store.set_in_inbox(account, unlabeled['message']['id'], False)
+
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            # Deduplicate while keeping the order in which the messages were added
+            return list(dict.fromkeys(to_fetch)), response.get('historyId', start_history_id)
+
+def _store_messages(service, store, account, message_ids, batch_size):
+    """
+    Fetches messages that are not in the store yet and adds them to it, together with the messages that failed
+    in earlier syncs. The IDs that fail again are kept in the store to be retried by the next sync, so the
+    history ID can move on without losing them.
 
-def fetch_emails_as_dict(service, max_results=20):
+    Returns:
+    - int: The number of messages added to the store.
     """
-    Fetches the last emails and formats them into a dictionary.
+    message_ids = list(dict.fromkeys(list(message_ids) + store.pending_ids(account)))
+    emails = fetch_email_records(service, message_ids, batch_size)
+    for email in emails:
+        store.add_message(account, email, in_inbox='INBOX' in email.labels)
+        if email.content is None:
+            # Bulk messages get their report right away, so they are never analyzed
+            store.set_report(account, bulk_email_report(email))
+
+    fetched = {email.id for email in emails}
+    store.remove_pending(account, fetched)
+    failed = [message_id for message_id in message_ids if message_id not in fetched]
+    if failed:
+        dropped = store.add_pending(account, failed, GMAIL_FETCH_ATTEMPTS)
+        print(f'{len(failed)} messages could not be fetched and will be retried by the next sync')
+        for message_id in dropped:
+            print(f'Giving up on message {message_id} after {GMAIL_FETCH_ATTEMPTS} failed fetches')
+    return len(emails)
+
+def sync_inbox(service, store, max_results=20, batch_size=50):
+    """
+    Brings the local message store up to date with the Gmail inbox.
+
+    If the account was synced before, only the changes since the stored history ID are fetched
+    through users().history().list. Otherwise (or if the history ID has expired) the last
+    `max_results` inbox messages are listed and the missing ones are downloaded.
+    Messages that fail to download are recorded in the store and retried by the following syncs.
 
     Parameters:
     - service: Authorized Gmail API service instance.
-    - max_results: Number of emails to fetch.
+    - store (MessageStore): The local message store.
+    - max_results: Number of inbox messages the report needs.
+    - batch_size: Number of message gets grouped into one batch request.
 
     Returns:
-    - dict: Dictionary where keys are the email senders, and values are a tuple containing email contents and a link to the email.
+    - str: The email address of the synced account.
     """
-    # Fetch the last X emails
-    emails = get_last_emails(service, max_results)
-    
-    email_dict = {}
+    # Read the profile first so that changes made while we sync are picked up next time
+    profile = service.users().getProfile(userId='me').execute()
+    account = profile['emailAddress']
+    history_id = store.get_history_id(account)
 
-    if emails:
-        for email in emails:
-            headers = email['payload']['headers']
-            from_email = ''
-            for header in headers:
-                if header['name'] == 'From':
-                    from_email = header['value']
-                    break  # Stop once we find the 'From' header
+    if history_id is not None and store.count_inbox(account) >= max_results:
+        try:
+            new_ids, history_id = _apply_history(service, store, account, history_id)
+            fetched = _store_messages(service, store, account, new_ids, batch_size)
+            store.set_history_id(account, history_id)
+            print(f'Incremental sync: {fetched} new messages')
+            return account
+        except HttpError as error:
+            # A 404 means the stored history ID is too old, so fall back to a full sync
+            if getattr(error.resp, 'status', None) != 404:
+                raise
+            print('Stored history ID has expired, running a full sync.')
+
+    results = service.users().messages().list(
+        userId='me', maxResults=max_results, labelIds=['INBOX']).execute()
+    message_ids = [msg['id'] for msg in results.get('messages', [])]
+
+    store.clear_inbox(account)
+    missing = []
+    for message_id in message_ids:
+        if store.has_message(account, message_id):
+            store.set_in_inbox(account, message_id, True)
+        else:
+            missing.append(message_id)
+    fetched = _store_messages(service, store, account, missing, batch_size)
+    store.set_history_id(account, profile['historyId'])
+    print(f'Full sync: {fetched} messages downloaded, {len(message_ids) - len(missing)} already stored')
+    return account
+
+_message_store = None
+_message_store_lock = threading.Lock()
+
+def get_message_store():
+    """Returns the process-wide local message store configured by GMAIL_STORE_PATH and GMAIL_STORE_MAX_MESSAGES."""
+    global _message_store
+    with _message_store_lock:
+        if _message_store is None:
+            _message_store = MessageStore(os.getenv('GMAIL_STORE_PATH', 'gmail_store.sqlite3'),
+                                          max_messages=int(os.getenv('GMAIL_STORE_MAX_MESSAGES', '2000')))
+        return _message_store
+
+def get_email_body(message, engine=None, max_chars=None):
+    """
+    Extracts the text content from an email message, stripping out HTML tags, styles, scripts and quoted replies.
 
-            # Extract the email body
-            body = get_email_body(email)
+    Parameters:
+    - message (dict): A message fetched with format='full'.
+    - engine (str): The HTML to text engine ('auto', 'stream', 'lxml' or 'bs4'). Defaults to EMAIL_HTML_ENGINE.
+    - max_chars (int): Maximum length of the body. Defaults to EMAIL_MAX_BODY_CHARS.
 
-            # Get the message ID and create the Gmail link for the email
-            message_id = email['id']
-            email_link = f"https://mail.google.com/mail/u/0/#inbox/{message_id}"
+    Returns:
+    - str: The body text.
+    """
+    return extract_body(message['payload'], engine=engine, max_chars=max_chars)
+
+
+def is_bulk_email(headers, labels):
+    """
+    Tells whether a message is a newsletter, mailing list message or notification from its headers and labels.
+
+    Parameters:
+    - headers (dict): The message headers, keyed by lowercase name.
+    - labels (iterable): The message's label IDs.
+    """
+    if 'list-unsubscribe' in headers or 'list-id' in headers:
+        return True
+    if headers.get('precedence', '').strip().lower() in ('bulk', 'list', 'junk'):
+        return True
+    return not BULK_LABELS.isdisjoint(labels)
+
+
+def parse_email_metadata(email):
+    """
+    Builds the EmailMessage of a message fetched with format='metadata' (or 'full'), without its body.
+
+    Returns:
+    - EmailMessage: The message with its sender (the value of the 'From' header), subject, labels and bulk flag.
+    """
+    headers = {header['name'].lower(): header['value'] for header in email.get('payload', {}).get('headers', [])}
+    labels = tuple(email.get('labelIds', ()))
+    return EmailMessage(
+        email['id'], headers.get('from', ''), subject=headers.get('subject', ''),
+        internal_date=int(email.get('internalDate', 0)), labels=labels, bulk=is_bulk_email(headers, labels))
+
+
+def load_email_bodies(service, emails, batch_size=50):
+    """
+    Downloads the full messages of EmailMessage records built from metadata and fills in their bodies.
+
+    Returns:
+    - list: The per-batch stats of fetch_messages_batched.
+    """
+    by_id = {email.id: email for email in emails}
+    messages, stats = fetch_messages_batched(service, list(by_id), batch_size=batch_size)
+    for message in messages:
+        by_id[message['id']].content = get_email_body(message)
+    return stats
+
+
+def fetch_email_records(service, message_ids, batch_size=50, prefilter=None):
+    """
+    Fetches messages in two phases: the metadata of every message first, then the full message only for
+    those that pass the bulk mail prefilter. Bulk messages keep content=None.
+
+    Parameters:
+    - service: Authorized Gmail API service instance.
+    - message_ids (list): IDs of the messages to fetch.
+    - batch_size (int): Number of gets grouped into a single batch request.
+    - prefilter (bool): Skip the bodies of bulk messages. Defaults to EMAIL_PREFILTER.
+
+    Returns:
+    - list: EmailMessage records in the same order as message_ids (messages whose metadata or body failed
+      are left out).
+    """
+    prefilter = EMAIL_PREFILTER if prefilter is None else prefilter
+    if not message_ids:
+        return []
+
+    metadata, metadata_stats = fetch_messages_batched(
+        service, message_ids, batch_size=batch_size, message_format='metadata', metadata_headers=METADATA_HEADERS)
+    emails = [parse_email_metadata(message) for message in metadata]
+
+    to_load = [email for email in emails if not (prefilter and email.bulk)]
+    skipped = len(emails) - len(to_load)
+    body_stats = load_email_bodies(service, to_load, batch_size) if to_load else []
+    failed = sum(email.content is None for email in to_load)
+    metadata_count = len(emails)
+    if failed:
+        # Messages whose body failed are left out like those whose metadata failed
+        emails = [email for email in emails if email.content is not None or (prefilter and email.bulk)]
+
+    metadata_time = sum(batch['latency'] for batch in metadata_stats)
+    body_time = sum(batch['latency'] for batch in body_stats)
+    print(f'Fetched metadata of {metadata_count} messages in {metadata_time:.3f}s '
+          f'({1000 * metadata_time / max(1, metadata_count):.1f} ms/message) and {len(to_load) - failed} bodies '
+          f'in {body_time:.3f}s ({1000 * body_time / max(1, len(to_load)):.1f} ms/message), '
+          f'skipped {skipped} bulk messages, {failed} bodies failed')
+    return emails
+
+
+def fetch_emails(service, max_results=20, batch_size=50, prefilter=None):
+    """
+    Fetches the last emails as EmailMessage records, downloading the bodies of non-bulk messages only.
+
+    Parameters:
+    - service: Authorized Gmail API service instance.
+    - max_results: Number of emails to fetch.
+    - batch_size: Number of gets grouped into a single batch request.
+    - prefilter (bool): Skip the bodies of bulk messages. Defaults to EMAIL_PREFILTER.
+
+    Returns:
+    - list: EmailMessage records, newest first. Several emails from the same sender are all kept.
+    """
+    try:
+        results = service.users().messages().list(
+            userId='me', maxResults=max_results, labelIds=['INBOX']).execute()
+    except HttpError as error:
+        print(f'An error occurred: {error}')
+        return []
+    message_ids = [msg['id'] for msg in results.get('messages', [])]
+    if not message_ids:
+        print('No messages found.')
+    return fetch_email_records(service, message_ids, batch_size, prefilter)
 
-            # Combine everything into a tuple (email content, email link)
-            email_dict[from_email] = {"content": body, "link": email_link}
 
-    return email_dict
+def bulk_email_report(email):
+    """Returns the report of a bulk message whose body was not downloaded, without asking the LLM."""
+    return AnalysisReport('email', email.id, email.sender, email.link,
+                          summary=email.subject or 'Newsletter or mailing list message.', priority=BULK_EMAIL_PRIORITY)
 
 
 
@@ -176,10 +430,15 @@ def process_email_with_crew(email_sender: str, email_link: str, email_content: s
     Returns:
     - dict: A structured report containing the email summary and priority.
     """
+    # Long emails are cut to the token budget; the content only goes into the task descriptions,
+    # so each LLM call contains it once
+    email_content = fit_to_budget(
+        email_content, EMAIL_TOKEN_BUDGET, EMAIL_BUDGET_STRATEGY, label=f'email from {email_sender}', model=LLM_MODEL_NAME)
+
     # Summarizer Agent
     email_summarizer = Agent(
         role='Email Summarizer',
-        goal=f'Go through the email provided to you by the sender {email_sender} with the link {email_link} and generate a concise summary (maximum 30 words) of its contents, highlighting only the key information. {email_content}',
+        goal=f'Go through the email provided to you by the sender {email_sender} with the link {email_link} and generate a concise summary (maximum 30 words) of its contents, highlighting only the key information.',
         verbose=True,
         memory=True,
         backstory=(
@@ -193,7 +452,7 @@ def process_email_with_crew(email_sender: str, email_link: str, email_content: s
     # Categorizer Agent
     email_categorizer = Agent(
         role='Email Priority Categorizer',
-        goal=f'Go through the email provided to you by the sender {email_sender} with the link {email_link}. Based on its textual content, categorize it as high, low, or medium priority with brief justification. {email_content}',
+        goal=f'Go through the email provided to you by the sender {email_sender} with the link {email_link}. Based on its textual content, categorize it as high, low, or medium priority with brief justification.',
         verbose=True,
         memory=True,
         backstory=(
@@ -263,7 +522,7 @@ def process_email_with_crew(email_sender: str, email_link: str, email_content: s
     )
 
     # Run the crew with input data
-    crew_output = crew.kickoff(inputs={'email_sender': email_sender, 'email_link': email_link, 'email_content': email_content})
+    crew_output = cached_kickoff(crew, inputs={'email_sender': email_sender, 'email_link': email_link, 'email_content': email_content})
 
     # Access the output as a JSON dictionary
     if crew_output.json_dict:
@@ -275,42 +534,294 @@ def process_email_with_crew(email_sender: str, email_link: str, email_content: s
         except json.JSONDecodeError:
             return {"raw_output": crew_output.raw}
 
-def process_all_emails(email_dict: dict) -> list:
+class EmailAnalysis(BaseModel):
+    summary: str = Field(description="A concise summary of the email of maximum 30 words.")
+    priority: str = Field(
+        pattern=r'^(High|Medium|Low) Priority: .+',
+        description='A single sentence of the format: "[High/Medium/Low] Priority: [justification]."'
+    )
+
+EMAIL_ANALYSIS_PROMPT = """You are an expert in email analysis, summarization and priority detection.
+Analyze the email given to you and respond with a JSON object with exactly these fields:
+"summary": a single concise paragraph of maximum 30 words summarizing the email's contents, highlighting only the key information.
+"priority": a single sentence of the format "[High/Medium/Low] Priority: [justification]." The justification should be no longer than 10 words.
+Only categorize as high priority if it requires immediate attention and has some important deadlines, otherwise go for medium or low priority.
+Especially if it's some sort of blog or subscription message, classify it as low priority."""
+
+def analyze_email_fast(email_sender: str, email_link: str, email_content: str) -> dict:
+    """
+    Generates the same report as process_email_with_crew from a single structured LLM call.
+    
+    Parameters:
+    - email_sender (str): The sender of the email.
+    - email_link (str): The link to the email in Gmail.
+    - email_content (str): The content of the email.
+    
+    Returns:
+    - dict: A structured report containing the email summary and priority.
+    """
+    email_content = fit_to_budget(
+        email_content, EMAIL_TOKEN_BUDGET, EMAIL_BUDGET_STRATEGY, label=f'email from {email_sender}', model=LLM_MODEL_NAME)
+    analysis = structured_completion(
+        EmailAnalysis,
+        EMAIL_ANALYSIS_PROMPT,
+        f"Email from {email_sender}:\n{email_content}",
+        model=LLM_MODEL_NAME)
+    return {
+        "Email Sender": email_sender,
+        "Email Link": email_link,
+        "Email Summary": analysis.summary,
+        "Email Priority": analysis.priority,
+    }
+
+def resolve_email_analysis_mode(mode: str = None) -> str:
+    """Returns the mode, or EMAIL_ANALYSIS_MODE if none is given, raising ValueError if it isn't one of EMAIL_ANALYSIS_MODES."""
+    mode = mode or EMAIL_ANALYSIS_MODE
+    if mode not in EMAIL_ANALYSIS_MODES:
+        raise ValueError(f"Unknown email analysis mode '{mode}'. Use one of: {', '.join(EMAIL_ANALYSIS_MODES)}.")
+    return mode
+
+def analyze_email(email: EmailMessage, mode: str = 'fast') -> AnalysisReport:
     """
-    Function to process all emails in the dictionary using the CrewAI agents to generate concise reports.
+    Generates the report for an email, using the single-call fast path and falling back to the crew if it fails.
     
     Parameters:
-    - email_dict (dict): Dictionary where keys are email senders and values contain email content and link.
+    - email (EmailMessage): The email to analyze.
+    - mode (str): 'fast' or 'crew'.
     
     Returns:
-    - list: A list of dictionaries where each dict contains the structured report for an email.
+    - AnalysisReport: The email summary and priority.
+    """
+    report = None
+    if mode == 'fast':
+        try:
+            report = analyze_email_fast(email.sender, email.link, email.content)
+        except Exception as error:
+            print(f'Fast analysis failed for the email from {email.sender}, falling back to the crew: {error}')
+    if report is None:
+        report = process_email_with_crew(email.sender, email.link, email.content)
+    return AnalysisReport.from_dict(report, 'email', email.id, email.sender, email.link)
+
+class EmailTriageRecord(BaseModel):
+    id: str = Field(description="The message ID of the email.")
+    summary: str = Field(description="A concise summary of the email of maximum 30 words.")
+    priority: str = Field(
+        pattern=r'^(High|Medium|Low) Priority: .+',
+        description='A single sentence of the format: "[High/Medium/Low] Priority: [justification]."'
+    )
+
+EMAIL_TRIAGE_PROMPT = """You are an expert in email analysis, summarization and priority detection.
+You will be given several emails, each starting with its message ID. Analyze every email separately and respond with a JSON object
+of the form {"emails": [...]} containing one object per email with exactly these fields:
+"id": the message ID of the email, copied exactly.
+"summary": a single concise paragraph of maximum 30 words summarizing the email's contents, highlighting only the key information.
+"priority": a single sentence of the format "[High/Medium/Low] Priority: [justification]." The justification should be no longer than 10 words.
+Only categorize as high priority if it requires immediate attention and has some important deadlines, otherwise go for medium or low priority.
+Especially if it's some sort of blog or subscription message, classify it as low priority."""
+
+def pack_email_batches(emails: list, token_budget: int = None, max_emails: int = None) -> list:
+    """
+    Groups emails into batches whose estimated prompt size stays within a token budget.
+
+    Parameters:
+    - emails (list): EmailMessage records.
+    - token_budget (int): Maximum estimated tokens of email text per batch. Defaults to TRIAGE_TOKEN_BUDGET.
+    - max_emails (int): Maximum number of emails per batch. Defaults to TRIAGE_MAX_EMAILS.
+
+    Returns:
+    - list: Batches, each a list of (email, prompt_section) tuples.
+    """
+    token_budget = token_budget or TRIAGE_TOKEN_BUDGET
+    max_emails = max_emails or TRIAGE_MAX_EMAILS
+    batches = []
+    current, current_tokens = [], 0
+
+    for email in emails:
+        # Long emails are cut (never summarized, which would cost a request per email) so that
+        # one email can't take up most of a batch
+        content = fit_to_budget(
+            email.content, min(token_budget, EMAIL_TOKEN_BUDGET), 'truncate', label=f'email from {email.sender}')
+        section = f"Message ID: {email.id}\nFrom: {email.sender}\n{content}\n---"
+        tokens = estimate_tokens(section)
+
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_emails):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append((email, section))
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
+def triage_email_batch(batch: list) -> dict:
+    """
+    Summarizes and prioritizes a batch of emails with a single LLM request.
+
+    Parameters:
+    - batch (list): (email, prompt_section) tuples from pack_email_batches.
+
+    Returns:
+    - dict: Valid records keyed by message ID. Emails missing from the response or failing validation are left out.
     """
+    raw = complete_json(EMAIL_TRIAGE_PROMPT, "\n".join(section for _, section in batch), model=LLM_MODEL_NAME)
+    try:
+        records = json.loads(raw).get("emails", [])
+    except (json.JSONDecodeError, AttributeError):
+        return {}
+
+    # Validate each record on its own so one malformed entry doesn't discard the whole batch
+    valid = {}
+    expected_ids = {email.id for email, _ in batch}
+    for record in records if isinstance(records, list) else []:
+        try:
+            record = EmailTriageRecord.model_validate(record)
+        except ValidationError:
+            continue
+        if record.id in expected_ids:
+            valid[record.id] = record
+    return valid
+
+def triage_emails_batched(emails: list, token_budget: int = None, max_workers: int = 1,
+                          requests_per_minute: int = None) -> list:
+    """
+    Generates the email reports by packing several emails into each LLM request.
+    Emails that the batched response misses or gets wrong are re-issued one by one with analyze_email.
+
+    Parameters:
+    - emails (list): EmailMessage records.
+    - token_budget (int): Maximum estimated tokens of email text per request. Defaults to TRIAGE_TOKEN_BUDGET.
+    - max_workers (int): Maximum number of batch requests running at the same time.
+    - requests_per_minute (int): Optional limit on LLM requests per minute sent to the Groq endpoint.
+
+    Returns:
+    - list: The AnalysisReport of each email, in the same order as emails.
+    """
+    emails = list(emails)
+    batches = pack_email_batches(emails, token_budget=token_budget)
+    rate_limiter = RateLimiter(requests_per_minute) if requests_per_minute else None
+
+    records = {}
+    for batch, (batch_records, error) in zip(batches, run_concurrently(
+            triage_email_batch, batches, max_workers=max_workers, rate_limiter=rate_limiter)):
+        if error is not None:
+            print(f'Batch triage request failed for {len(batch)} emails: {error}')
+            continue
+        records.update(batch_records)
+    print(f'Batch triage: {len(emails)} emails in {len(batches)} requests, {len(emails) - len(records)} to retry')
+
+    # Re-issue only the emails without a valid record
+    retry = [email for email in emails if email.id not in records]
+    retried = {report.source_id: report for report in process_all_emails(
+        retry, max_workers=max_workers, requests_per_minute=requests_per_minute, mode='fast')}
+
     results = []
+    for email in emails:
+        record = records.get(email.id)
+        if record is None:
+            results.append(retried[email.id])
+        else:
+            results.append(AnalysisReport('email', email.id, email.sender, email.link, record.summary, record.priority))
+    return results
+
+def process_all_emails(emails: list, max_workers: int = 1, requests_per_minute: int = None, mode: str = None) -> list:
+    """
+    Function to process all emails using the CrewAI agents to generate concise reports.
     
-    for email_sender, email_data in email_dict.items():
-        email_link = email_data["link"]
-        email_content = email_data["content"]
-        
-        # Call the CrewAI email processing function for each email
-        report = process_email_with_crew(email_sender, email_link, email_content)
-        
+    Parameters:
+    - emails (list): EmailMessage records.
+    - max_workers (int): Maximum number of crews running at the same time. 1 processes the emails one by one.
+    - requests_per_minute (int): Optional limit on LLM requests per minute sent to the Groq endpoint.
+    - mode (str): 'batch' (several emails per LLM call), 'fast' (one LLM call per email, crew as fallback)
+      or 'crew'. Defaults to EMAIL_ANALYSIS_MODE.
+    
+    Returns:
+    - list: The AnalysisReport of each email, in the same order as emails. Emails that could not be
+      processed get a report with an error, and bulk emails without a body get bulk_email_report.
+    """
+    emails = list(emails)
+    mode = resolve_email_analysis_mode(mode)
+    if any(email.content is None for email in emails):
+        # Only the emails whose bodies were downloaded go to the LLM
+        analyzed = iter(process_all_emails([email for email in emails if email.content is not None],
+                                           max_workers, requests_per_minute, mode))
+        return [bulk_email_report(email) if email.content is None else next(analyzed) for email in emails]
+
+    if mode == 'batch':
+        return triage_emails_batched(emails, max_workers=max_workers, requests_per_minute=requests_per_minute)
+
+    rate_limiter = RateLimiter(requests_per_minute) if requests_per_minute else None
+
+    def process(email):
+        # Analyze each email with the fast path or the CrewAI agents
+        return analyze_email(email, mode=mode)
+
+    results = []
+    outcomes = run_concurrently(process, emails, max_workers=max_workers, rate_limiter=rate_limiter,
+                                cost=1 if mode == 'fast' else EMAIL_CREW_LLM_CALLS)
+
+    for email, (report, error) in zip(emails, outcomes):
+        if error is not None:
+            # Report the failure for this email without aborting the rest of the batch
+            print(f'Failed to process email from {email.sender}: {error}')
+            report = AnalysisReport('email', email.id, email.sender, email.link, error=str(error))
+
         # Append the report to the results array
         results.append(report)
     
     return results
 
 
-def main_gmail(max_results):   
-    # Authenticate and get the Gmail API service
-    gmail_service = authenticate_gmail_api()
+def report_inbox_incrementally(gmail_service, max_results, batch_size=50, max_workers=4):
+    """
+    Builds the inbox report from the local message store, analyzing only messages without a stored report.
 
-    # Calling fetch_emails_as_dict and storing the result in 'email_data'
-    email_data = fetch_emails_as_dict(gmail_service, max_results)
-    
-    # Process all the emails and get the reports
-    email_reports = process_all_emails(email_data)
+    Parameters:
+    - gmail_service: Authorized Gmail API service instance.
+    - max_results: Number of emails in the report.
+    - batch_size: Number of message gets grouped into one batch request.
+    - max_workers: Maximum number of LLM requests running at the same time.
+
+    Returns:
+    - list: The AnalysisReport of each of the newest inbox messages.
+    """
+    store = get_message_store()
+    account = sync_inbox(gmail_service, store, max_results, batch_size)
+    latest = store.latest_inbox(account, max_results)
+
+    # Only analyze the messages that don't have a report from an earlier run
+    pending = [message for message, report in latest if report is None]
+    print(f'Analyzing {len(pending)} of {len(latest)} emails, the rest come from the local store')
+    new_reports = process_all_emails(pending, max_workers=max_workers, requests_per_minute=GROQ_REQUESTS_PER_MINUTE)
+
+    reports = {}
+    for report in new_reports:
+        reports[report.source_id] = report
+        if report.error is None:
+            store.set_report(account, report)
+
+    return [report or reports[message.id] for message, report in latest]
+
+def main_gmail(max_results, batch_size=50, max_workers=4, incremental=True, gmail_service=None):
+    # Use the given Gmail API service, or the one of the active session
+    gmail_service = gmail_service or authenticate_gmail_api()
+
+    if incremental:
+        # Fetch only new messages and reuse the stored analyses
+        email_reports = report_inbox_incrementally(gmail_service, max_results, batch_size, max_workers)
+    else:
+        # Fetch the emails as EmailMessage records
+        emails = fetch_emails(gmail_service, max_results, batch_size=batch_size)
+        
+        # Process all the emails and get the reports
+        email_reports = process_all_emails(emails, max_workers=max_workers,
+                                           requests_per_minute=GROQ_REQUESTS_PER_MINUTE)
+
+    cache = get_response_cache()
+    if cache is not None:
+        print(f'LLM response cache: {cache.stats()}')
 
-    # Return the structured reports for each email
+    # Return the AnalysisReport of each email
     return email_reports
 
 
@@ -0,0 +1,141 @@
+import json
+import sqlite3
+import threading
+
+from models import AnalysisReport, EmailMessage
+
+
+class MessageStore:
+    """
+    A local SQLite store of inbox messages, their analyses and the last synced Gmail history ID per account.
+
+    Parameters:
+    - path (str): Path of the SQLite database file.
+    - max_messages (int): Maximum number of messages kept per account. Messages that left the inbox are evicted
+      first, then the oldest ones.
+    """
+
+    def __init__(self, path, max_messages=2000):
+        self.path = path
+        self.max_messages = max_messages
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS accounts (account TEXT PRIMARY KEY, history_id TEXT NOT NULL)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "account TEXT NOT NULL, id TEXT NOT NULL, internal_date INTEGER NOT NULL, in_inbox INTEGER NOT NULL, "
+                "sender TEXT NOT NULL, content TEXT NOT NULL, report TEXT, PRIMARY KEY (account, id))")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS pending (account TEXT NOT NULL, id TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL, PRIMARY KEY (account, id))")
+
+    def get_history_id(self, account):
+        """Returns the history ID of the last sync for the account, or None if it was never synced."""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT history_id FROM accounts WHERE account = ?", (account,)).fetchone()
+            return row[0] if row else None
+
+    def set_history_id(self, account, history_id):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO accounts (account, history_id) VALUES (?, ?)", (account, str(history_id)))
+
+    def pending_ids(self, account):
+        """Returns the IDs of the messages that failed to download and must be fetched again."""
+        with self.lock:
+            rows = self.connection.execute("SELECT id FROM pending WHERE account = ?", (account,)).fetchall()
+            return [row[0] for row in rows]
+
+    def add_pending(self, account, message_ids, max_attempts):
+        """
+        Records failed downloads so the next sync retries them.
+
+        Parameters:
+        - account (str): The account of the messages.
+        - message_ids (list): IDs of the messages that failed.
+        - max_attempts (int): Number of failures after which a message is no longer retried.
+
+        Returns:
+        - list: The IDs that reached max_attempts and were dropped.
+        """
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT INTO pending (account, id, attempts) VALUES (?, ?, 1) "
+                "ON CONFLICT (account, id) DO UPDATE SET attempts = attempts + 1",
+                [(account, message_id) for message_id in message_ids])
+            dropped = [row[0] for row in self.connection.execute(
+                "SELECT id FROM pending WHERE account = ? AND attempts >= ?", (account, max_attempts))]
+            self.connection.execute(
+                "DELETE FROM pending WHERE account = ? AND attempts >= ?", (account, max_attempts))
+            return dropped
+
+    def remove_pending(self, account, message_ids):
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "DELETE FROM pending WHERE account = ? AND id = ?", [(account, message_id) for message_id in message_ids])
+
+    def has_message(self, account, message_id):
+        with self.lock:
+            return self.connection.execute(
+                "SELECT 1 FROM messages WHERE account = ? AND id = ?", (account, message_id)).fetchone() is not None
+
+    def add_message(self, account, message, in_inbox=True):
+        """Stores an EmailMessage, evicting messages over max_messages; an existing message keeps its analysis."""
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO messages (account, id, internal_date, in_inbox, sender, content) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (account, id) DO UPDATE SET in_inbox = excluded.in_inbox",
+                (account, message.id, int(message.internal_date), int(in_inbox), message.sender, message.content or ''))
+            count = self.connection.execute("SELECT COUNT(*) FROM messages WHERE account = ?", (account,)).fetchone()[0]
+            if count > self.max_messages:
+                self.connection.execute(
+                    "DELETE FROM messages WHERE account = ? AND id IN (SELECT id FROM messages WHERE account = ? "
+                    "ORDER BY in_inbox, internal_date LIMIT ?)", (account, account, count - self.max_messages))
+
+    def set_in_inbox(self, account, message_id, in_inbox):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE messages SET in_inbox = ? WHERE account = ? AND id = ?", (int(in_inbox), account, message_id))
+
+    def clear_inbox(self, account):
+        """Marks every stored message of the account as out of the inbox (used before a full sync)."""
+        with self.lock, self.connection:
+            self.connection.execute("UPDATE messages SET in_inbox = 0 WHERE account = ?", (account,))
+
+    def delete_message(self, account, message_id):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM messages WHERE account = ? AND id = ?", (account, message_id))
+
+    def count_inbox(self, account):
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM messages WHERE account = ? AND in_inbox = 1", (account,)).fetchone()[0]
+
+    def latest_inbox(self, account, limit):
+        """
+        Returns the newest inbox messages of the account.
+
+        Returns:
+        - list: (message, report) tuples of an EmailMessage and its stored AnalysisReport (None if not analyzed yet).
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT id, internal_date, sender, content, report FROM messages WHERE account = ? AND in_inbox = 1 "
+                "ORDER BY internal_date DESC LIMIT ?", (account, limit)).fetchall()
+        latest = []
+        for message_id, internal_date, sender, content, report in rows:
+            message = EmailMessage(message_id, sender, content, internal_date=internal_date)
+            if report:
+                report = AnalysisReport.from_dict(json.loads(report), 'email', message.id, message.sender, message.link)
+            latest.append((message, report or None))
+        return latest
+
+    def set_report(self, account, report):
+        """Stores the AnalysisReport of a message."""
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE messages SET report = ? WHERE account = ? AND id = ?",
+                (json.dumps(report.to_dict()), account, report.source_id))
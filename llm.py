@@ -0,0 +1,101 @@
+import json
+import os
+import threading
+
+from dotenv import load_dotenv
+from openai import OpenAI
+from pydantic import ValidationError
+
+from llm_cache import get_response_cache, make_key
+
+load_dotenv()
+
+# Model of the single-call paths (structured analyses, batch triage, summaries). The agents use OPENAI_MODEL_NAME,
+# which each page overwrites when it is imported
+LLM_MODEL_NAME = os.getenv('LLM_MODEL_NAME', 'llama-3.1-70b-versatile')
+
+# One client per process; the OpenAI client is thread-safe and reuses its HTTP connections
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Returns the OpenAI-compatible client for the Groq endpoint configured in the environment."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OpenAI(api_key=os.environ['OPENAI_API_KEY'], base_url=os.environ['OPENAI_API_BASE'])
+        return _client
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimates the number of tokens in a text (about 4 characters per token for English)."""
+    return len(text) // 4 + 1
+
+
+def complete_json(system_prompt: str, user_prompt: str, model: str = None, temperature: float = 0,
+                  use_cache: bool = True) -> str:
+    """
+    Sends a single chat completion request in JSON mode and returns the raw response text.
+
+    Parameters:
+    - system_prompt (str): Instructions for the model. Must mention that the answer is JSON.
+    - user_prompt (str): The content to analyze.
+    - model (str): The model name. Defaults to LLM_MODEL_NAME.
+    - temperature (float): Sampling temperature.
+    - use_cache (bool): Look the prompt up in the response cache first. The response is stored either way.
+
+    Returns:
+    - str: The JSON text returned by the model.
+    """
+    model = model or LLM_MODEL_NAME
+
+    # Identical prompts to the same model are answered from the persistent cache
+    cache = get_response_cache()
+    key = make_key(model, system_prompt, user_prompt, temperature)
+    if cache is not None and use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    response = get_client().chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        response_format={"type": "json_object"},
+        temperature=temperature,
+    )
+    content = response.choices[0].message.content
+    if cache is not None:
+        cache.set(key, content)
+    return content
+
+
+def structured_completion(schema, system_prompt: str, user_prompt: str, model: str = None, retries: int = 1):
+    """
+    Gets a response validated against a pydantic schema from a single LLM call, retrying on invalid output.
+
+    Parameters:
+    - schema: The pydantic model class the response must match.
+    - system_prompt (str): Instructions for the model, including the expected JSON fields.
+    - user_prompt (str): The content to analyze.
+    - model (str): The model name. Defaults to LLM_MODEL_NAME.
+    - retries (int): Number of extra calls made when the response doesn't match the schema.
+
+    Returns:
+    - An instance of `schema`.
+
+    Raises:
+    - ValueError: If no valid response was obtained.
+    """
+    last_error = None
+    for attempt in range(retries + 1):
+        # Retries skip the cache so an invalid cached response is replaced rather than returned again
+        raw = complete_json(system_prompt, user_prompt, model=model, use_cache=attempt == 0)
+        try:
+            return schema.model_validate(json.loads(raw))
+        except (json.JSONDecodeError, ValidationError) as error:
+            last_error = error
+    raise ValueError(f"The model did not return a valid {schema.__name__}: {last_error}")
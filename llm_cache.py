@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    """
+    A persistent SQLite cache for LLM responses, with a time-to-live and least-recently-used eviction.
+
+    Parameters:
+    - path (str): Path of the SQLite database file.
+    - ttl (int): Number of seconds an entry stays valid.
+    - max_entries (int): Maximum number of entries kept; the least recently used ones are evicted first.
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=5000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        # One connection shared by all threads, serialized by the lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL)")
+
+    def get(self, key):
+        """Returns the cached response for the key, or None if it is missing or expired."""
+        now = time.time()
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT value FROM responses WHERE key = ? AND created >= ?", (key, now - self.ttl)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, value):
+        """Stores a response and evicts expired and excess entries."""
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, now, now))
+            self.connection.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            count = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                self.connection.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_access LIMIT ?)", (count - self.max_entries,))
+
+    def stats(self):
+        """Returns the hit and miss counters of this process and the number of stored entries."""
+        with self.lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+
+def make_key(*parts):
+    """Builds a cache key by hashing the model name, prompt texts and any other parts that affect the response."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    Returns the process-wide response cache configured by LLM_CACHE_PATH, LLM_CACHE_TTL and LLM_CACHE_MAX_ENTRIES,
+    or None if LLM_CACHE_PATH is set to an empty string.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            path = os.getenv('LLM_CACHE_PATH', 'llm_cache.sqlite3')
+            if not path:
+                return None
+            _cache = ResponseCache(
+                path,
+                ttl=int(os.getenv('LLM_CACHE_TTL', str(7 * 24 * 3600))),
+                max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', '5000')))
+        return _cache
+
+
+class CachedCrewOutput:
+    """A crew result served from the cache, exposing the same `raw` and `json_dict` attributes as CrewOutput."""
+
+    def __init__(self, raw, json_dict=None):
+        self.raw = raw
+        self.json_dict = json_dict
+
+
+def cached_kickoff(crew, inputs=None, content_hash=None):
+    """
+    Runs `crew.kickoff`, or returns the stored result of an identical earlier run.
+
+    The key covers the model name, every agent's role, goal and backstory, every task's description and
+    expected output, and the kickoff inputs. Pass `content_hash` when the crew reads content through a tool
+    (e.g. a file version) so that changed content is not served from the cache.
+
+    Parameters:
+    - crew: The CrewAI crew to run.
+    - inputs (dict): The kickoff inputs.
+    - content_hash (str): Optional hash or version of content that the prompts don't contain.
+
+    Returns:
+    - The CrewOutput of the run, or a CachedCrewOutput on a cache hit.
+    """
+    cache = get_response_cache()
+    if cache is None:
+        return crew.kickoff(inputs=inputs)
+
+    key = make_key(
+        os.getenv('OPENAI_MODEL_NAME'),
+        [(agent.role, agent.goal, agent.backstory) for agent in crew.agents],
+        [(task.description, task.expected_output) for task in crew.tasks],
+        inputs,
+        content_hash)
+    cached = cache.get(key)
+    if cached is not None:
+        entry = json.loads(cached)
+        return CachedCrewOutput(entry['raw'], entry['json_dict'])
+
+    crew_output = crew.kickoff(inputs=inputs)
+    cache.set(key, json.dumps({'raw': crew_output.raw, 'json_dict': crew_output.json_dict}))
+    return crew_output
@@ -0,0 +1,151 @@
+import json
+from dataclasses import dataclass
+
+# Report keys of each kind of source, as shown on the pages and stored with the messages
+REPORT_KEYS = {
+    'email': ('Email Sender', 'Email Link', 'Email Summary', 'Email Priority'),
+    'file': ('File Name', 'File Link', 'Document Summary', 'Document Priority'),
+}
+
+
+@dataclass(slots=True)
+class EmailMessage:
+    """
+    A Gmail message reduced to what the reports use.
+
+    Attributes:
+    - id (str): The Gmail message ID.
+    - sender (str): The value of the 'From' header.
+    - content (str): The text body, or None if only the message's metadata was fetched.
+    - subject (str): The value of the 'Subject' header.
+    - internal_date (int): Milliseconds since the epoch at which Gmail received the message.
+    - labels (tuple): The message's label IDs.
+    - bulk (bool): Whether the message looks like a newsletter or mailing list message.
+    """
+    id: str
+    sender: str
+    content: str = None
+    subject: str = ''
+    internal_date: int = 0
+    labels: tuple = ()
+    bulk: bool = False
+
+    @property
+    def link(self):
+        """The link to the message in the Gmail web interface."""
+        return f"https://mail.google.com/mail/u/0/#inbox/{self.id}"
+
+
+@dataclass(slots=True)
+class DriveFile:
+    """
+    The metadata of a Google Drive file or folder.
+
+    Attributes:
+    - id (str): The Drive file ID.
+    - name (str): The file name.
+    - mime_type (str): The MIME type.
+    - modified_time (str): RFC 3339 time of the last change, if it was listed.
+    - md5_checksum (str): Checksum of the contents of binary files, if it was listed.
+    """
+    id: str
+    name: str
+    mime_type: str = ''
+    modified_time: str = None
+    md5_checksum: str = None
+
+    @classmethod
+    def from_api(cls, item):
+        """Builds the record from an item of files().list."""
+        return cls(item['id'], item['name'], item.get('mimeType', ''), item.get('modifiedTime'), item.get('md5Checksum'))
+
+    @property
+    def link(self):
+        """The link to the file in the Drive web interface."""
+        return f"https://drive.google.com/file/d/{self.id}/view"
+
+    @property
+    def version(self):
+        """Identifies the file's contents, so cached downloads are dropped when the file changes."""
+        return self.md5_checksum or self.modified_time
+
+
+@dataclass(slots=True)
+class CalendarEvent:
+    """
+    A calendar event with its start and end in the user's timezone.
+
+    Attributes:
+    - id (str): The Calendar event ID.
+    - summary (str): The title.
+    - start (str): 'YYYY-MM-DDTHH:MM:SS' local time, or 'YYYY-MM-DD' for all-day events.
+    - end (str): Same format as start; the last day (inclusive) for all-day events.
+    - all_day (bool): Whether the event lasts whole days.
+    - description (str): The description, if any.
+    - location (str): The location, if any.
+    """
+    id: str
+    summary: str
+    start: str
+    end: str
+    all_day: bool = False
+    description: str = None
+    location: str = None
+
+    def to_dict(self):
+        """Returns the compact dict passed to the agent, leaving out empty fields."""
+        record = {'start': self.start, 'end': self.end, 'summary': self.summary}
+        if self.all_day:
+            record['all_day'] = True
+        if self.description:
+            record['description'] = self.description
+        if self.location:
+            record['location'] = self.location
+        return record
+
+
+@dataclass(slots=True)
+class AnalysisReport:
+    """
+    The summary and priority of an email or a Drive file.
+
+    Attributes:
+    - kind (str): 'email' or 'file'.
+    - source_id (str): The message or file ID the report is about.
+    - title (str): The email's sender or the file's name.
+    - link (str): The link to the email or file.
+    - summary (str): The summary, or None if the analysis failed.
+    - priority (str): "[High/Medium/Low] Priority: [justification].", or None if the analysis failed.
+    - error (str): Why the analysis failed, if it did.
+    """
+    kind: str
+    source_id: str
+    title: str
+    link: str
+    summary: str = None
+    priority: str = None
+    error: str = None
+
+    @classmethod
+    def from_dict(cls, data, kind, source_id, title, link):
+        """
+        Builds the report from a dict with the keys of to_dict, e.g. the JSON output of a crew or a stored report.
+        Output without a summary (e.g. {"raw_output": ...} when the crew's answer wasn't JSON) is kept as the summary.
+        """
+        title_key, link_key, summary_key, priority_key = REPORT_KEYS[kind]
+        summary = data.get(summary_key)
+        if summary is None and 'Error' not in data:
+            summary = data.get('raw_output') or json.dumps(data)
+        return cls(kind, source_id, data.get(title_key) or title, data.get(link_key) or link,
+                   summary, data.get(priority_key), data.get('Error'))
+
+    def to_dict(self):
+        """Returns the report with the keys shown on the pages, e.g. 'Email Sender' or 'Document Summary'."""
+        title_key, link_key, summary_key, priority_key = REPORT_KEYS[self.kind]
+        report = {title_key: self.title, link_key: self.link}
+        if self.error is not None:
+            report['Error'] = self.error
+        else:
+            report[summary_key] = self.summary
+            report[priority_key] = self.priority
+        return report
@@ -1,9 +1,10 @@
-import re
 import streamlit as st
 import os
 from dotenv import load_dotenv
 from composio_crewai import ComposioToolSet, Action
 from crewai import Agent, Task, Crew, Process
+from transcript_analysis import analyze_transcript, format_transcript_report
+from uploads import open_text_upload
 
 # Load environment variables
 load_dotenv()
@@ -97,95 +98,32 @@ st.write("After uploading, we'll extract key points, action items, and deadlines
 # File uploader for transcript
 uploaded_file = st.file_uploader("Choose a Google Meet Transcript", type=["txt"])
 
-# Helper function to extract valid names from the transcript
-def extract_valid_names(transcript):
-    names = re.findall(r'[A-Z][a-z]+(?: [A-Z][a-z]+)+', transcript)
-    return set(names)
-
 if uploaded_file is not None:
-    # Save the uploaded file temporarily
-    file_path = f"temp_{uploaded_file.name}"
-    with open(file_path, 'wb') as f:
-        f.write(uploaded_file.getbuffer())
-
-    # Read the file content
-    with open(file_path, 'r') as f:
-        transcript = f.read()
-
-    # Extract valid names from the transcript
-    valid_names = extract_valid_names(transcript)
-
-    # Define a single agent to handle the entire transcript analysis
-    transcript_analysis_agent = Agent(
-    role="Transcript Analyzer",
-    goal=f"""Analyze the following meeting transcript to extract:
-    1. **Top Key points**: Only the most important topics and updates discussed in the transcript.
-    2. **Top Action items**: Identify specific tasks assigned to individuals using names from the transcript: {', '.join(valid_names)}.
-    3. **Top Deadlines**: Extract clear, specific deadlines by identifying phrases like "due", "by next week", specific dates, and time-related words. Ensure that deadlines are tied to specific tasks where possible.
-    
-    Transcript: {transcript}""",
-    verbose=True,
-    memory=True,
-    backstory="You are an expert at analyzing meeting transcripts and extracting actionable insights. Limit the number of items to avoid overwhelming the user.",
-    max_iter=5,
-    cache=True,
-    max_retry_limit=1,
-)
-
-# Define a single task for the agent
-    transcript_analysis_task = Task(   
-    description=f"""Extract top key points, top action items, and important deadlines from the following meeting transcript:
-    Transcript: {transcript}""",
-    expected_output="""Please structure the output in the following format:
-    
-    **Key Points:**
-    [List the key points with clear and concise summaries of the most important topics]
-
-    **Action Items:**
-    [List specific tasks, making sure to include who is responsible and any details about the task]
-
-    **Deadlines:**
-    [For each deadline, ensure that it's tied to a specific task or event, and is as detailed as possible. Avoid vague or unclear timeframes.]
-    
-    Please ensure the output is cleanly formatted, without raw JSON or unnecessary symbols, and that the number of items in each section is limited to 5.""",
-    
-    agent=transcript_analysis_agent
-)
-
-
-    # Create the crew with a single agent and task
-    crew = Crew(
-        agents=[transcript_analysis_agent],
-        tasks=[transcript_analysis_task],
-        process=Process.sequential,
-        full_output=True,
-        verbose=True
-    )
-
     # Run the analysis
     try:
-        if 'crew_output' not in st.session_state:
+        # Analyze each uploaded transcript once, even though Streamlit reruns the page on every interaction
+        analysis_key = (uploaded_file.file_id, uploaded_file.name, uploaded_file.size)
+        if st.session_state.get('transcript_analysis_key') != analysis_key:
             with st.spinner('Processing transcript...'):
-                crew_output = crew.kickoff()
-                st.session_state['crew_output'] = crew_output  # Store result to avoid re-running
+                # The transcript is decoded from the upload buffer line by line and analyzed in chunks of speaker turns
+                with open_text_upload(uploaded_file) as transcript_lines:
+                    findings = analyze_transcript(transcript_lines)
+                st.session_state['transcript_analysis'] = format_transcript_report(findings)  # Store result to avoid re-running
+                st.session_state['transcript_analysis_key'] = analysis_key
 
-        crew_output = st.session_state['crew_output']
+        analysis_output = st.session_state['transcript_analysis']
 
-        # Always display the raw output since it's user-friendly
+        # Always display the report since it's user-friendly
         st.subheader("📝 Meeting Summary")
-        st.write(crew_output.raw)
+        st.write(analysis_output)
 
         # Add the download button for the file
         st.download_button(
             label="Download Transcript Analysis",
-            data=crew_output.raw,
+            data=analysis_output,
             file_name="transcript_analysis_output.txt",
             mime="text/plain",
         )
 
     except Exception as e:
         st.error(f"An error occurred during processing: {str(e)}")
-
-    # Clean up the temporary file
-    if os.path.exists(file_path):
-        os.remove(file_path)
@@ -1,8 +1,15 @@
 import streamlit as st
-import os
-from PyPDF2 import PdfReader
-import docx2txt
-from event import run_main  # Import the function from event.py
+from document_extraction import DOCX_MIME_TYPE, PDF_MIME_TYPE, start_document_extraction
+from event import get_calendar_store, run_main  # Import the functions from event.py
+from authenticate import activate_session
+
+# Check if the user has authenticated in this session
+if 'session_id' not in st.session_state:
+    st.error("You need to authenticate first. Please go back to the authentication page.")
+    st.stop()
+
+# Work with this user's Google account for the rest of the script run
+activate_session(st.session_state['session_id'])
 
 # Streamlit App Title and Description
 st.title("Google Calendar Manager")
@@ -38,24 +45,27 @@ elif option == "Upload file":
     if uploaded_file is not None:
         if st.button("Submit"):
             file_type = uploaded_file.type
-            if file_type == "application/pdf":
-                # Extract text from PDF
-                reader = PdfReader(uploaded_file)
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text()
-                user_input = text
-                # Display the extracted text first
-                st.write("Extracted Text from PDF:")
-                st.write(user_input)
-            
-            elif file_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-                # Extract text from DOCX
-                text = docx2txt.process(uploaded_file)
-                user_input = text
-                # Display the extracted text first
-                st.write("Extracted Text from DOCX:")
-                st.write(user_input)
+            if file_type not in (PDF_MIME_TYPE, DOCX_MIME_TYPE):
+                st.error("Please upload a PDF or DOCX file.")
+                st.stop()
+
+            # Extract the text in the background and bring the local copy of the calendar up to date meanwhile
+            job = start_document_extraction(uploaded_file.getvalue(), file_type)
+            with st.spinner('Syncing your calendar...'):
+                get_calendar_store().sync()
+
+            # Show the progress through the pages of large PDFs until the text is ready
+            progress_bar = st.progress(0.0, text="Extracting text...")
+            while not job.wait(timeout=0.2):
+                if job.page_count:
+                    progress_bar.progress(job.pages_done / job.page_count,
+                                          text=f"Extracted {job.pages_done} of {job.page_count} pages")
+            user_input = job.result()
+            progress_bar.empty()
+
+            # Display the extracted text first
+            st.write("Extracted Text from PDF:" if file_type == PDF_MIME_TYPE else "Extracted Text from DOCX:")
+            st.write(user_input)
             
             # Show loading spinner while result is being generated
             with st.spinner('Processing...'):
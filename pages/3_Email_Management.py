@@ -1,5 +1,7 @@
 import streamlit as st
 from gmail import main_gmail  # Import the main function from gmail.py
+from llm_cache import get_response_cache
+from authenticate import activate_session
 
 # Page layout settings
 st.set_page_config(page_title="Generate Emails Report", layout="centered")
@@ -36,11 +38,14 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# Check if the Gmail service is available in session state
-if 'gmail_service' not in st.session_state:
+# Check if the user has authenticated in this session
+if 'session_id' not in st.session_state:
     st.error("You need to authenticate first. Please go back to the authentication page.")
     st.stop()
 
+# Work with this user's Google account for the rest of the script run
+activate_session(st.session_state['session_id'])
+
 # Main page content
 st.markdown('<p class="title-text">Generate Emails Report</p>', unsafe_allow_html=True)
 
@@ -68,8 +73,11 @@ if submit_button:
             # Display the reports if they are found
             if email_reports and len(email_reports) > 0:
                 st.success(f"Report for {selected_emails} emails generated successfully!")
+                cache = get_response_cache()
+                if cache is not None:
+                    st.caption(f"LLM response cache: {cache.stats()}")
                 for report in email_reports:
-                    st.json(report)  # Display the JSON output for each email report
+                    st.json(report.to_dict())  # Display the JSON output for each email report
             else:
                 st.error("No emails found or an error occurred while fetching the emails.")
         
@@ -1,5 +1,7 @@
 import streamlit as st
-from drive2 import process_files_sequentially
+from drive2 import extract_filtered_files, iter_file_reports
+from llm_cache import get_response_cache
+from authenticate import activate_session
 import io
 
 # Page layout settings
@@ -38,12 +40,12 @@ st.markdown(
 )
 
 # Check if the drive service is available in session state
-if 'drive_service' not in st.session_state:
+if 'session_id' not in st.session_state:
     st.error("You need to authenticate first. Please go back to the authentication page.")
     st.stop()
 
-# Get the authenticated Google Drive service from session state
-drive_service = st.session_state['drive_service']
+# Work with this user's Google account for the rest of the script run
+activate_session(st.session_state['session_id'])
 
 # Main page content
 st.markdown('<p class="title-text">Google Drive Report Generator</p>', unsafe_allow_html=True)
@@ -67,18 +69,27 @@ if submit_button:
         # Display loading spinner while the processing is running
         with st.spinner("Processing files and generating reports. Please wait..."):
             try:
-                # Call the process_files_sequentially function with the user inputs
-                report_results = process_files_sequentially(google_drive_link, file_types)
+                # Filter the folder's files with the user inputs
+                filtered_files = extract_filtered_files(google_drive_link, file_types)
+
+                # Display each report as soon as its file has been analyzed
+                report_results = [None] * len(filtered_files)
+                for index, report in iter_file_reports(filtered_files):
+                    result = report.to_dict()
+                    st.json(result)
+                    report_results[index] = result
                 st.success("Reports generated successfully!")
+                cache = get_response_cache()
+                if cache is not None:
+                    st.caption(f"LLM response cache: {cache.stats()}")
 
-                # Display the report results and build the report text
+                # Build the report text in the same order as the filtered files
                 for result in report_results:
-                    st.json(result)
                     # Construct the report text
-                    report_text += f"File Name: {result['File Name']}\n"
-                    report_text += f"File Link: {result['File Link']}\n"
-                    report_text += f"Document Summary: {result['Document Summary']}\n"
-                    report_text += f"Document Priority: {result['Document Priority']}\n\n"
+                    report_text += f"File Name: {result.get('File Name', '')}\n"
+                    report_text += f"File Link: {result.get('File Link', '')}\n"
+                    report_text += f"Document Summary: {result.get('Document Summary', result.get('Error', ''))}\n"
+                    report_text += f"Document Priority: {result.get('Document Priority', '')}\n\n"
 
             except Exception as e:
                 st.error(f"An error occurred while processing: {str(e)}")
@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+import authenticate
+import calendar_store
+from authenticate import SessionRegistry, bind_session, current_session_id, use_session
+
+
+@pytest.fixture
+def two_sessions(monkeypatch, tmp_path):
+    registry = SessionRegistry()
+    monkeypatch.setattr(authenticate, 'sessions', registry)
+    registry.register('first', str(tmp_path / 'token_first.json'))
+    registry.register('second', str(tmp_path / 'token_second.json'))
+    return registry
+
+
+def run_in_thread(func):
+    outcome = {}
+
+    def target():
+        try:
+            outcome['result'] = func()
+        except Exception as error:
+            outcome['error'] = error
+
+    # Like CrewAI's asynchronous tasks, a plain thread doesn't inherit the caller's context
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    return outcome
+
+
+def test_an_unbound_function_has_no_session_in_a_worker_thread(two_sessions):
+    with use_session('second'):
+        outcome = run_in_thread(current_session_id)
+
+    assert isinstance(outcome['error'], ValueError)
+
+
+def test_a_bound_function_uses_its_session_in_a_worker_thread(two_sessions):
+    with use_session('first'):
+        first = bind_session(current_session_id, 'first')
+        second = bind_session(current_session_id, 'second')
+
+        assert run_in_thread(second) == {'result': 'second'}
+        assert run_in_thread(first) == {'result': 'first'}
+        assert current_session_id() == 'first'
+
+
+def test_evicting_the_last_session_of_an_account_drops_its_calendar_stores(two_sessions):
+    session = two_sessions.get('first')
+    store = calendar_store.get_event_store(session.pool('calendar'))
+    session.last_used -= two_sessions.max_idle + 1
+
+    assert two_sessions.evict_idle() == 1
+    assert store not in calendar_store._stores.values()
@@ -0,0 +1,140 @@
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from calendar_store import (CALENDAR_SYNC_FUTURE_DAYS, CalendarEventStore, IntervalIndex, drop_event_stores,
+                            event_bounds, get_event_store)
+
+
+def brute_force(intervals, start, end):
+    return sorted((interval for interval in intervals if interval[0] < end and interval[1] > start),
+                  key=lambda interval: (interval[0], interval[1]))
+
+
+def test_overlapping_matches_a_linear_scan():
+    rng = random.Random(0)
+    intervals = []
+    for key in range(500):
+        start = rng.randrange(10000)
+        intervals.append((start, start + rng.randint(1, 300), key))
+    index = IntervalIndex(intervals)
+
+    for _ in range(200):
+        start = rng.randrange(-100, 10100)
+        end = start + rng.randint(1, 500)
+        assert index.overlapping(start, end) == [key for _, _, key in brute_force(intervals, start, end)]
+
+
+def test_intervals_are_half_open():
+    index = IntervalIndex([(0, 10, 'a'), (10, 20, 'b')])
+
+    assert index.overlapping(10, 11) == ['b']
+    assert index.overlapping(9, 10) == ['a']
+    assert index.overlapping(20, 30) == []
+
+
+def test_empty_index():
+    index = IntervalIndex([])
+
+    assert len(index) == 0
+    assert index.overlapping(0, 100) == []
+    assert index.free_slots(0, 100, 10) == [(0, 100)]
+
+
+def test_busy_periods_merge_overlapping_and_touching_intervals():
+    index = IntervalIndex([(10, 20, 'a'), (15, 30, 'b'), (30, 40, 'c'), (50, 60, 'd'), (55, 200, 'e')])
+
+    assert index.busy_periods(0, 100) == [(10, 40), (50, 100)]
+
+
+def test_free_slots_respect_duration_and_limit():
+    index = IntervalIndex([(10, 20, 'a'), (25, 40, 'b'), (60, 70, 'c')])
+
+    assert index.free_slots(0, 100, 10) == [(0, 10), (40, 60), (70, 100)]
+    assert index.free_slots(0, 100, 10, limit=2) == [(0, 10), (40, 60)]
+    assert index.free_slots(0, 100, 25) == [(70, 100)]
+
+
+def test_event_bounds_of_timed_and_all_day_events():
+    timed = {'start': {'dateTime': '2024-03-01T10:00:00+01:00'}, 'end': {'dateTime': '2024-03-01T11:00:00+01:00'}}
+    all_day = {'start': {'date': '2024-03-01'}, 'end': {'date': '2024-03-02'}}
+
+    assert event_bounds(timed) == (1709283600, 1709287200)
+    # All-day events last from midnight to midnight in the calendar's timezone
+    assert event_bounds(all_day, 'UTC') == (1709251200, 1709337600)
+    assert event_bounds(all_day, 'America/Chicago') == (1709251200 + 6 * 3600, 1709337600 + 6 * 3600)
+
+
+class FakeCalendarService:
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+
+    def events(self):
+        return self
+
+    def list(self, **params):
+        self.calls.append(params)
+        return self
+
+    def execute(self):
+        return self.pages.pop(0)
+
+
+class FakeManager:
+    token_file = 'token_someone.json'
+
+
+class FakePool:
+    manager = FakeManager()
+
+    def __init__(self, service):
+        self.service = service
+
+    @contextmanager
+    def lease(self):
+        yield self.service
+
+
+def timed_event(event_id, start, end):
+    return {'id': event_id, 'start': {'dateTime': start}, 'end': {'dateTime': end}}
+
+
+def test_full_sync_lists_a_bounded_window_and_later_syncs_use_the_token():
+    service = FakeCalendarService([
+        {'items': [timed_event('a', '2024-03-01T10:00:00Z', '2024-03-01T11:00:00Z')], 'nextSyncToken': 'token-1'},
+        {'items': [{'id': 'a', 'status': 'cancelled'}], 'nextSyncToken': 'token-2'},
+    ])
+    store = CalendarEventStore(FakePool(service))
+
+    store.sync(force=True)
+    store.sync(force=True)
+
+    full, incremental = service.calls
+    assert full['singleEvents'] and 'timeMin' in full and 'timeMax' in full
+    horizon = datetime.fromisoformat(full['timeMax'].rstrip('Z')).replace(tzinfo=timezone.utc)
+    assert horizon - datetime.now(timezone.utc) > timedelta(days=CALENDAR_SYNC_FUTURE_DAYS - 1)
+    assert incremental['syncToken'] == 'token-1'
+    assert 'timeMin' not in incremental and 'timeMax' not in incremental
+    assert store.events == {}
+
+
+def test_a_full_sync_runs_again_when_the_window_moved():
+    service = FakeCalendarService([{'items': [], 'nextSyncToken': 'token-1'}, {'items': [], 'nextSyncToken': 'token-2'}])
+    store = CalendarEventStore(FakePool(service))
+    store.sync(force=True)
+
+    store.horizon -= CALENDAR_SYNC_FUTURE_DAYS * 86400
+    store.sync(force=True)
+
+    assert 'timeMax' in service.calls[1] and 'syncToken' not in service.calls[1]
+
+
+def test_stores_of_a_dropped_account_are_forgotten():
+    pool = FakePool(FakeCalendarService([]))
+    store = get_event_store(pool)
+
+    assert get_event_store(pool) is store
+    drop_event_stores(pool.manager.token_file)
+    assert get_event_store(pool) is not store
+    drop_event_stores(pool.manager.token_file)
@@ -0,0 +1,72 @@
+import threading
+
+from content_cache import ContentCache
+
+
+def test_versions_are_cached_separately():
+    cache = ContentCache()
+    cache.put('file', 'v1', b'old')
+
+    assert cache.get('file', 'v1') == b'old'
+    assert cache.get('file', 'v2') is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'entries': 1, 'bytes': 3}
+
+
+def test_least_recently_used_entries_are_evicted_by_size():
+    cache = ContentCache(max_bytes=10)
+    cache.put('a', 'v', b'aaaa')
+    cache.put('b', 'v', b'bbbb')
+    cache.get('a', 'v')
+    cache.put('c', 'v', b'cccc')
+
+    assert cache.peek('a', 'v') == b'aaaa'
+    assert cache.peek('b', 'v') is None
+    assert cache.peek('c', 'v') == b'cccc'
+    assert cache.stats()['bytes'] == 8
+
+
+def test_entries_larger_than_the_cache_are_not_kept_in_memory():
+    cache = ContentCache(max_bytes=4)
+    cache.put('big', 'v', b'too large')
+
+    assert cache.peek('big', 'v') is None
+    assert cache.stats()['bytes'] == 0
+
+
+def test_replacing_an_entry_keeps_the_size_right():
+    cache = ContentCache()
+    cache.put('file', 'v', b'12345')
+    cache.put('file', 'v', b'12')
+
+    assert cache.stats()['bytes'] == 2
+
+
+def test_disk_entries_survive_a_new_cache(tmp_path):
+    ContentCache(disk_dir=str(tmp_path)).put('file', 'v1', b'contents')
+    cache = ContentCache(disk_dir=str(tmp_path))
+
+    assert cache.peek('file', 'v1') is None
+    assert cache.get('file', 'v1') == b'contents'
+    # The disk hit was promoted into memory
+    assert cache.peek('file', 'v1') == b'contents'
+    assert not [path for path in tmp_path.iterdir() if path.name.endswith('.tmp')]
+
+
+def test_key_lock_serializes_a_version_and_is_released():
+    cache = ContentCache()
+    downloads = []
+
+    def load():
+        with cache.key_lock('file', 'v'):
+            if cache.get('file', 'v') is None:
+                downloads.append(1)
+                cache.put('file', 'v', b'contents')
+
+    threads = [threading.Thread(target=load) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert downloads == [1]
+    assert cache.key_locks == {}
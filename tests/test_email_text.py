@@ -0,0 +1,88 @@
+import base64
+
+import pytest
+
+from email_text import extract_body, html_to_text, normalize_whitespace, strip_quoted_reply
+
+HTML = """<html><head><title>Newsletter</title><style>p { color: red; }</style></head>
+<body><div>Hi Alice,</div><p>The budget is <b>approved</b>.<br>See you &amp; thanks!</p>
+<script>track();</script><ul><li>First</li><li>Second</li></ul>
+<div class="gmail_quote"><div class="gmail_attr">On Mon, Bob wrote:</div><blockquote>Old message</blockquote></div>
+</body></html>"""
+
+EXPECTED = 'Hi Alice,\n\nThe budget is approved.\nSee you & thanks!\n\nFirst\n\nSecond'
+
+
+def encode(text):
+    return base64.urlsafe_b64encode(text.encode('utf-8')).decode('ascii')
+
+
+def part(mime_type, text):
+    return {'mimeType': mime_type, 'body': {'data': encode(text)}}
+
+
+def test_plain_text_replies_lose_their_quotes():
+    text = 'Sounds good.\n> earlier line\nThanks\n\nOn Mon, 1 Jan 2024, Bob <bob@example.com> wrote:\n> Old message'
+
+    assert normalize_whitespace(strip_quoted_reply(text)) == 'Sounds good.\nThanks'
+
+
+def test_outlook_headers_start_the_quote():
+    text = 'See attached.\n-----Original Message-----\nFrom: Bob'
+
+    assert normalize_whitespace(strip_quoted_reply(text)) == 'See attached.'
+
+
+@pytest.mark.parametrize('engine', ['stream', 'lxml'])
+def test_html_engines_keep_only_the_visible_new_text(engine):
+    payload = {'mimeType': 'text/html', 'body': {'data': encode(HTML)}}
+
+    assert extract_body(payload, engine=engine, max_chars=0) == EXPECTED
+
+
+def lines(text):
+    return [line for line in normalize_whitespace(text).split('\n') if line]
+
+
+def test_html_engines_agree_on_awkward_documents():
+    # lxml closes elements the streaming engine leaves open, so only blank lines may differ
+    documents = [
+        '<?xml version="1.0" encoding="UTF-8"?><html><body><p>Declared</p></body></html>',
+        '',
+        '<!-- only a comment -->',
+        '<div>Unclosed <p>tags<div>everywhere',
+        '<p>a<br>b<br/>c<hr>d</p>',
+        '<table><tr><td>1</td><td>2</td></tr></table>After',
+        '<blockquote>Nested <blockquote>quotes</blockquote> still quoted</blockquote>After',
+    ]
+    for document in documents:
+        stream = lines(html_to_text(document, engine='stream', max_chars=0))
+        assert lines(html_to_text(document, engine='lxml', max_chars=0)) == stream, document
+
+
+def test_unknown_engines_are_rejected():
+    with pytest.raises(ValueError):
+        html_to_text('<p>Hi</p>', engine='regex')
+
+
+def test_plain_parts_are_preferred_and_kept_in_order():
+    payload = {'mimeType': 'multipart/mixed', 'parts': [
+        {'mimeType': 'multipart/alternative', 'parts': [part('text/plain', 'First part'), part('text/html', '<p>HTML</p>')]},
+        part('text/plain', 'Second part'),
+    ]}
+
+    assert extract_body(payload) == 'First part\nSecond part'
+
+
+def test_quotes_are_kept_on_request():
+    payload = part('text/plain', 'Reply\n> quoted')
+
+    assert extract_body(payload, strip_quotes=False) == 'Reply\n> quoted'
+
+
+@pytest.mark.parametrize('engine', ['stream', 'lxml'])
+def test_bodies_are_capped(engine):
+    html = '<p>' + 'word ' * 50000 + '</p>'
+
+    assert len(extract_body(part('text/html', html), engine=engine, max_chars=1000)) == 1000
+    assert len(extract_body(part('text/plain', 'x' * 5000), max_chars=1000)) == 1000
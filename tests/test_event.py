@@ -0,0 +1,55 @@
+import threading
+
+import pytest
+
+pytest.importorskip('crewai')
+pytest.importorskip('crewai_tools')
+
+import authenticate
+import event
+from authenticate import SessionRegistry, current_session_id, use_session
+
+
+class FakeStore:
+    timezone = 'America/Chicago'
+
+    def __init__(self, seen):
+        self.seen = seen
+
+    def events_between(self, start, end):
+        self.seen.append(current_session_id())
+        return []
+
+
+def test_calendar_tools_use_their_session_in_a_worker_thread(monkeypatch, tmp_path):
+    registry = SessionRegistry()
+    monkeypatch.setattr(authenticate, 'sessions', registry)
+    registry.register('first', str(tmp_path / 'token_first.json'))
+    registry.register('second', str(tmp_path / 'token_second.json'))
+    seen = []
+    monkeypatch.setattr(event, 'get_calendar_store', lambda: FakeStore(seen))
+
+    with use_session('first'):
+        tools = {tool.name: tool for tool in event.make_calendar_tools('second')}
+    results = []
+
+    def list_events():
+        results.append(tools['List Google Calendar Events'].run(
+            start_datetime='2024-09-01T00:00:00', end_datetime='2024-09-02T00:00:00', max_results='10',
+            timezone='America/Chicago'))
+
+    # CrewAI runs the asynchronous calendar task in a thread that doesn't inherit the caller's context
+    thread = threading.Thread(target=list_events)
+    thread.start()
+    thread.join()
+
+    assert results == ['No events found.']
+    assert seen == ['second']
+
+
+def test_free_slots_report_unknown_timezones(monkeypatch):
+    monkeypatch.setattr(event, 'get_calendar_store', lambda: pytest.fail('No store lookup expected'))
+
+    result = event.find_free_calendar_slots_tool('2024-09-09T00:00:00', '2024-09-13T23:59:59', '60', 'Mars/Base')
+
+    assert result.startswith("Input validation error: Unknown timezone 'Mars/Base'")
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from event_normalization import normalize_events, resolve_timezone
+
+
+def timed(start, end, **fields):
+    return {'id': 'e', 'summary': 'Event', 'start': {'dateTime': start, **fields}, 'end': {'dateTime': end, **fields}}
+
+
+def test_times_are_converted_to_the_requested_timezone():
+    [event] = normalize_events([timed('2024-03-01T16:00:00Z', '2024-03-01T17:30:00+00:00')], 'America/Chicago')
+
+    assert (event.start, event.end) == ('2024-03-01T10:00:00', '2024-03-01T11:30:00')
+    assert not event.all_day
+
+
+def test_daylight_saving_changes_inside_one_request():
+    # Chicago moves from CST (-6) to CDT (-5) on 2024-03-10 at 2:00
+    events = [timed('2024-03-10T07:00:00Z', '2024-03-10T09:00:00Z')]
+
+    [event] = normalize_events(events, 'America/Chicago')
+
+    assert (event.start, event.end) == ('2024-03-10T01:00:00', '2024-03-10T04:00:00')
+
+
+def test_times_without_offset_use_the_event_then_the_calendar_timezone():
+    events = [
+        timed('2024-03-01T10:00:00', '2024-03-01T11:00:00', timeZone='Europe/Paris'),
+        timed('2024-03-01T10:00:00', '2024-03-01T11:00:00'),
+    ]
+
+    paris, calendar = normalize_events(events, 'UTC', calendar_timezone='America/New_York')
+
+    assert paris.start == '2024-03-01T09:00:00'
+    assert calendar.start == '2024-03-01T15:00:00'
+
+
+def test_all_day_events_keep_their_dates_with_an_inclusive_end():
+    events = [{'id': 'a', 'summary': 'Offsite', 'start': {'date': '2024-03-01'}, 'end': {'date': '2024-03-03'}}]
+
+    [event] = normalize_events(events, 'Asia/Tokyo')
+
+    assert event.all_day
+    assert (event.start, event.end) == ('2024-03-01', '2024-03-02')
+    assert event.to_dict() == {'start': '2024-03-01', 'end': '2024-03-02', 'summary': 'Offsite', 'all_day': True}
+
+
+def test_engines_agree():
+    pytest.importorskip('numpy')
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    events = [timed((base + timedelta(minutes=37 * n)).isoformat(), (base + timedelta(minutes=37 * n + 45)).isoformat())
+              for n in range(2000)]
+
+    python = normalize_events(events, 'Australia/Adelaide', engine='python')
+    numpy = normalize_events(events, 'Australia/Adelaide', engine='numpy')
+
+    assert [(event.start, event.end) for event in python] == [(event.start, event.end) for event in numpy]
+
+
+def test_unknown_timezones_are_rejected():
+    with pytest.raises(ValueError, match='Unknown timezone'):
+        resolve_timezone('Central Time')
+    with pytest.raises(ValueError):
+        normalize_events([], 'Central Time')
+
+
+def test_an_unknown_calendar_timezone_falls_back_to_utc():
+    [event] = normalize_events([timed('2024-03-01T10:00:00', '2024-03-01T11:00:00')], 'UTC', calendar_timezone='Nowhere')
+
+    assert event.start == '2024-03-01T10:00:00'
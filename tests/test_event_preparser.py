@@ -0,0 +1,130 @@
+from datetime import date, datetime, time, timedelta
+
+from dateutil import tz
+
+from event_preparser import extract_candidate_events, find_dates, find_duration, find_times, preparse_query
+
+TIMEZONE = 'America/Chicago'
+# A Wednesday
+NOW = datetime(2024, 9, 4, 15, 30, tzinfo=tz.gettz(TIMEZONE))
+TODAY = NOW.date()
+
+
+def dates_in(text):
+    return [value for _, _, value in find_dates(text, TODAY)]
+
+
+def test_find_dates_explicit_formats():
+    assert dates_in('2024-09-10, 9/11/2024 and September 12th, 2024 or 13 Sep 2024') == [
+        date(2024, 9, 10), date(2024, 9, 11), date(2024, 9, 12), date(2024, 9, 13)]
+
+
+def test_find_dates_relative_and_weekdays():
+    assert dates_in('today, tomorrow, Friday and next Friday') == [
+        date(2024, 9, 4), date(2024, 9, 5), date(2024, 9, 6), date(2024, 9, 13)]
+
+
+def test_month_and_day_in_the_past_means_next_year():
+    assert dates_in('March 3') == [date(2025, 3, 3)]
+
+
+def test_month_and_day_without_roll_forward_stay_in_the_current_year():
+    assert [value for _, _, value in find_dates('March 3', TODAY, roll_forward=False)] == [date(2024, 3, 3)]
+
+
+def test_listed_past_dates_stay_in_the_current_year():
+    parsed = preparse_query('Show my events from Aug 28 to Sep 5', now=NOW, timezone=TIMEZONE)
+
+    assert parsed.is_simple_list
+    assert (parsed.start.date(), parsed.end.date()) == (date(2024, 8, 28), date(2024, 9, 5))
+
+    parsed = preparse_query('Show my events on Sep 2', now=NOW, timezone=TIMEZONE)
+
+    assert (parsed.start.date(), parsed.end.date()) == (date(2024, 9, 2), date(2024, 9, 2))
+
+
+def test_range_ends_are_sorted():
+    parsed = preparse_query('Show my events from Sep 10 back to Sep 1', now=NOW, timezone=TIMEZONE)
+
+    assert (parsed.start.date(), parsed.end.date()) == (date(2024, 9, 1), date(2024, 9, 10))
+
+
+def test_past_weekdays_and_yesterday():
+    assert dates_in('last Monday, last Wednesday and yesterday') == [
+        date(2024, 9, 2), date(2024, 8, 28), date(2024, 9, 3)]
+    assert [value for _, _, value in find_dates('Monday', TODAY, past=True)] == [date(2024, 9, 2)]
+
+    parsed = preparse_query('What did I have last Monday?', now=NOW, timezone=TIMEZONE)
+
+    assert parsed.is_simple_list
+    assert (parsed.start.date(), parsed.end.date()) == (date(2024, 9, 2), date(2024, 9, 2))
+
+    parsed = preparse_query('What was on my calendar last week?', now=NOW, timezone=TIMEZONE)
+
+    assert (parsed.start.date(), parsed.end.date()) == (date(2024, 8, 26), date(2024, 9, 1))
+
+
+def test_create_query_in_the_past_tense_keeps_the_current_year():
+    parsed = preparse_query('Add the review we had on March 3 at 10am', now=NOW, timezone=TIMEZONE)
+
+    assert parsed.candidates[0]['start_datetime'] == '2024-03-03T10:00:00'
+
+
+def test_find_times_and_duration():
+    assert [value for _, _, value in find_times('at 3pm, 9:15 am, 17:45 or noon')] == [
+        time(15), time(9, 15), time(17, 45), time(12)]
+    assert find_duration('lunch for 90 minutes') == timedelta(minutes=90)
+    assert find_duration('a call for an hour') == timedelta(hours=1)
+    assert find_duration('no duration here') is None
+
+
+def test_candidate_events():
+    text = 'Kickoff on September 10 at 10am for 90 minutes. Dinner tomorrow 7pm - 9pm. No date here at 5pm.'
+
+    candidates = extract_candidate_events(text, TODAY, TIMEZONE)
+
+    assert [(candidate['start_datetime'], candidate['end_datetime']) for candidate in candidates] == [
+        ('2024-09-10T10:00:00', '2024-09-10T11:30:00'),
+        ('2024-09-05T19:00:00', '2024-09-05T21:00:00'),
+    ]
+    assert candidates[0]['context'].startswith('Kickoff')
+
+
+def test_list_query_with_two_dates_is_simple():
+    parsed = preparse_query('Show my events between 2024-09-01 and 2024-09-10', now=NOW, timezone=TIMEZONE)
+
+    assert parsed.is_simple_list
+    assert parsed.start == datetime(2024, 9, 1, tzinfo=tz.gettz(TIMEZONE))
+    assert parsed.end == datetime(2024, 9, 10, 23, 59, 59, tzinfo=tz.gettz(TIMEZONE))
+
+
+def test_list_query_with_a_relative_range():
+    parsed = preparse_query('What do I have next week?', now=NOW, timezone=TIMEZONE)
+
+    assert parsed.is_simple_list
+    assert (parsed.start.date(), parsed.end.date()) == (date(2024, 9, 9), date(2024, 9, 15))
+
+
+def test_create_query_goes_to_the_agent_with_hints():
+    parsed = preparse_query('Schedule a review with Bob on Friday at 2pm', now=NOW, timezone=TIMEZONE)
+
+    assert not parsed.is_simple_list
+    assert parsed.intent == 'create'
+    assert parsed.candidates[0]['start_datetime'] == '2024-09-06T14:00:00'
+    assert '2024-09-06T14:00:00' in parsed.to_hints()
+
+
+def test_list_query_without_a_range_is_not_simple():
+    parsed = preparse_query('Show my events', now=NOW, timezone=TIMEZONE)
+
+    assert parsed.intent == 'list'
+    assert not parsed.is_simple_list
+
+
+def test_list_query_with_filters_is_not_simple():
+    parsed = preparse_query('Show my meetings with John about the budget next week', now=NOW, timezone=TIMEZONE)
+
+    assert parsed.intent == 'list'
+    assert parsed.filters == ['with', 'john', 'about', 'budget']
+    assert not parsed.is_simple_list
+    assert (parsed.start.date(), parsed.end.date()) == (date(2024, 9, 9), date(2024, 9, 15))
@@ -0,0 +1,71 @@
+from file_ranking import FileIndex, mime_keyword, tokenize, trigrams
+from models import DriveFile
+
+DOC = 'application/vnd.google-apps.document'
+SHEET = 'application/vnd.google-apps.spreadsheet'
+PDF = 'application/pdf'
+
+FILES = [
+    DriveFile('1', 'Q3 Budget Report', DOC),
+    DriveFile('2', 'budget_2024.xlsx', SHEET),
+    DriveFile('3', 'Team offsite photos', 'image/jpeg'),
+    DriveFile('4', 'Signed contract', PDF),
+    DriveFile('5', 'Meeting notes', DOC),
+]
+
+
+def names(ranked):
+    return [file.name for _, file in ranked]
+
+
+def test_tokenize_splits_case_underscores_and_digits_and_drops_stop_words():
+    assert tokenize('Q3_budgetReport for the Team') == ['q', '3', 'budget', 'report', 'team']
+
+
+def test_mime_keywords_accept_plurals():
+    assert mime_keyword('pdfs') == 'pdf'
+    assert mime_keyword('spreadsheets') == 'spreadsheet'
+    assert mime_keyword('budgets') is None
+
+
+def test_trigrams_of_normalized_text():
+    assert trigrams('Ab') == {'  a', ' ab', 'ab '}
+
+
+def test_exact_words_rank_first():
+    ranked = FileIndex(FILES).rank('budget report')
+
+    assert names(ranked)[0] == 'Q3 Budget Report'
+    assert ranked[0][0] == 1.0
+    assert 'budget_2024.xlsx' in names(ranked)
+    assert 'Team offsite photos' not in names(ranked)
+
+
+def test_typos_still_match_through_trigrams():
+    assert names(FileIndex(FILES).rank('contrct'))[0] == 'Signed contract'
+
+
+def test_type_only_queries_match_on_the_mime_type():
+    ranked = FileIndex(FILES).rank('pdfs')
+
+    assert names(ranked)[0] == 'Signed contract'
+    assert ranked[0][0] == 1.0
+
+
+def test_type_keywords_boost_files_of_that_type():
+    ranked = FileIndex(FILES).rank('budget 2024 spreadsheet')
+
+    assert names(ranked)[:2] == ['budget_2024.xlsx', 'Q3 Budget Report']
+
+
+def test_snippets_let_contents_match():
+    ranked = FileIndex(FILES, snippets={'3': 'Pictures of the hiking trip'}).rank('hiking')
+
+    assert names(ranked)[0] == 'Team offsite photos'
+
+
+def test_top_k_and_empty_queries():
+    index = FileIndex(FILES)
+
+    assert len(index.rank('budget', top_k=1)) == 1
+    assert index.rank('the of and') == []
@@ -0,0 +1,80 @@
+import pytest
+
+from gmail_store import MessageStore
+from models import AnalysisReport, EmailMessage
+
+ACCOUNT = 'me@example.com'
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MessageStore(str(tmp_path / 'messages.sqlite3'), max_messages=3)
+
+
+def message(number):
+    return EmailMessage(f'm{number}', f'Sender {number}', f'Body {number}', internal_date=number)
+
+
+def test_history_ids_are_kept_per_account(store):
+    assert store.get_history_id(ACCOUNT) is None
+
+    store.set_history_id(ACCOUNT, 1234)
+    store.set_history_id('other@example.com', 5)
+
+    assert store.get_history_id(ACCOUNT) == '1234'
+
+
+def test_latest_inbox_is_newest_first_with_the_stored_reports(store):
+    for number in (1, 3, 2):
+        store.add_message(ACCOUNT, message(number))
+    store.set_in_inbox(ACCOUNT, 'm3', False)
+    store.set_report(ACCOUNT, AnalysisReport('email', 'm2', 'Sender 2', '', 'Summary', 'Low Priority: fyi.'))
+
+    latest = store.latest_inbox(ACCOUNT, 10)
+
+    assert [(email.id, email.content) for email, _ in latest] == [('m2', 'Body 2'), ('m1', 'Body 1')]
+    assert latest[0][1].summary == 'Summary'
+    assert latest[1][1] is None
+    assert store.count_inbox(ACCOUNT) == 2
+
+
+def test_storing_a_message_again_keeps_its_report(store):
+    store.add_message(ACCOUNT, message(1))
+    store.set_report(ACCOUNT, AnalysisReport('email', 'm1', 'Sender 1', '', 'Summary', 'High Priority: now.'))
+    store.add_message(ACCOUNT, message(1), in_inbox=True)
+
+    assert store.latest_inbox(ACCOUNT, 1)[0][1].priority == 'High Priority: now.'
+
+
+def test_messages_out_of_the_inbox_are_evicted_first_then_the_oldest(store):
+    store.add_message(ACCOUNT, message(1))
+    store.add_message(ACCOUNT, message(2), in_inbox=False)
+    store.add_message(ACCOUNT, message(3))
+    store.add_message(ACCOUNT, message(4))
+
+    assert not store.has_message(ACCOUNT, 'm2')
+    store.add_message(ACCOUNT, message(5))
+
+    assert [email.id for email, _ in store.latest_inbox(ACCOUNT, 10)] == ['m5', 'm4', 'm3']
+
+
+def test_clear_inbox_and_delete(store):
+    store.add_message(ACCOUNT, message(1))
+    store.add_message(ACCOUNT, message(2))
+
+    store.clear_inbox(ACCOUNT)
+    store.delete_message(ACCOUNT, 'm1')
+
+    assert store.count_inbox(ACCOUNT) == 0
+    assert not store.has_message(ACCOUNT, 'm1')
+    assert store.has_message(ACCOUNT, 'm2')
+
+
+def test_pending_messages_are_dropped_after_max_attempts(store):
+    assert store.add_pending(ACCOUNT, ['a', 'b'], max_attempts=2) == []
+    assert sorted(store.pending_ids(ACCOUNT)) == ['a', 'b']
+
+    store.remove_pending(ACCOUNT, ['b'])
+
+    assert store.add_pending(ACCOUNT, ['a'], max_attempts=2) == ['a']
+    assert store.pending_ids(ACCOUNT) == []
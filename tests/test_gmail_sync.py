@@ -0,0 +1,106 @@
+import os
+
+import pytest
+
+pytest.importorskip('crewai')
+pytest.importorskip('crewai_tools')
+# gmail configures the agents' endpoint from GROQ_API_KEY when it is imported
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+import gmail
+from benchmarks.fake_gmail import FakeGmailService, make_message
+from gmail import fetch_email_records, sync_inbox
+from gmail_store import MessageStore
+
+ACCOUNT = 'me@example.com'
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MessageStore(str(tmp_path / 'messages.sqlite3'))
+
+
+def make_service(**kwargs):
+    return FakeGmailService(latency=0, per_item_latency=0, **kwargs)
+
+
+def inbox_ids(store):
+    return {email.id for email, _ in store.latest_inbox(ACCOUNT, 100)}
+
+
+def test_first_sync_stores_the_inbox_and_reports_bulk_messages(store):
+    service = make_service(message_count=6, bulk_every=3)
+
+    assert sync_inbox(service, store, max_results=5) == ACCOUNT
+
+    assert inbox_ids(store) == {f'msg0000{number}' for number in range(5)}
+    assert store.get_history_id(ACCOUNT) == str(service.history_id)
+    reports = {email.id: (email.content, report) for email, report in store.latest_inbox(ACCOUNT, 100)}
+    assert reports['msg00000'][1].priority == gmail.BULK_EMAIL_PRIORITY
+    assert reports['msg00001'][0].startswith('Lorem ipsum') and reports['msg00001'][1] is None
+
+
+def test_later_syncs_only_apply_the_history(store):
+    service = make_service(message_count=5)
+    sync_inbox(service, store, max_results=5)
+
+    service.add_message(make_message(10))
+    service.set_inbox('msg00001', False)
+    service.delete_message('msg00002')
+    requests = service.requests
+    sync_inbox(service, store, max_results=5)
+
+    assert inbox_ids(store) == {'msg00000', 'msg00003', 'msg00004', 'msg00010'}
+    assert store.has_message(ACCOUNT, 'msg00001')
+    assert not store.has_message(ACCOUNT, 'msg00002')
+    assert store.get_history_id(ACCOUNT) == str(service.history_id)
+    # getProfile, three pages of history, then one metadata and one body batch for the new message
+    assert service.requests - requests == 6
+
+
+def test_an_expired_history_id_falls_back_to_a_full_sync(store):
+    service = make_service(message_count=5)
+    sync_inbox(service, store, max_results=5)
+
+    service.set_inbox('msg00001', False)
+    service.oldest_history_id = service.history_id + 1
+    sync_inbox(service, store, max_results=5)
+
+    assert inbox_ids(store) == {'msg00000', 'msg00002', 'msg00003', 'msg00004'}
+
+
+def test_failed_bodies_are_retried_by_later_syncs_then_dropped(store):
+    service = make_service(message_count=3, failing_body_ids={'msg00001'})
+
+    sync_inbox(service, store, max_results=3)
+
+    assert inbox_ids(store) == {'msg00000', 'msg00002'}
+    assert store.pending_ids(ACCOUNT) == ['msg00001']
+
+    sync_inbox(service, store, max_results=2)
+    assert store.pending_ids(ACCOUNT) == ['msg00001']
+
+    service.failing_body_ids.clear()
+    sync_inbox(service, store, max_results=2)
+    assert 'msg00001' in inbox_ids(store)
+    assert store.pending_ids(ACCOUNT) == []
+
+
+def test_messages_failing_every_sync_are_given_up(store):
+    service = make_service(message_count=3, failing_body_ids={'msg00001'})
+
+    for _ in range(gmail.GMAIL_FETCH_ATTEMPTS):
+        sync_inbox(service, store, max_results=2)
+
+    assert store.pending_ids(ACCOUNT) == []
+    assert not store.has_message(ACCOUNT, 'msg00001')
+
+
+def test_fetch_email_records_counts_skipped_bulk_and_failed_bodies_separately(capsys):
+    service = make_service(message_count=6, bulk_every=3, failing_body_ids={'msg00001'})
+
+    emails = fetch_email_records(service, [message['id'] for message in service.messages], prefilter=True)
+
+    assert [email.id for email in emails] == ['msg00000', 'msg00002', 'msg00003', 'msg00004', 'msg00005']
+    assert [email.content is None for email in emails] == [True, False, True, False, False]
+    assert 'skipped 2 bulk messages, 1 bodies failed' in capsys.readouterr().out
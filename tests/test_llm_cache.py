@@ -0,0 +1,94 @@
+import llm_cache
+from llm_cache import ResponseCache, cached_kickoff, make_key
+
+
+class FakeAgent:
+    role = 'Summarizer'
+    goal = 'Summarize'
+    backstory = 'An expert'
+
+
+class FakeTask:
+    def __init__(self, description):
+        self.description = description
+        self.expected_output = 'A summary'
+
+
+class FakeOutput:
+    def __init__(self, raw):
+        self.raw = raw
+        self.json_dict = {'summary': raw}
+
+
+class FakeCrew:
+    def __init__(self, description='Summarize {text}'):
+        self.agents = [FakeAgent()]
+        self.tasks = [FakeTask(description)]
+        self.runs = 0
+
+    def kickoff(self, inputs=None):
+        self.runs += 1
+        return FakeOutput(f"run {self.runs}")
+
+
+def test_responses_persist_across_instances(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    ResponseCache(path).set('key', 'value')
+    cache = ResponseCache(path)
+
+    assert cache.get('key') == 'value'
+    assert cache.get('other') is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'entries': 1}
+
+
+def test_expired_entries_are_misses(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite3'), ttl=60)
+    cache.set('key', 'value')
+    now = llm_cache.time.time()
+    monkeypatch.setattr(llm_cache.time, 'time', lambda: now + 61)
+
+    assert cache.get('key') is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    clock = iter(range(100, 200))
+    monkeypatch.setattr(llm_cache.time, 'time', lambda: next(clock))
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite3'), max_entries=2)
+    cache.set('a', '1')
+    cache.set('b', '2')
+    cache.get('a')
+    cache.set('c', '3')
+
+    assert cache.get('a') == '1'
+    assert cache.get('b') is None
+    assert cache.get('c') == '3'
+
+
+def test_make_key_depends_on_every_part():
+    assert make_key('model', 'prompt') == make_key('model', 'prompt')
+    assert make_key('model', 'prompt') != make_key('other model', 'prompt')
+    assert make_key('model', {'b': 1, 'a': 2}) == make_key('model', {'a': 2, 'b': 1})
+
+
+def test_cached_kickoff_reuses_identical_runs(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, '_cache', ResponseCache(str(tmp_path / 'cache.sqlite3')))
+    crew = FakeCrew()
+
+    first = cached_kickoff(crew, {'text': 'hello'}, content_hash='v1')
+    again = cached_kickoff(crew, {'text': 'hello'}, content_hash='v1')
+    changed = cached_kickoff(crew, {'text': 'hello'}, content_hash='v2')
+
+    assert crew.runs == 2
+    assert (again.raw, again.json_dict) == (first.raw, first.json_dict)
+    assert changed.raw == 'run 2'
+
+
+def test_cached_kickoff_without_a_cache_always_runs(monkeypatch):
+    monkeypatch.setattr(llm_cache, '_cache', None)
+    monkeypatch.setenv('LLM_CACHE_PATH', '')
+    crew = FakeCrew()
+
+    cached_kickoff(crew, {'text': 'hello'})
+    cached_kickoff(crew, {'text': 'hello'})
+
+    assert crew.runs == 2
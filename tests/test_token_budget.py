@@ -0,0 +1,70 @@
+import pytest
+
+import token_budget
+from llm import estimate_tokens
+from token_budget import TRUNCATION_MARKER, fit_to_budget, split_into_chunks, truncate_to_tokens
+
+
+def test_short_text_is_not_truncated():
+    assert truncate_to_tokens('A short email.', 100) == 'A short email.'
+
+
+def test_truncation_stays_within_budget_and_prefers_sentence_ends():
+    text = 'This is one sentence of the email. ' * 100
+
+    truncated = truncate_to_tokens(text, 50)
+
+    assert truncated.endswith(TRUNCATION_MARKER)
+    assert estimate_tokens(truncated) <= 51
+    assert truncated[:-len(TRUNCATION_MARKER)].endswith('email.')
+
+
+def test_chunks_follow_paragraphs_and_cover_the_text():
+    paragraphs = [f'Paragraph {number} ' + 'words ' * 20 for number in range(10)]
+    text = '\n\n'.join(paragraphs)
+
+    chunks = split_into_chunks(text, 100)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 400 for chunk in chunks)
+    assert '\n\n'.join(chunks) == text
+
+
+def test_a_paragraph_longer_than_a_chunk_is_cut():
+    chunks = split_into_chunks('x' * 1000, 100)
+
+    assert [len(chunk) for chunk in chunks] == [400, 400, 200]
+
+
+def test_fit_to_budget_truncates(monkeypatch):
+    monkeypatch.setattr(token_budget, 'summarize_to_tokens', lambda *args, **kwargs: pytest.fail('No summary expected'))
+    text = 'word ' * 1000
+
+    assert fit_to_budget('fits', 10) == 'fits'
+    assert fit_to_budget(text, 100, strategy='truncate') == truncate_to_tokens(text, 100)
+
+
+def test_fit_to_budget_summarizes(monkeypatch):
+    monkeypatch.setattr(token_budget, 'summarize_to_tokens', lambda text, max_tokens, model=None: 'summary')
+
+    assert fit_to_budget('word ' * 1000, 100, strategy='summarize') == 'summary'
+
+
+def test_fit_to_budget_rejects_unknown_strategies():
+    with pytest.raises(ValueError):
+        fit_to_budget('word ' * 1000, 100, strategy='drop')
+
+
+def test_summarize_falls_back_to_truncation_for_failed_chunks(monkeypatch):
+    def summarize(chunk, words, model=None):
+        if chunk.startswith('B'):
+            raise ValueError('no summary')
+        return 'summary of A'
+    monkeypatch.setattr(token_budget, '_summarize_chunk', summarize)
+
+    text = 'A' * 1500 + '\n\n' + 'B' * 1500
+
+    summarized = token_budget.summarize_to_tokens(text, 500, max_workers=1)
+
+    assert summarized.startswith('summary of A\n\nBBB')
+    assert estimate_tokens(summarized) <= 501
@@ -0,0 +1,119 @@
+import transcript_analysis
+from transcript_analysis import (ActionItem, Deadline, TranscriptFindings, dedupe_items, iter_transcript_chunks,
+                                 merge_findings, reduce_findings)
+from transcript_parser import TranscriptIndex
+
+MEET_TRANSCRIPT = [
+    'Weekly Sync - Transcript\n',
+    '\n',
+    'Attendees\n',
+    'Alice Smith, Bob Jones\n',
+    'Transcript\n',
+    '00:00:00\n',
+    "Alice Smith: Let's start with the budget.\n",
+    'It is due on Friday.\n',
+    'Next Steps: send the deck\n',
+    'Bob Jones: I will send the deck.\n',
+    '00:05:00\n',
+    'Alice: Thanks Bob.\n',
+    'Meeting ended after 00:06:12\n',
+]
+
+
+def test_chunks_keep_whole_turns_and_fill_the_index():
+    index = TranscriptIndex()
+    chunks = list(iter_transcript_chunks(MEET_TRANSCRIPT, max_tokens=1000, index=index))
+
+    assert len(chunks) == 1
+    assert chunks[0].text.splitlines() == [
+        "[00:00:00] Alice Smith: Let's start with the budget. It is due on Friday. Next Steps: send the deck",
+        '[00:00:00] Bob Jones: I will send the deck.',
+        '[00:05:00] Alice: Thanks Bob.',
+    ]
+    assert chunks[0].speakers == ['Alice Smith', 'Bob Jones', 'Alice']
+    assert index.title == 'Weekly Sync'
+    assert index.attendees == ['Alice Smith', 'Bob Jones']
+    assert index.turn_count == 3
+    assert (index.first_timestamp, index.last_timestamp) == ('00:00:00', '00:05:00')
+
+
+def test_chunks_are_cut_between_turns():
+    lines = [f'Speaker {number % 2}: {"word " * 30}\n' for number in range(10)]
+    chunks = list(iter_transcript_chunks(lines, max_tokens=100))
+
+    assert len(chunks) > 1
+    assert all(transcript_analysis.estimate_tokens(chunk.text) <= 100 for chunk in chunks)
+    assert sum(chunk.text.count('Speaker ') for chunk in chunks) == 10
+
+
+def test_a_turn_longer_than_a_chunk_is_split():
+    chunks = list(iter_transcript_chunks([f'Alice: {"x" * 2000}\n'], max_tokens=100))
+
+    assert len(chunks) > 1
+    assert ''.join(chunk.text for chunk in chunks).count('x') == 2000
+    assert all(chunk.speakers == ['Alice'] for chunk in chunks)
+
+
+def test_text_without_speaker_labels_is_kept():
+    chunks = list(iter_transcript_chunks(['Planning notes\n', '\n', 'Bob to send the deck by Friday.\n']))
+
+    assert [chunk.text for chunk in chunks] == ['Planning notes Bob to send the deck by Friday.']
+    assert chunks[0].speakers == []
+
+
+def test_dedupe_items_merges_similar_items_and_counts_mentions():
+    items = ['Send the deck to the client', 'send the deck to the client by Friday', 'Book a room']
+
+    assert dedupe_items(items) == [('Send the deck to the client', 2), ('Book a room', 1)]
+
+
+def test_dedupe_items_compares_the_key():
+    items = [ActionItem(owner='Bob', task='Send the deck'), ActionItem(owner='Alice', task='Book the room'),
+             ActionItem(owner='Bob', task='send deck')]
+
+    deduped = dedupe_items(items, key=lambda item: f'{item.owner} {item.task}')
+
+    assert [(item.owner, mentions) for item, mentions in deduped] == [('Bob', 2), ('Alice', 1)]
+
+
+def test_merge_findings_puts_repeated_items_first():
+    findings = [
+        TranscriptFindings(key_points=['Budget review', 'Hiring plan']),
+        TranscriptFindings(key_points=['Office move', 'hiring plan'],
+                           deadlines=[Deadline(item='Deck', due='Friday')]),
+    ]
+
+    merged = merge_findings(findings)
+
+    assert merged.key_points == ['Hiring plan', 'Budget review', 'Office move']
+    assert merged.deadlines == [Deadline(item='Deck', due='Friday')]
+
+
+def test_reduce_findings_without_llm_call_when_sections_fit(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('The model must not be called')
+    monkeypatch.setattr(transcript_analysis, 'structured_completion', fail)
+
+    reduced = reduce_findings([TranscriptFindings(key_points=['A point']), TranscriptFindings(key_points=['a point'])],
+                              max_items=3)
+
+    assert reduced.key_points == ['A point']
+
+
+def test_reduce_findings_cuts_sections_when_the_llm_call_fails(monkeypatch):
+    def fail(*args, **kwargs):
+        raise ValueError('no answer')
+    monkeypatch.setattr(transcript_analysis, 'structured_completion', fail)
+
+    findings = [TranscriptFindings(key_points=['alpha', 'beta', 'gamma', 'delta', 'epsilon'])]
+
+    assert reduce_findings(findings, max_items=2).key_points == ['alpha', 'beta']
+
+
+def test_reduce_findings_uses_the_llm_result_when_a_section_is_too_long(monkeypatch):
+    consolidated = TranscriptFindings(key_points=['one', 'two', 'three'])
+    monkeypatch.setattr(transcript_analysis, 'structured_completion', lambda *args, **kwargs: consolidated)
+
+    findings = [TranscriptFindings(key_points=['alpha', 'beta', 'gamma', 'delta'])]
+
+    assert reduce_findings(findings, max_items=2).key_points == ['one', 'two']
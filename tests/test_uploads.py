@@ -0,0 +1,52 @@
+import codecs
+import io
+
+from uploads import READ_CHUNK_SIZE, detect_encoding, open_text_upload
+
+
+def read_lines(upload, **kwargs):
+    with open_text_upload(upload, **kwargs) as text:
+        return list(text)
+
+
+def test_encoding_detection():
+    assert detect_encoding(codecs.BOM_UTF8 + b'text') == 'utf-8-sig'
+    assert detect_encoding(codecs.BOM_UTF16_LE + 'text'.encode('utf-16-le')) == 'utf-16'
+    assert detect_encoding(codecs.BOM_UTF32_LE + 'text'.encode('utf-32-le')) == 'utf-32'
+    assert detect_encoding('café'.encode('utf-8')) == 'utf-8'
+    # A character cut at the end of the sample is still UTF-8
+    assert detect_encoding('café'.encode('utf-8')[:-1]) == 'utf-8'
+    assert detect_encoding('café'.encode('cp1252'), complete=True) == 'cp1252'
+
+
+def test_lines_are_decoded_with_universal_newlines():
+    upload = io.BytesIO('Alice: héllo\r\nBob: hi\rAlice: bye'.encode('utf-8'))
+
+    assert read_lines(upload) == ['Alice: héllo\n', 'Bob: hi\n', 'Alice: bye']
+
+
+def test_utf16_exports_and_windows_text_are_read():
+    assert read_lines(io.BytesIO('Zoë: hi\n'.encode('utf-16'))) == ['Zoë: hi\n']
+    assert read_lines(io.BytesIO('Zoë: “quoted”\n'.encode('cp1252'))) == ['Zoë: “quoted”\n']
+    # A small file ending in a cp1252 character is not taken for a cut UTF-8 character
+    assert read_lines(io.BytesIO('Café'.encode('cp1252'))) == ['Café']
+
+
+def test_the_upload_is_reread_from_the_start_and_left_open():
+    upload = io.BytesIO(b'first\nsecond\n')
+    upload.read()
+
+    assert read_lines(upload) == ['first\n', 'second\n']
+    assert not upload.closed
+    assert read_lines(upload) == ['first\n', 'second\n']
+
+
+def test_large_uploads_are_split_across_chunks():
+    lines = [f'Speaker {number}: {"é" * 50}\n' for number in range(3 * READ_CHUNK_SIZE // 50)]
+    upload = io.BytesIO(''.join(lines).encode('utf-8'))
+
+    assert read_lines(upload) == lines
+
+
+def test_undecodable_bytes_are_replaced():
+    assert read_lines(io.BytesIO(b'ok \xff\xfe\n'), encoding='utf-8') == ['ok ��\n']
@@ -0,0 +1,145 @@
+import json
+import os
+import re
+
+from concurrency import run_concurrently
+from llm import complete_json, estimate_tokens
+
+# Context window of the Groq models we use; prompts, content and the response all have to fit in it
+MODEL_CONTEXT_TOKENS = 8192
+
+# Default maximum number of tokens of content (an email or a document) put into one prompt
+EMAIL_TOKEN_BUDGET = int(os.getenv('EMAIL_TOKEN_BUDGET', '2000'))
+DOCUMENT_TOKEN_BUDGET = int(os.getenv('DOCUMENT_TOKEN_BUDGET', '4000'))
+
+# What happens to content over budget: 'truncate' cuts it, 'summarize' summarizes its chunks (map-reduce)
+EMAIL_BUDGET_STRATEGY = os.getenv('EMAIL_BUDGET_STRATEGY', 'truncate')
+DOCUMENT_BUDGET_STRATEGY = os.getenv('DOCUMENT_BUDGET_STRATEGY', 'summarize')
+
+# Number of chunk summaries requested at the same time
+SUMMARY_WORKERS = int(os.getenv('SUMMARY_WORKERS', '4'))
+
+TRUNCATION_MARKER = '\n[... content truncated ...]'
+
+CHUNK_SUMMARY_PROMPT = """You summarize one part of a longer document so that the parts can be analyzed together later.
+Keep names, dates, deadlines, amounts, decisions and action items. Do not add information that is not in the text.
+Respond with a JSON object with a single field "summary" containing the summary as plain text of maximum {words} words."""
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cuts a text to about `max_tokens` tokens, preferably at the end of a paragraph or sentence.
+
+    Parameters:
+    - text (str): The text to cut.
+    - max_tokens (int): The estimated number of tokens to keep.
+
+    Returns:
+    - str: The text, followed by a marker if it was cut.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(0, max_tokens * 4 - len(TRUNCATION_MARKER))
+    cut = text[:limit]
+    # Only back off to a boundary if that keeps most of the allowed text
+    boundary = max(cut.rfind('\n'), cut.rfind('. '))
+    if boundary > limit * 0.8:
+        cut = cut[:boundary + 1]
+    return cut.rstrip() + TRUNCATION_MARKER
+
+
+def split_into_chunks(text: str, max_tokens: int) -> list:
+    """
+    Splits a text into chunks of at most about `max_tokens` tokens, at paragraph boundaries where possible.
+
+    Returns:
+    - list: The chunks, in order.
+    """
+    max_chars = max(1, max_tokens * 4)
+    chunks = []
+    current = []
+    size = 0
+    for paragraph in re.split(r'\n\s*\n', text):
+        # A paragraph longer than a whole chunk is cut into pieces
+        pieces = [paragraph[i:i + max_chars] for i in range(0, len(paragraph), max_chars)] or ['']
+        for piece in pieces:
+            if current and size + len(piece) + 2 > max_chars:
+                chunks.append('\n\n'.join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + 2
+    if current:
+        chunks.append('\n\n'.join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def _summarize_chunk(chunk: str, words: int, model: str = None) -> str:
+    raw = complete_json(CHUNK_SUMMARY_PROMPT.format(words=words), chunk, model=model)
+    try:
+        summary = json.loads(raw).get('summary')
+    except (json.JSONDecodeError, AttributeError):
+        summary = None
+    if not isinstance(summary, str) or not summary.strip():
+        raise ValueError('The model did not return a chunk summary')
+    return summary.strip()
+
+
+def summarize_to_tokens(text: str, max_tokens: int, model: str = None, max_workers: int = None) -> str:
+    """
+    Shrinks a text to about `max_tokens` tokens with map-reduce summarization: the chunks are summarized
+    concurrently and the summaries joined in order. Chunks whose summary fails are truncated instead, and the
+    joined summaries are truncated if they are still over budget.
+
+    Parameters:
+    - text (str): The text to shrink.
+    - max_tokens (int): The estimated number of tokens of the result.
+    - model (str): The model used for the chunk summaries.
+    - max_workers (int): Maximum number of summaries requested at the same time. Defaults to SUMMARY_WORKERS.
+
+    Returns:
+    - str: The summarized text.
+    """
+    # Chunks have to fit in the context window together with the prompt and the summary
+    chunk_tokens = min(MODEL_CONTEXT_TOKENS // 2, max(max_tokens, 500))
+    chunks = split_into_chunks(text, chunk_tokens)
+    # Each summary gets an equal share of the budget (about 0.75 words per token)
+    share = max(50, max_tokens // max(1, len(chunks)))
+    words = max(30, int(share * 0.75))
+
+    outcomes = run_concurrently(
+        lambda chunk: _summarize_chunk(chunk, words, model), chunks, max_workers=max_workers or SUMMARY_WORKERS)
+    summaries = []
+    for chunk, (summary, error) in zip(chunks, outcomes):
+        summaries.append(summary if error is None else truncate_to_tokens(chunk, share))
+    return truncate_to_tokens('\n\n'.join(summaries), max_tokens)
+
+
+def fit_to_budget(text: str, max_tokens: int, strategy: str = 'truncate', label: str = 'content',
+                  model: str = None) -> str:
+    """
+    Returns the text unchanged if it fits in the token budget, or truncated or summarized to fit, and logs
+    the item's token counts.
+
+    Parameters:
+    - text (str): The email or document text.
+    - max_tokens (int): The token budget.
+    - strategy (str): 'truncate' or 'summarize'.
+    - label (str): Describes the item in the log line.
+    - model (str): The model used when summarizing.
+
+    Returns:
+    - str: The text that goes into the prompt.
+    """
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        print(f'Tokens for {label}: {tokens}')
+        return text
+
+    if strategy == 'summarize':
+        fitted = summarize_to_tokens(text, max_tokens, model=model)
+    elif strategy == 'truncate':
+        fitted = truncate_to_tokens(text, max_tokens)
+    else:
+        raise ValueError(f"Unknown budget strategy {strategy}. Use 'truncate' or 'summarize'.")
+    print(f'Tokens for {label}: {tokens} over the budget of {max_tokens}, {strategy}d to {estimate_tokens(fitted)}')
+    return fitted
@@ -0,0 +1,227 @@
+import os
+import re
+from collections import namedtuple
+from typing import List
+
+from pydantic import BaseModel, Field
+
+from concurrency import iter_completed
+from llm import LLM_MODEL_NAME, estimate_tokens, structured_completion
+from transcript_parser import TranscriptIndex, format_turn, iter_turns
+
+# Maximum estimated tokens of transcript text per chunk, and number of chunks analyzed at the same time
+TRANSCRIPT_CHUNK_TOKENS = int(os.getenv('TRANSCRIPT_CHUNK_TOKENS', '3000'))
+TRANSCRIPT_WORKERS = int(os.getenv('TRANSCRIPT_WORKERS', '4'))
+
+# Number of items shown per section of the report
+TRANSCRIPT_MAX_ITEMS = 5
+
+# Two items are duplicates when this share of their words is the same
+DUPLICATE_SIMILARITY = 0.7
+
+# The text of a chunk of whole turns and the speakers of those turns
+TranscriptChunk = namedtuple('TranscriptChunk', ['text', 'speakers'])
+
+
+class ActionItem(BaseModel):
+    owner: str = Field(description="The person responsible, as named in the transcript, or 'Unassigned'.")
+    task: str = Field(description="The task to be done.")
+
+
+class Deadline(BaseModel):
+    item: str = Field(description="The task or event the deadline applies to.")
+    due: str = Field(description="When it is due, as specific as the transcript allows.")
+
+
+class TranscriptFindings(BaseModel):
+    key_points: List[str] = Field(default_factory=list)
+    action_items: List[ActionItem] = Field(default_factory=list)
+    deadlines: List[Deadline] = Field(default_factory=list)
+
+
+TRANSCRIPT_CHUNK_PROMPT = """You are an expert at analyzing meeting transcripts and extracting actionable insights.
+You will be given one part of a longer meeting transcript. Respond with a JSON object with exactly these fields:
+"key_points": a list of strings, the most important topics and updates discussed in this part (maximum 5).
+"action_items": a list of objects with the fields "owner" (the person responsible, using the speaker names of the transcript, or "Unassigned") and "task" (maximum 5).
+"deadlines": a list of objects with the fields "item" (the task or event) and "due" (when it is due). Look for phrases like "due", "by next week", specific dates and other time-related words. Only include clear, specific deadlines.
+Use empty lists when this part contains nothing of a kind. Keep every item short and concise."""
+
+TRANSCRIPT_REDUCE_PROMPT = """You are an expert at analyzing meeting transcripts and extracting actionable insights.
+You will be given the key points, action items and deadlines found in the consecutive parts of one meeting.
+Merge them into the findings of the whole meeting: combine items that describe the same thing, drop minor ones and keep
+at most {max_items} items per list, favoring items that were mentioned in several parts. Respond with a JSON object with
+exactly the fields "key_points" (list of strings), "action_items" (list of objects with "owner" and "task") and
+"deadlines" (list of objects with "item" and "due")."""
+
+
+def iter_transcript_chunks(lines, max_tokens=None, index=None):
+    """
+    Groups the turns of a transcript into chunks, parsing the lines one at a time.
+
+    A turn is only cut when it is longer than a whole chunk.
+
+    Parameters:
+    - lines (iterable): The lines of the transcript, e.g. an open file.
+    - max_tokens (int): Maximum estimated tokens per chunk. Defaults to TRANSCRIPT_CHUNK_TOKENS.
+    - index (TranscriptIndex): Optional index filled with the meeting's attendees, speakers and turn indexes.
+
+    Yields:
+    - TranscriptChunk: The text and speakers of each chunk.
+    """
+    max_tokens = max_tokens or TRANSCRIPT_CHUNK_TOKENS
+    chunk, chunk_tokens, speakers = [], 0, {}
+
+    for turn in iter_turns(lines, index):
+        text = format_turn(turn)
+        tokens = estimate_tokens(text)
+        # A single turn longer than a chunk is split into pieces of its own
+        pieces = [text[i:i + max_tokens * 4] for i in range(0, len(text), max_tokens * 4)] if tokens > max_tokens else [text]
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if chunk and chunk_tokens + piece_tokens > max_tokens:
+                yield TranscriptChunk('\n'.join(chunk), list(speakers))
+                chunk, chunk_tokens, speakers = [], 0, {}
+            chunk.append(piece)
+            chunk_tokens += piece_tokens
+            if turn.speaker is not None:
+                speakers[turn.speaker] = None
+
+    if chunk:
+        yield TranscriptChunk('\n'.join(chunk), list(speakers))
+
+
+def analyze_transcript_chunk(chunk: TranscriptChunk, attendees: list = None) -> TranscriptFindings:
+    """
+    Extracts the key points, action items and deadlines of one chunk with a single structured LLM call.
+    The names of the chunk's speakers and the meeting's attendees are given so owners can be named.
+    """
+    header = f"Speakers in this part: {', '.join(chunk.speakers)}\n" if chunk.speakers else ''
+    if attendees:
+        header += f"Meeting attendees: {', '.join(attendees)}\n"
+    return structured_completion(TranscriptFindings, TRANSCRIPT_CHUNK_PROMPT, f"{header}\nTranscript part:\n{chunk.text}",
+                                 model=LLM_MODEL_NAME)
+
+
+def _words(text):
+    return set(re.findall(r'[a-z0-9]+', text.lower()))
+
+
+def _similar(a, b):
+    if not a or not b:
+        return a == b
+    return len(a & b) / min(len(a), len(b)) >= DUPLICATE_SIMILARITY
+
+
+def dedupe_items(items, key=lambda item: item):
+    """
+    Merges items describing the same thing, keeping the first occurrence.
+
+    Parameters:
+    - items (list): The items in transcript order.
+    - key (callable): Returns the text compared between items.
+
+    Returns:
+    - list: (item, mentions) tuples, where mentions counts the merged duplicates.
+    """
+    merged = []
+    for item in items:
+        words = _words(key(item))
+        for entry in merged:
+            if _similar(entry[1], words):
+                entry[2] += 1
+                break
+        else:
+            merged.append([item, words, 1])
+    return [(item, mentions) for item, _, mentions in merged]
+
+
+def merge_findings(findings: list) -> TranscriptFindings:
+    """
+    Combines the findings of consecutive chunks into one set without duplicates. Items mentioned in several
+    chunks come first; otherwise the transcript order is kept.
+    """
+    def merge(items, key=lambda item: item):
+        deduped = dedupe_items(items, key)
+        # sorted() is stable, so items with the same number of mentions stay in transcript order
+        return [item for item, _ in sorted(deduped, key=lambda entry: -entry[1])]
+
+    return TranscriptFindings(
+        key_points=merge([point for result in findings for point in result.key_points]),
+        action_items=merge([item for result in findings for item in result.action_items],
+                           key=lambda item: f"{item.owner} {item.task}"),
+        deadlines=merge([deadline for result in findings for deadline in result.deadlines],
+                        key=lambda deadline: f"{deadline.item} {deadline.due}"),
+    )
+
+
+def reduce_findings(findings: list, max_items: int = None) -> TranscriptFindings:
+    """
+    The reduce step: merges the chunk findings and, if any section still has more than `max_items` items,
+    lets the model consolidate them. If that call fails, the merged lists are cut instead.
+    """
+    max_items = max_items or TRANSCRIPT_MAX_ITEMS
+    merged = merge_findings(findings)
+    if max(len(merged.key_points), len(merged.action_items), len(merged.deadlines)) > max_items:
+        try:
+            merged = structured_completion(
+                TranscriptFindings, TRANSCRIPT_REDUCE_PROMPT.format(max_items=max_items),
+                merged.model_dump_json(), model=LLM_MODEL_NAME)
+        except ValueError as error:
+            print(f'Reduce step failed, keeping the most mentioned items: {error}')
+    return TranscriptFindings(
+        key_points=merged.key_points[:max_items],
+        action_items=merged.action_items[:max_items],
+        deadlines=merged.deadlines[:max_items],
+    )
+
+
+def analyze_transcript(lines, max_workers: int = None, chunk_tokens: int = None, max_items: int = None) -> TranscriptFindings:
+    """
+    Analyzes a meeting transcript of any length with map-reduce: the transcript is split on speaker turns into
+    chunks, the chunks are analyzed concurrently and their findings merged and deduplicated.
+
+    Only `max_workers` chunks are read ahead of the analyses, so memory stays bounded for multi-hour transcripts.
+
+    Parameters:
+    - lines (iterable): The lines of the transcript, e.g. an open file.
+    - max_workers (int): Maximum number of chunks analyzed at the same time. Defaults to TRANSCRIPT_WORKERS.
+    - chunk_tokens (int): Maximum estimated tokens per chunk. Defaults to TRANSCRIPT_CHUNK_TOKENS.
+    - max_items (int): Maximum number of items per section. Defaults to TRANSCRIPT_MAX_ITEMS.
+
+    Returns:
+    - TranscriptFindings: The key points, action items and deadlines of the meeting.
+
+    Raises:
+    - ValueError: If no chunk could be analyzed.
+    """
+    results = {}
+    failures = 0
+    # The header with the attendees is parsed before the first chunk is produced
+    transcript_index = TranscriptIndex()
+    chunks = iter_transcript_chunks(lines, chunk_tokens, transcript_index)
+    analyze = lambda chunk: analyze_transcript_chunk(chunk, transcript_index.attendees)
+    for index, result, error in iter_completed(analyze, chunks, max_workers=max_workers or TRANSCRIPT_WORKERS):
+        if error is not None:
+            failures += 1
+            print(f'Failed to analyze transcript chunk {index}: {error}')
+        else:
+            results[index] = result
+    duration = f', {transcript_index.first_timestamp}-{transcript_index.last_timestamp}' \
+        if transcript_index.first_timestamp else ''
+    print(f'Transcript analysis: {transcript_index.turn_count} turns by {len(transcript_index.speakers)} speakers'
+          f'{duration}, {len(results) + failures} chunks, {failures} failed')
+
+    if not results:
+        raise ValueError("The transcript could not be analyzed.")
+    # Merge in transcript order so earlier mentions come first
+    return reduce_findings([results[index] for index in sorted(results)], max_items)
+
+
+def format_transcript_report(findings: TranscriptFindings) -> str:
+    """Formats the findings as the Key Points, Action Items and Deadlines report shown on the Meetings page."""
+    sections = [
+        ("Key Points", [f"- {point}" for point in findings.key_points]),
+        ("Action Items", [f"- {item.owner}: {item.task}" for item in findings.action_items]),
+        ("Deadlines", [f"- {deadline.item}: {deadline.due}" for deadline in findings.deadlines]),
+    ]
+    return "\n\n".join(f"**{title}:**\n" + ("\n".join(lines) if lines else "- None found") for title, lines in sections)
@@ -0,0 +1,209 @@
+import re
+from collections import namedtuple
+
+# Timestamp lines written every few minutes, e.g. "00:05:00"
+TIMESTAMP_LINE = re.compile(r'^(\d{1,2}:\d{2}(?::\d{2})?)$')
+
+# Speaker turns, e.g. "Jane Doe: Let's get started." Labels have at most five words and start with a letter
+SPEAKER_LINE = re.compile(r"^([^\W\d_][\w.'’-]*(?: [\w.'’()-]+){0,4}): ?(.*)$")
+
+# Header and footer lines of a Google Meet transcript
+TITLE_SUFFIX = ' - Transcript'
+ATTENDEES_HEADER = 'Attendees'
+TRANSCRIPT_HEADER = 'Transcript'
+MEETING_ENDED = re.compile(r'^Meeting ended after ')
+
+# Labels with a colon that are not speakers
+NON_SPEAKER_LABELS = {'note', 'notes', 'action', 'action item', 'action items', 'agenda', 'todo', 'to do',
+                      'update', 'question', 'answer', 'summary', 'deadline', 're', 'fw', 'fwd', 'http', 'https'}
+
+# Words of headings such as 'Next Steps:' or 'Key Decisions:', which are capitalized like names
+HEADING_WORDS = {'action', 'actions', 'agenda', 'attendees', 'background', 'blocker', 'blockers', 'date',
+                 'deadline', 'deadlines', 'decision', 'decisions', 'follow', 'goal', 'goals', 'issue', 'issues',
+                 'item', 'items', 'key', 'location', 'meeting', 'next', 'note', 'notes', 'open', 'outcome',
+                 'outcomes', 'point', 'points', 'question', 'questions', 'recap', 'risk', 'risks', 'status',
+                 'step', 'steps', 'subject', 'summary', 'takeaways', 'time', 'todo', 'topic', 'topics', 'up',
+                 'update', 'updates'}
+
+# Labels Meet gives to speakers it couldn't name, e.g. 'Speaker 2'
+UNNAMED_SPEAKER = re.compile(r'^(?:Speaker|Participant|Guest) \d+$')
+
+# A turn of the transcript: its position, speaker (None for text without a speaker label), the last timestamp
+# seen before it, its text and its first line
+Turn = namedtuple('Turn', ['index', 'speaker', 'timestamp', 'text', 'line'])
+
+
+class TranscriptIndex:
+    """
+    What the parser learns about a transcript: its title and attendees, the speakers in order of first appearance
+    and the indexes of each speaker's turns.
+    """
+
+    def __init__(self):
+        self.title = None
+        self.attendees = []
+        self.turn_indexes = {}
+        self.turn_count = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+    @property
+    def speakers(self):
+        return [speaker for speaker in self.turn_indexes if speaker is not None]
+
+    def add_turn(self, turn):
+        self.turn_indexes.setdefault(turn.speaker, []).append(turn.index)
+        self.turn_count += 1
+
+
+class TranscriptParser:
+    """
+    A single-pass parser for Google Meet transcripts: a title line ending in ' - Transcript', an optional
+    'Attendees' section with a comma-separated list of names, then timestamp lines and 'Speaker: text' turns.
+    Lines that are neither continue the current turn. Plain 'Speaker: text' transcripts without the header work too,
+    and text without any speaker label (e.g. meeting notes) is kept in turns whose speaker is None.
+
+    Parameters:
+    - index (TranscriptIndex): Index filled while parsing. A new one is created if not given.
+    """
+
+    def __init__(self, index=None):
+        self.index = index or TranscriptIndex()
+        self.timestamp = None
+        self.in_attendees = False
+        self.started = False
+        self.line_number = 0
+        # The turn being read: whether there is one, its speaker, timestamp, first line number and its text lines
+        self.in_turn = False
+        self.speaker = None
+        self.turn_timestamp = None
+        self.turn_line = None
+        self.turn_text = []
+        # Attendee names and first names, rebuilt when the attendee list grows
+        self.attendee_count = 0
+        self.attendee_names = set()
+
+    def _is_attendee(self, label):
+        if self.attendee_count != len(self.index.attendees):
+            self.attendee_count = len(self.index.attendees)
+            self.attendee_names = set(self.index.attendees)
+            self.attendee_names.update(name.split(' ')[0] for name in self.index.attendees)
+        # 'Jane Doe' or a shortened 'Jane' / 'Jane D.'
+        return label in self.attendee_names or label.split(' ')[0] in self.attendee_names
+
+    def _is_speaker(self, label):
+        if label.lower() in NON_SPEAKER_LABELS:
+            return False
+        words = label.split(' ')
+        if any(word.lower() in HEADING_WORDS for word in words):
+            return False
+        # With an attendee list, other labels must look like names: at most three words, all capitalized
+        if self.index.attendees and not self._is_attendee(label):
+            return bool(UNNAMED_SPEAKER.match(label)) or (
+                len(words) <= 3 and all(word[:1].isupper() or word[:1] == '(' for word in words))
+        return True
+
+    def _start_turn(self, speaker, text):
+        turn = self._finish_turn()
+        self.in_turn = True
+        self.speaker = speaker
+        self.turn_timestamp = self.timestamp
+        self.turn_line = self.line_number
+        self.turn_text = [text] if text else []
+        return turn
+
+    def _finish_turn(self):
+        if not self.in_turn:
+            return None
+        turn = Turn(self.index.turn_count, self.speaker, self.turn_timestamp, ' '.join(self.turn_text), self.turn_line)
+        self.index.add_turn(turn)
+        self.in_turn = False
+        self.speaker = None
+        self.turn_text = []
+        return turn
+
+    def feed(self, line):
+        """
+        Parses one line and returns the turn it completed, or None.
+
+        Parameters:
+        - line (str): A line of the transcript, with or without its line ending.
+
+        Returns:
+        - Turn: The previous turn when this line starts a new one (or ends the meeting), otherwise None.
+        """
+        self.line_number += 1
+        line = line.strip()
+        if not line:
+            return None
+
+        if not self.started:
+            if self.line_number == 1 and line.endswith(TITLE_SUFFIX):
+                self.index.title = line[:-len(TITLE_SUFFIX)]
+                return None
+            if line == ATTENDEES_HEADER:
+                self.in_attendees = True
+                return None
+            if line == TRANSCRIPT_HEADER:
+                self.in_attendees = False
+                self.started = True
+                return None
+            if self.in_attendees:
+                self.index.attendees.extend(name.strip() for name in line.split(',') if name.strip())
+                return None
+
+        match = TIMESTAMP_LINE.match(line)
+        if match:
+            self.started = True
+            self.timestamp = match.group(1)
+            if self.index.first_timestamp is None:
+                self.index.first_timestamp = self.timestamp
+            self.index.last_timestamp = self.timestamp
+            return None
+
+        if MEETING_ENDED.match(line):
+            return self._finish_turn()
+
+        match = SPEAKER_LINE.match(line)
+        if match and self._is_speaker(match.group(1)):
+            self.started = True
+            return self._start_turn(match.group(1), match.group(2))
+
+        if self.in_turn:
+            self.turn_text.append(line)
+            return None
+        # Text before any speaker label starts a turn without a speaker, so notes without labels are kept
+        return self._start_turn(None, line)
+
+    def close(self):
+        """Returns the last turn of the transcript, if any."""
+        return self._finish_turn()
+
+
+def iter_turns(lines, index=None):
+    """
+    Yields the turns of a transcript in one pass over its lines, filling `index` on the way.
+
+    Parameters:
+    - lines (iterable): The lines of the transcript, e.g. an open file.
+    - index (TranscriptIndex): Optional index to fill with the speakers and their turn indexes.
+
+    Yields:
+    - Turn: Each turn once it is complete.
+    """
+    parser = TranscriptParser(index)
+    for line in lines:
+        turn = parser.feed(line)
+        if turn is not None:
+            yield turn
+    turn = parser.close()
+    if turn is not None:
+        yield turn
+
+
+def format_turn(turn):
+    """Formats a turn as a transcript line, e.g. '[00:05:00] Jane Doe: text', or just its text without a speaker."""
+    prefix = f"[{turn.timestamp}] " if turn.timestamp else ''
+    if turn.speaker is None:
+        return f"{prefix}{turn.text}"
+    return f"{prefix}{turn.speaker}: {turn.text}"
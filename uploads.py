@@ -0,0 +1,88 @@
+import codecs
+import io
+from contextlib import contextmanager
+
+# Bytes read ahead of decoding; large uploads are decoded and split into lines one chunk at a time
+READ_CHUNK_SIZE = 64 * 1024
+
+# Bytes looked at to detect the encoding
+DETECT_SIZE = 64 * 1024
+
+# Byte order marks, longest first so that UTF-32 LE isn't mistaken for UTF-16 LE
+BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# Used when the text is not valid UTF-8; it decodes the Windows exports UTF-8 fails on
+FALLBACK_ENCODING = 'cp1252'
+
+
+def detect_encoding(head: bytes, complete: bool = False) -> str:
+    """
+    Guesses the encoding of a text file from its first bytes: a byte order mark if there is one,
+    otherwise UTF-8 if the bytes are valid UTF-8, otherwise FALLBACK_ENCODING.
+
+    Parameters:
+    - head (bytes): The first bytes of the file.
+    - complete (bool): Whether the head is the whole file, so it can't end in the middle of a character.
+
+    Returns:
+    - str: The codec name.
+    """
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+    try:
+        # Unless the head is the whole file, a character cut at its end is not an error
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=complete)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+
+
+@contextmanager
+def open_text_upload(upload, encoding=None):
+    """
+    Reads an uploaded file (e.g. a Streamlit UploadedFile or any binary file object) as text lines,
+    decoding it incrementally straight from its buffer: nothing is written to disk and the file is never
+    copied or decoded as a whole. Each call reads its own upload object, so concurrent sessions can't collide.
+
+    Parameters:
+    - upload: A seekable binary file object.
+    - encoding (str): The codec to use. Detected from the first bytes if not given.
+
+    Yields:
+    - A text stream that iterates over the lines of the file, with universal newlines.
+      Undecodable bytes are replaced rather than failing the upload.
+    """
+    # Streamlit keeps the same upload object across reruns, so start from the beginning every time
+    upload.seek(0)
+    if encoding is None:
+        head = upload.read(DETECT_SIZE)
+        encoding = detect_encoding(head, complete=len(head) < DETECT_SIZE)
+        upload.seek(0)
+
+    text = io.TextIOWrapper(io.BufferedReader(_Unclosable(upload), buffer_size=READ_CHUNK_SIZE),
+                            encoding=encoding, errors='replace', newline=None)
+    try:
+        yield text
+    finally:
+        text.close()
+
+
+class _Unclosable(io.RawIOBase):
+    """Reads from a file object without closing it when the wrapping text stream is closed."""
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        # Reads into the buffer of the BufferedReader directly, without an intermediate bytes object
+        return self.raw.readinto(buffer)